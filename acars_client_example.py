@@ -7,6 +7,7 @@ Pokazuje jak się logować za pomocą JWT i wysyłać dane ACARS
 import requests
 import json
 import time
+import uuid
 import logging
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any
@@ -155,6 +156,10 @@ class ACARSClient:
             if response.status_code == 201:
                 logger.info("✅ Wiadomość ACARS wysłana pomyślnie")
                 return True
+            elif response.status_code == 200:
+                # Powtórzona wiadomość (ten sam client_msg_id) - serwer ma ją już zapisaną
+                logger.info("✅ Wiadomość ACARS była już zapisana")
+                return True
             elif response.status_code == 401:
                 logger.warning("⚠️ Token wygasł, próba odświeżenia...")
                 if self.refresh_access_token():
@@ -186,6 +191,8 @@ class ACARSClient:
             if response.status_code == 201:
                 data = response.json()
                 logger.info(f"✅ Wysłano {data.get('created_count')} wiadomości")
+                if data.get('duplicate_count', 0) > 0:
+                    logger.info(f"ℹ️ {data.get('duplicate_count')} już zapisanych (pominięte)")
                 if data.get('error_count', 0) > 0:
                     logger.warning(f"⚠️ {data.get('error_count')} błędów")
                 return True
@@ -227,6 +234,8 @@ def create_sample_acars_message() -> Dict[str, Any]:
         "transmission_mode": "VDL",
         "label": "10",
         "msg_number": 1,
+        # Stały identyfikator wiadomości: ponowne wysłanie po błędzie sieci nie tworzy duplikatu
+        "client_msg_id": str(uuid.uuid4()),
         "direction": "OUT",
         "payload": {
             "timestamp": datetime.now(timezone.utc).isoformat(),
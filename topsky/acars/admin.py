@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import SmartcarsProfile
+from django.db.models import F
+from .models import (
+    ACARSMessage, Aircraft, Airport, Flight, FlightTrack, LatestPosition, MessageArchive, PilotStats, Pirep,
+    Schedule, SmartcarsProfile,
+)
 
 
 @admin.register(SmartcarsProfile)
@@ -7,14 +11,15 @@ class SmartcarsProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'created_at', 'last_login', 'api_key_short')
     list_filter = ('created_at', 'last_login')
     search_fields = ('user__username', 'user__email', 'user__first_name', 'user__last_name')
-    readonly_fields = ('api_key', 'acars_token', 'created_at', 'updated_at')
+    readonly_fields = ('api_key', 'acars_token', 'session_epoch', 'created_at', 'updated_at')
+    actions = ['revoke_sessions']
     
     fieldsets = (
         ('User Information', {
             'fields': ('user',)
         }),
         ('SmartCARS Credentials', {
-            'fields': ('api_key', 'acars_token')
+            'fields': ('api_key', 'acars_token', 'session_epoch')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at', 'last_login')
@@ -28,6 +33,108 @@ class SmartcarsProfileAdmin(admin.ModelAdmin):
         return "No API key"
     api_key_short.short_description = "API Key"
     
+    @admin.action(description="Revoke SmartCARS sessions (log out everywhere)")
+    def revoke_sessions(self, request, queryset):
+        for profile in queryset:
+            profile.revoke_sessions()
+        self.message_user(request, f"Revoked sessions for {queryset.count()} profile(s)")
+    
     def has_delete_permission(self, request, obj=None):
         # Prevent accidental deletion of profiles
-        return request.user.is_superuser 
\ No newline at end of file
+        return request.user.is_superuser 
+
+
+@admin.register(ACARSMessage)
+class ACARSMessageAdmin(admin.ModelAdmin):
+    list_display = ('timestamp', 'user', 'aircraft_id', 'flight_number', 'latitude', 'longitude', 'altitude', 'direction')
+    list_filter = ('direction', 'timestamp')
+    search_fields = ('flight_number', 'aircraft_id', 'simulator', 'aircraft_type', 'user__username')
+    raw_id_fields = ('user', 'flight')
+    date_hierarchy = 'timestamp'
+    list_select_related = ('user',)
+
+
+@admin.register(Flight)
+class FlightAdmin(admin.ModelAdmin):
+    list_display = (
+        'started_at', 'user', 'flight_number', 'aircraft_id', 'route', 'status', 'phase',
+        'last_report_at', 'off_at', 'on_at', 'landing_rate',
+    )
+    list_filter = ('status', 'phase', 'started_at')
+    exclude = ('phase_state',)
+    search_fields = ('flight_number', 'aircraft_id', 'user__username')
+    raw_id_fields = ('user',)
+    date_hierarchy = 'started_at'
+    list_select_related = ('user',)
+    actions = ['close_and_compact']
+    
+    @admin.action(description="Close and compact tracks")
+    def close_and_compact(self, request, queryset):
+        from .tracks import compact_flight
+        queryset.filter(status=Flight.LIVE).update(status=Flight.CLOSED, ended_at=F('last_report_at'))
+        flights = queryset.filter(status=Flight.CLOSED)
+        for flight in flights:
+            compact_flight(flight)
+        self.message_user(request, f"Compacted {len(flights)} flight(s)")
+
+
+@admin.register(FlightTrack)
+class FlightTrackAdmin(admin.ModelAdmin):
+    list_display = ('flight', 'point_count', 'distance_nm', 'started_at', 'ended_at', 'created_at')
+    raw_id_fields = ('flight',)
+    exclude = ('data',)
+
+
+@admin.register(Pirep)
+class PirepAdmin(admin.ModelAdmin):
+    list_display = (
+        'flight', 'user', 'flight_number', 'aircraft_id', 'distance_nm', 'block_seconds',
+        'air_seconds', 'fuel_used', 'max_altitude', 'landing_rate', 'generated_at',
+    )
+    search_fields = ('flight_number', 'aircraft_id', 'user__username')
+    raw_id_fields = ('flight', 'user')
+    list_select_related = ('user',)
+
+
+@admin.register(LatestPosition)
+class LatestPositionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'flight_number', 'aircraft_id', 'latitude', 'longitude', 'altitude', 'timestamp')
+    search_fields = ('user__username', 'flight_number', 'aircraft_id')
+    raw_id_fields = ('user', 'flight')
+
+
+@admin.register(PilotStats)
+class PilotStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'completed_flights', 'flight_seconds', 'distance_nm', 'total_messages', 'unique_aircraft', 'updated_at')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(MessageArchive)
+class MessageArchiveAdmin(admin.ModelAdmin):
+    list_display = ('file_name', 'month', 'row_count', 'size', 'rows_deleted', 'created_at')
+    exclude = ('user_counts',)
+    readonly_fields = ('month', 'file_name', 'row_count', 'first_id', 'last_id', 'size', 'sha256', 'rows_deleted', 'created_at')
+
+
+@admin.register(Airport)
+class AirportAdmin(admin.ModelAdmin):
+    list_display = ('icao', 'iata', 'name', 'city', 'country', 'elevation')
+    search_fields = ('icao', 'iata', 'name', 'city')
+    list_filter = ('country',)
+
+
+@admin.register(Aircraft)
+class AircraftAdmin(admin.ModelAdmin):
+    list_display = ('registration', 'icao_type', 'name', 'active')
+    search_fields = ('registration', 'icao_type', 'name')
+    list_filter = ('active', 'icao_type')
+
+
+@admin.register(Schedule)
+class ScheduleAdmin(admin.ModelAdmin):
+    list_display = ('flight_number', 'departure', 'arrival', 'icao_type', 'departure_time', 'arrival_time', 'days', 'active')
+    search_fields = ('flight_number', 'departure__icao', 'arrival__icao')
+    list_filter = ('active',)
+    raw_id_fields = ('departure', 'arrival')
+    list_select_related = ('departure', 'arrival')
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class AcarsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'acars'
-    verbose_name = 'ACARS SmartCARS Integration' 
\ No newline at end of file
+    verbose_name = 'ACARS SmartCARS Integration'
+
+    def ready(self):
+        # Connect cache invalidation signals
+        from . import signals  # noqa: F401
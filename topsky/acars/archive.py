@@ -0,0 +1,593 @@
+"""
+Cold archive of old ACARS messages in compressed columnar files.
+
+archive_month() streams one calendar month of acars_message rows (by id) into
+a file in SMARTCARS_ARCHIVE_DIR, verifies the file against the database and
+deletes the archived rows in batches. Every file is recorded as a
+MessageArchive, with per-pilot message counts so that rebuild_pilot_stats
+still counts the deleted rows. ArchiveReader memory-maps a file and decodes
+only the columns a query asks for; iter_archived() scans all archived months
+of a time range without touching acars_message.
+
+File layout (little-endian):
+    header      '<4sB3x'  magic, format version
+    row groups  up to ROW_GROUP_SIZE rows, one chunk per column; a chunk is
+                one or more buffers, each starting at an 8-byte offset
+    footer      zlib-compressed JSON: the columns and, per row group, its row
+                count, id and time range and the chunks' buffers
+    trailer     '<QI4s'   footer offset, footer length, magic
+A buffer is [offset, stored length, raw length]; it is zlib-compressed unless
+that does not make it smaller (stored length == raw length).
+
+Every concrete ACARSMessage field is a column, encoded by its kind:
+    delta  id and timestamp (microseconds since the epoch): first value plus
+           deltas in the narrowest typecode (tracks.pack_deltas)
+    int    integers, decimals in fixed point (value * 10 ** scale) and times
+           of day (microseconds): values in the narrowest typecode, plus a
+           null flag byte per row when the chunk has nulls
+    dict   strings: a JSON list of distinct values plus codes into it
+    json   payload: lengths ('I') plus the concatenated JSON texts
+The footer lists the columns a file was written with, so files keep working
+after the model gains fields.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from datetime import time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, Max, Min, Sum, TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+from .models import ACARSMessage, Flight, FlightTrack, MessageArchive
+from .tracks import EPOCH, compact_flight, pack_deltas, unpack_deltas
+
+ARCHIVE_DIR = getattr(settings, 'SMARTCARS_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))
+ARCHIVE_AFTER_MONTHS = getattr(settings, 'SMARTCARS_ARCHIVE_AFTER_MONTHS', 6)
+MAGIC = b'AARC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sB3x')
+TRAILER = struct.Struct('<QI4s')
+ROW_GROUP_SIZE = 100000
+DELETE_BATCH_SIZE = 5000
+COMPRESSION_LEVEL = 6
+INT_TYPECODES = 'bhiq'
+BIG_ENDIAN = sys.byteorder == 'big'
+ONE_US = timedelta(microseconds=1)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def message_columns():
+    """Column specs ({name, kind, encoding[, scale]}) of the current ACARSMessage model"""
+    columns = []
+    for field in ACARSMessage._meta.concrete_fields:
+        column = {'name': field.attname}
+        if field.primary_key:
+            column.update(kind='int', encoding='delta')
+        elif isinstance(field, models.DateTimeField):
+            column.update(kind='datetime', encoding='int' if field.null else 'delta')
+        elif isinstance(field, models.DecimalField):
+            column.update(kind='decimal', encoding='int', scale=field.decimal_places)
+        elif isinstance(field, models.TimeField):
+            column.update(kind='time', encoding='int')
+        elif isinstance(field, models.JSONField):
+            column.update(kind='json', encoding='json')
+        elif isinstance(field, (models.CharField, models.TextField)):
+            column.update(kind='str', encoding='dict')
+        elif isinstance(field, (models.IntegerField, models.ForeignKey, models.BooleanField)):
+            column.update(kind='int', encoding='int')
+        else:
+            raise ArchiveError(f"No archive encoding for {field.name} ({type(field).__name__})")
+        columns.append(column)
+    return columns
+
+
+# Stored (integer) form of a database value and back, by column kind
+
+def _time_to_int(value):
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+
+
+def _int_to_time(value):
+    seconds, microsecond = divmod(value, 1000000)
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    return time(hour, minute, second, microsecond)
+
+
+def _to_stored(column, values):
+    kind = column['kind']
+    if kind == 'datetime':
+        return [None if value is None else (value - EPOCH) // ONE_US for value in values]
+    if kind == 'decimal':
+        scale = column['scale']
+        return [None if value is None else int(value.scaleb(scale)) for value in values]
+    if kind == 'time':
+        return [None if value is None else _time_to_int(value) for value in values]
+    return list(values)
+
+
+def _from_stored(column, values):
+    kind = column['kind']
+    if kind == 'datetime':
+        return [None if value is None else EPOCH + value * ONE_US for value in values]
+    if kind == 'decimal':
+        scale = -column['scale']
+        return [None if value is None else Decimal(value).scaleb(scale) for value in values]
+    if kind == 'time':
+        return [None if value is None else _int_to_time(value) for value in values]
+    return values
+
+
+def _typecode(low, high):
+    for typecode in INT_TYPECODES:
+        limit = 1 << (array(typecode).itemsize * 8 - 1)
+        if -limit <= low and high < limit:
+            return typecode
+    raise ArchiveError('Integer out of range')
+
+
+def _int_bytes(typecode, values):
+    packed = array(typecode, values)
+    if BIG_ENDIAN:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def encode_chunk(column, values):
+    """Returns (buffers, chunk metadata) for the stored values of one column"""
+    encoding = column['encoding']
+    if encoding == 'delta':
+        return [pack_deltas(values)], {'base': values[0]}
+    if encoding == 'int':
+        nulls = None
+        if any(value is None for value in values):
+            nulls = bytes(value is None for value in values)
+            values = [0 if value is None else value for value in values]
+        typecode = _typecode(min(values), max(values))
+        buffers = [_int_bytes(typecode, values)]
+        if nulls:
+            buffers.append(nulls)
+        return buffers, {'typecode': typecode}
+    if encoding == 'dict':
+        dictionary = {}
+        codes = [dictionary.setdefault(value, len(dictionary)) for value in values]
+        typecode = _typecode(0, len(dictionary))
+        return [json.dumps(list(dictionary)).encode(), _int_bytes(typecode, codes)], {'typecode': typecode}
+    if encoding == 'json':
+        texts = [value.encode() for value in values]
+        return [_int_bytes('I', map(len, texts)), b''.join(texts)], {}
+    raise ArchiveError(f"Unknown encoding {encoding}")
+
+
+class ArchiveWriter:
+    """Writes row groups to <path>.tmp; close() adds the footer and renames it to path"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.row_groups = []
+        self.digest = hashlib.sha256()
+        self.offset = 0
+        self.file = open(path + '.tmp', 'wb')
+        self._write(HEADER.pack(MAGIC, FORMAT_VERSION))
+
+    def _write(self, data):
+        self.file.write(data)
+        self.digest.update(data)
+        self.offset += len(data)
+
+    def _write_buffer(self, data):
+        padding = -self.offset % 8
+        if padding:
+            self._write(bytes(padding))
+        compressed = zlib.compress(data, COMPRESSION_LEVEL)
+        stored = compressed if len(compressed) < len(data) else data
+        reference = [self.offset, len(stored), len(data)]
+        self._write(stored)
+        return reference
+
+    def write_row_group(self, values):
+        """values: one list of stored values per column, in column order"""
+        by_name = dict(zip((column['name'] for column in self.columns), values))
+        chunks = []
+        for column, column_values in zip(self.columns, values):
+            buffers, chunk = encode_chunk(column, column_values)
+            chunk['buffers'] = [self._write_buffer(buffer) for buffer in buffers]
+            chunks.append(chunk)
+        self.row_groups.append({
+            'rows': len(values[0]),
+            'first_id': by_name['id'][0],
+            'last_id': by_name['id'][-1],
+            'min_time': min(by_name['timestamp']),
+            'max_time': max(by_name['timestamp']),
+            'chunks': chunks,
+        })
+
+    def close(self):
+        """Finish the file; returns (size, sha256 hex digest)"""
+        footer = zlib.compress(json.dumps({'columns': self.columns, 'row_groups': self.row_groups}).encode())
+        footer_offset = self.offset
+        self._write(footer)
+        self._write(TRAILER.pack(footer_offset, len(footer), MAGIC))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.path + '.tmp', self.path)
+        return self.offset, self.digest.hexdigest()
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.path + '.tmp')
+
+
+class ArchiveReader:
+    """
+    Memory-mapped archive file. Columns are decoded per row group on request:
+    raw() gives the stored integers (codes for strings) for fast scans,
+    column() the Python values as the model would return them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ArchiveError(f"{path}: empty file")
+        magic, version = HEADER.unpack_from(self.map)
+        footer_offset, footer_length, trailer_magic = TRAILER.unpack_from(self.map, len(self.map) - TRAILER.size)
+        if magic != MAGIC or trailer_magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ArchiveError(f"{path}: not an archive file of a supported version")
+        footer = json.loads(zlib.decompress(self.map[footer_offset:footer_offset + footer_length]))
+        self.columns = {column['name']: column for column in footer['columns']}
+        self.column_index = {column['name']: index for index, column in enumerate(footer['columns'])}
+        self.row_groups = footer['row_groups']
+        self.row_count = sum(group['rows'] for group in self.row_groups)
+
+    def close(self):
+        if not self.map.closed:
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _chunk(self, name, group):
+        if name not in self.columns:
+            raise ArchiveError(f"{self.path}: no column {name}")
+        return self.columns[name], self.row_groups[group]['chunks'][self.column_index[name]]
+
+    def _buffer(self, reference):
+        offset, stored, raw = reference
+        # Only the pages of the requested buffers are read from disk
+        data = self.map[offset:offset + stored]
+        return data if stored == raw else zlib.decompress(data)
+
+    def _ints(self, typecode, reference):
+        values = array(typecode)
+        values.frombytes(self._buffer(reference))
+        if BIG_ENDIAN:
+            values.byteswap()
+        return values
+
+    def groups(self, since=None, until=None):
+        """Indices of the row groups with messages in [since, until)"""
+        since = None if since is None else (since - EPOCH) // ONE_US
+        until = None if until is None else (until - EPOCH) // ONE_US
+        return [
+            index for index, group in enumerate(self.row_groups)
+            if (since is None or group['max_time'] >= since) and (until is None or group['min_time'] < until)
+        ]
+
+    def raw(self, name, group):
+        """Stored values of a column as an array: integers, fixed point, microseconds or string codes"""
+        column, chunk = self._chunk(name, group)
+        encoding = column['encoding']
+        if encoding == 'delta':
+            values, _ = unpack_deltas(memoryview(self._buffer(chunk['buffers'][0])), 0,
+                                      self.row_groups[group]['rows'], chunk['base'])
+            return values
+        if encoding == 'int':
+            return self._ints(chunk['typecode'], chunk['buffers'][0])
+        if encoding == 'dict':
+            return self._ints(chunk['typecode'], chunk['buffers'][1])
+        raise ArchiveError(f"{name} has no integer form")
+
+    def nulls(self, name, group):
+        """Null flag per row (bytes) or None when the chunk has no nulls"""
+        column, chunk = self._chunk(name, group)
+        if column['encoding'] == 'int' and len(chunk['buffers']) > 1:
+            return self._buffer(chunk['buffers'][1])
+        return None
+
+    def dictionary(self, name, group):
+        column, chunk = self._chunk(name, group)
+        if column['encoding'] != 'dict':
+            raise ArchiveError(f"{name} is not a string column")
+        return json.loads(self._buffer(chunk['buffers'][0]))
+
+    def texts(self, name, group):
+        """JSON texts of a json column, undecoded"""
+        column, chunk = self._chunk(name, group)
+        lengths = self._ints('I', chunk['buffers'][0])
+        data = self._buffer(chunk['buffers'][1])
+        texts = []
+        offset = 0
+        for length in lengths:
+            texts.append(data[offset:offset + length].decode())
+            offset += length
+        return texts
+
+    def column(self, name, group, indices=None):
+        """Values of a column in a row group (only at indices, if given), as ACARSMessage holds them"""
+        column = self.columns[name]
+        if column['encoding'] == 'json':
+            texts = self.texts(name, group)
+            return [json.loads(texts[index]) for index in (range(len(texts)) if indices is None else indices)]
+        values = self.raw(name, group)
+        if column['encoding'] == 'dict':
+            dictionary = self.dictionary(name, group)
+            return [dictionary[values[index]] for index in indices] if indices is not None else [
+                dictionary[code] for code in values
+            ]
+        nulls = self.nulls(name, group)
+        if indices is not None:
+            values = [values[index] for index in indices]
+            nulls = nulls and [nulls[index] for index in indices]
+        else:
+            values = values.tolist()
+        if nulls:
+            values = [None if null else value for value, null in zip(values, nulls)]
+        return _from_stored(column, values)
+
+    def rows(self, names, since=None, until=None, user_id=None):
+        """Tuples of the named columns for messages in [since, until), optionally of one user"""
+        low = None if since is None else (since - EPOCH) // ONE_US
+        high = None if until is None else (until - EPOCH) // ONE_US
+        for group in self.groups(since, until):
+            if user_id is not None:
+                users = self.raw('user_id', group)
+                keep = [index for index, value in enumerate(users) if value == user_id]
+            else:
+                keep = range(self.row_groups[group]['rows'])
+            if low is not None or high is not None:
+                times = self.raw('timestamp', group)
+                keep = [
+                    index for index in keep
+                    if (low is None or times[index] >= low) and (high is None or times[index] < high)
+                ]
+            if not keep:
+                continue
+            # Only the selected rows are converted to Python values
+            columns = [self.column(name, group, keep) for name in names]
+            yield from zip(*columns)
+
+
+def archive_path(file_name):
+    return os.path.join(ARCHIVE_DIR, file_name)
+
+
+def open_archive(archive):
+    return ArchiveReader(archive_path(archive.file_name))
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start):
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def iter_archived(names, since=None, until=None, user_id=None):
+    """Rows (tuples of the named columns) of all archived months overlapping [since, until)"""
+    archives = MessageArchive.objects.order_by('month', 'first_id')
+    if since is not None:
+        archives = archives.filter(month__gte=month_start(since).date())
+    if until is not None:
+        archives = archives.filter(month__lte=until.date())
+    for archive in archives:
+        with open_archive(archive) as reader:
+            yield from reader.rows(names, since, until, user_id)
+
+
+def _prepare_month(start, end):
+    """Make sure the month's positions are in flight tracks before its rows go away"""
+    flights = Flight.objects.filter(messages__timestamp__gte=start, messages__timestamp__lt=end).distinct()
+    live = flights.filter(status=Flight.LIVE).count()
+    if live:
+        raise ArchiveError(f"{live} flight(s) with reports in {start:%Y-%m} are still live")
+    for flight in flights.filter(status=Flight.CLOSED, track__isnull=True):
+        compact_flight(flight, delete_rows=False)
+
+
+def _user_counts(counts):
+    """
+    {user id: [messages, incoming]} from {(user, flight, positioned): [messages, incoming]},
+    leaving out positions of flights with a track (rebuild_pilot_stats counts those from the track)
+    """
+    flight_ids = {flight_id for _, flight_id, positioned in counts if flight_id is not None and positioned}
+    tracked = set()
+    flight_ids = sorted(flight_ids)
+    for start in range(0, len(flight_ids), DELETE_BATCH_SIZE):
+        tracked.update(FlightTrack.objects.filter(
+            flight_id__in=flight_ids[start:start + DELETE_BATCH_SIZE]
+        ).values_list('flight_id', flat=True))
+    users = {}
+    for (user_id, flight_id, positioned), (total, incoming) in counts.items():
+        if positioned and flight_id in tracked:
+            continue
+        user = users.setdefault(str(user_id), [0, 0])
+        user[0] += total
+        user[1] += incoming
+    return users
+
+
+def write_archive(path, queryset, columns):
+    """
+    Stream the queryset (ordered by id) into an archive file.
+    Returns (row count, first id, last id, size, sha256, per-user counts) or None if empty.
+    """
+    names = [column['name'] for column in columns]
+    fields = ['payload_text' if name == 'payload' else name for name in names]
+    index = {name: position for position, name in enumerate(names)}
+    rows = queryset.annotate(payload_text=Cast('payload', TextField())).order_by('id').values_list(*fields)
+
+    writer = None
+    counts = {}
+    row_count = 0
+
+    def flush(batch):
+        # Transposed in C; the conversions then run per column
+        values = [_to_stored(column, column_values) for column, column_values in zip(columns, zip(*batch))]
+        writer.write_row_group(values)
+
+    try:
+        batch = []
+        for row in rows.iterator(chunk_size=ROW_GROUP_SIZE):
+            key = (row[index['user_id']], row[index['flight_id']],
+                   row[index['latitude']] is not None and row[index['longitude']] is not None)
+            count = counts.setdefault(key, [0, 0])
+            count[0] += 1
+            count[1] += row[index['direction']] == 'IN'
+            batch.append(row)
+            if len(batch) >= ROW_GROUP_SIZE:
+                writer = writer or ArchiveWriter(path, columns)
+                flush(batch)
+                row_count += len(batch)
+                batch = []
+        if batch:
+            writer = writer or ArchiveWriter(path, columns)
+            flush(batch)
+            row_count += len(batch)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is None:
+        return None
+    first_id, last_id = writer.row_groups[0]['first_id'], writer.row_groups[-1]['last_id']
+    size, sha256 = writer.close()
+    return row_count, first_id, last_id, size, sha256, _user_counts(counts)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_archive(archive, queryset=None):
+    """
+    Check an archive file: its checksum, that every column of every row group
+    decodes, and (given the queryset it was written from) that it holds
+    exactly the database's rows up to archive.last_id. Raises ArchiveError.
+    """
+    path = archive_path(archive.file_name)
+    if file_sha256(path) != archive.sha256:
+        raise ArchiveError(f"{archive.file_name}: checksum mismatch")
+    ids = array('q')
+    with ArchiveReader(path) as reader:
+        for group, meta in enumerate(reader.row_groups):
+            for name in reader.columns:
+                if len(reader.column(name, group)) != meta['rows']:
+                    raise ArchiveError(f"{archive.file_name}: column {name} of row group {group} is truncated")
+            ids.extend(reader.raw('id', group))
+    count, id_sum = len(ids), sum(ids)
+    if (count, ids[0], ids[-1]) != (archive.row_count, archive.first_id, archive.last_id):
+        raise ArchiveError(f"{archive.file_name}: holds {count} rows, expected {archive.row_count}")
+    if queryset is not None:
+        stored = queryset.filter(id__gte=archive.first_id, id__lte=archive.last_id).aggregate(
+            count=Count('id'), id_sum=Sum('id'),
+        )
+        if (stored['count'], stored['id_sum']) != (count, id_sum):
+            raise ArchiveError(
+                f"{archive.file_name}: database has {stored['count']} rows in its id range, the file {count}"
+            )
+
+
+def delete_archived(archive, start, end, batch_size=DELETE_BATCH_SIZE):
+    """Delete the archived rows from acars_message, batch_size ids per transaction"""
+    deleted = 0
+    with open_archive(archive) as reader:
+        for group in range(len(reader.row_groups)):
+            ids = reader.raw('id', group).tolist()
+            for offset in range(0, len(ids), batch_size):
+                with transaction.atomic():
+                    # The time range lets PostgreSQL prune to the month's partition
+                    count, _ = ACARSMessage.objects.filter(
+                        timestamp__gte=start, timestamp__lt=end, id__in=ids[offset:offset + batch_size],
+                    ).delete()
+                deleted += count
+    archive.rows_deleted = True
+    archive.save(update_fields=['rows_deleted'])
+    return deleted
+
+
+def archive_month(start, keep_rows=False, delete_batch_size=DELETE_BATCH_SIZE):
+    """
+    Archive the rows of the month starting at `start` that no earlier part
+    holds, verify the file and (unless keep_rows) delete the rows.
+    Returns the MessageArchive, or None when there was nothing to archive.
+    """
+    start = month_start(start)
+    end = next_month(start)
+    _prepare_month(start, end)
+
+    previous = MessageArchive.objects.filter(month=start.date())
+    after = previous.aggregate(last_id=Max('last_id'))['last_id'] or 0
+    queryset = ACARSMessage.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    part = previous.count()
+    file_name = f"acars_message_{start:%Y_%m}{f'_{part}' if part else ''}.acar"
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = archive_path(file_name)
+    columns = message_columns()
+    written = write_archive(path, queryset.filter(id__gt=after), columns)
+    if written is None:
+        return None
+    row_count, first_id, last_id, size, sha256, user_counts = written
+    archive = MessageArchive(
+        month=start.date(), file_name=file_name, row_count=row_count, first_id=first_id,
+        last_id=last_id, size=size, sha256=sha256, user_counts=user_counts,
+    )
+    try:
+        verify_archive(archive, queryset.filter(id__gt=after))
+    except ArchiveError:
+        os.remove(path)
+        raise
+    archive.save()
+    if not keep_rows:
+        delete_archived(archive, start, end, delete_batch_size)
+    return archive
+
+
+def archivable_months(after_months=ARCHIVE_AFTER_MONTHS, now=None):
+    """Starts of the months older than after_months that still have rows in acars_message"""
+    cutoff = month_start(now or timezone.now())
+    for _ in range(after_months):
+        cutoff = month_start(cutoff - timedelta(days=1))
+    oldest = ACARSMessage.objects.filter(timestamp__lt=cutoff).aggregate(oldest=Min('timestamp'))['oldest']
+    months = []
+    start = month_start(oldest) if oldest else cutoff
+    while start < cutoff:
+        if ACARSMessage.objects.filter(timestamp__gte=start, timestamp__lt=next_month(start)).exists():
+            months.append(start)
+        start = next_month(start)
+    return months
@@ -0,0 +1,174 @@
+"""
+Async versions of the SmartCARS endpoints, used when serving through
+topsky.asgi (see SMARTCARS_ASYNC_VIEWS). Password hashing runs on a bounded
+thread pool and DB access goes through the async ORM, so a single worker can
+keep hundreds of SmartCARS connections open.
+"""
+import json
+import logging
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from .authentication import aauthenticate_smartcars_request, aauthenticate_smartcars_user
+from .catalog import catalog
+from .models import SmartcarsProfile
+from .request_log import log_request_details, log_response_details
+from .stats import aget_pilot_stats
+from .tokens import issue_session_token
+from .views import (
+    catalog_response,
+    discovery_response,
+    login_response_data,
+    parse_login_credentials,
+    pilot_response_data,
+    throttled_response,
+    unauthorized_response,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def _authenticated_user(request):
+    """
+    Authenticate like the DRF views do; returns (user, None) or (None, error response)
+    """
+    try:
+        user = await aauthenticate_smartcars_request(request)
+    except Throttled as exc:
+        return None, throttled_response(request, exc)
+    except AuthenticationFailed as exc:
+        error_data = {'detail': str(exc.detail)}
+    else:
+        if user:
+            request._smartcars_log_user = user
+            return user, None
+        error_data = {'detail': 'Authentication credentials were not provided.'}
+
+    return None, unauthorized_response(request, error_data)
+
+
+async def _get_profile(user):
+    profile = getattr(user, 'smartcars_profile', None)
+    if profile is None:
+        profile, created = await SmartcarsProfile.objects.aget_or_create(user=user)
+    return profile
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def login(request):
+    """
+    SmartCARS login endpoint (async)
+    Accepts email/password, username/password, or email/api_key authentication
+    Supports JSON body, form data, and Basic Auth
+    """
+    log_request_details(request, "LOGIN")
+
+    try:
+        try:
+            identifier, password = parse_login_credentials(request)
+        except AuthenticationFailed:
+            error_data = {'error': 'Invalid authentication header'}
+            log_response_details(request, error_data, 400)
+            return JsonResponse(error_data, status=400)
+
+        if not identifier or not password:
+            error_data = {'error': 'Email/username and password are required'}
+            log_response_details(request, error_data, 400)
+            return JsonResponse(error_data, status=400)
+
+        try:
+            user = await aauthenticate_smartcars_user(identifier, password, request)
+        except Throttled as exc:
+            return throttled_response(request, exc)
+
+        if not user:
+            error_data = {'error': 'Invalid credentials'}
+            log_response_details(request, error_data, 401)
+            return JsonResponse(error_data, status=401)
+
+        request._smartcars_log_user = user
+        profile = await _get_profile(user)
+        response_data = login_response_data(user, issue_session_token(user, profile))
+
+        log_response_details(request, response_data, 200)
+        return JsonResponse(response_data)
+
+    except json.JSONDecodeError:
+        error_data = {'error': 'Invalid JSON data'}
+        log_response_details(request, error_data, 400)
+        return JsonResponse(error_data, status=400)
+    except Exception:
+        logger.exception("Exception during SmartCARS login")
+        error_data = {'error': 'Internal server error'}
+        log_response_details(request, error_data, 500)
+        return JsonResponse(error_data, status=500)
+
+
+@require_http_methods(["GET"])
+async def pilot_info(request):
+    """
+    Get pilot information - requires authentication (async)
+    """
+    log_request_details(request, "PILOT_INFO")
+
+    user, error_response = await _authenticated_user(request)
+    if error_response:
+        return error_response
+
+    profile = await _get_profile(user)
+    response_data = pilot_response_data(user, profile, await aget_pilot_stats(user.pk))
+
+    log_response_details(request, response_data, 200)
+    return JsonResponse(response_data)
+
+
+@require_http_methods(["GET"])
+async def data_info(request):
+    """
+    Basic data endpoint for SmartCARS (async)
+    """
+    log_request_details(request, "DATA_INFO")
+
+    user, error_response = await _authenticated_user(request)
+    if error_response:
+        return error_response
+
+    return discovery_response(request, "DATA_INFO")
+
+
+@require_http_methods(["GET"])
+async def airports(request):
+    """Airport list for SmartCARS, from the in-memory catalog (async)"""
+    log_request_details(request, "AIRPORTS")
+
+    user, error_response = await _authenticated_user(request)
+    if error_response:
+        return error_response
+
+    return catalog_response(request, await catalog.asnapshot(), 'airports')
+
+
+@require_http_methods(["GET"])
+async def aircraft(request):
+    """Fleet list for SmartCARS, from the in-memory catalog (async)"""
+    log_request_details(request, "AIRCRAFT")
+
+    user, error_response = await _authenticated_user(request)
+    if error_response:
+        return error_response
+
+    return catalog_response(request, await catalog.asnapshot(), 'aircraft')
+
+
+@require_http_methods(["GET"])
+async def schedules(request):
+    """Schedule list for SmartCARS, from the in-memory catalog (async)"""
+    log_request_details(request, "SCHEDULES")
+
+    user, error_response = await _authenticated_user(request)
+    if error_response:
+        return error_response
+
+    return catalog_response(request, await catalog.asnapshot(), 'schedules')
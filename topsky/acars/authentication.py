@@ -1,10 +1,64 @@
+import asyncio
 import base64
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import User
+from django.db.models import Case, IntegerField, Q, Value, When
 from django.http import JsonResponse
 from rest_framework.authentication import BaseAuthentication
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from topsky.metrics import PASSWORD_HASH_SECONDS
+from .credentials import credential_cache, credential_fingerprint, credential_key
+from .last_login import last_login_buffer
 from .models import SmartcarsProfile
+from .throttling import auth_throttle
+from .tokens import SessionUser, averify_session_token, verify_session_token
+
+
+def _identity_queryset(identifier):
+    match_rank = Case(
+        When(email__iexact=identifier, then=Value(0)),
+        When(username=identifier, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    return (
+        User.objects.select_related('smartcars_profile')
+        .filter(Q(email__iexact=identifier) | Q(username__iexact=identifier))
+        .annotate(match_rank=match_rank)
+        .order_by('match_rank', 'pk')
+    )
+
+
+def _identity_candidates(users, identifier):
+    email_user = next((u for u in users if u.match_rank == 0), None)
+    username_user = next((u for u in users if u.username.upper() == identifier.upper()), None)
+    
+    candidates = [email_user]
+    if username_user != email_user:
+        candidates.append(username_user)
+    return [user for user in candidates if user is not None]
+
+
+def resolve_smartcars_identity(identifier):
+    """
+    Resolve a SmartCARS identifier (email or username, case-insensitive) to at
+    most two candidate users: the email match, then the username match.
+    
+    Users and their SmartCARS profiles are fetched in one joined query backed by
+    the UPPER(email) / UPPER(username) indexes. Duplicate emails resolve
+    deterministically to the oldest account.
+    """
+    return _identity_candidates(list(_identity_queryset(identifier)), identifier)
+
+
+async def aresolve_smartcars_identity(identifier):
+    """Async version of resolve_smartcars_identity()"""
+    users = [user async for user in _identity_queryset(identifier)]
+    return _identity_candidates(users, identifier)
 
 
 class SmartCARSAuthentication(BaseAuthentication):
@@ -30,8 +84,15 @@ class SmartCARSAuthentication(BaseAuthentication):
         except (ValueError, UnicodeDecodeError):
             raise AuthenticationFailed('Invalid authentication header')
         
-        # Try to authenticate user
-        user = self._authenticate_user(identifier, password)
+        # Recently verified credentials skip the password hasher
+        user = self._get_cached_user(identifier, password)
+        if not user:
+            # Anything else costs a password hash - throttle floods before hashing
+            wait = auth_throttle.check(request, identifier)
+            if wait:
+                raise Throttled(wait=wait)
+            user = self._authenticate_user(identifier, password)
+        
         if user:
             return (user, None)
         
@@ -41,30 +102,47 @@ class SmartCARSAuthentication(BaseAuthentication):
         """
         Authenticate user by email/password, username/password, or email/api_key
         """
-        # Try email first
-        try:
-            user = User.objects.get(email=identifier)
+        # Email match first, then username - both come from a single query
+        for user in resolve_smartcars_identity(identifier):
             if self._check_user_credentials(user, password):
+                credential_cache.add(identifier, password, user)
                 return user
-        except User.DoesNotExist:
-            pass
-        
-        # Try username
-        try:
-            user = User.objects.get(username=identifier)
-            if self._check_user_credentials(user, password):
-                return user
-        except User.DoesNotExist:
-            pass
         
         return None
     
+    def _get_cached_user(self, identifier, password):
+        """
+        Return the user for recently verified credentials, if they are still valid
+        """
+        entry = credential_cache.get(identifier, password)
+        if entry is None:
+            return None
+        
+        user_id, fingerprint = entry
+        user = User.objects.select_related('smartcars_profile').filter(pk=user_id).first()
+        # Password, API key or is_active changed since verification
+        if user is None or not user.is_active or credential_fingerprint(user) != fingerprint:
+            credential_cache.discard(identifier, password)
+            return None
+        
+        try:
+            user.smartcars_profile.update_last_login()
+        except SmartcarsProfile.DoesNotExist:
+            # Profile deleted since the credentials were verified
+            SmartcarsProfile.get_or_create_for_user(user)
+        return user
+    
     def _check_user_credentials(self, user, password):
         """
         Check if password or API key is valid for user
         """
+        if not user.is_active:
+            return False
+        
         # First try regular password authentication
-        if user.check_password(password):
+        with PASSWORD_HASH_SECONDS.time():
+            password_valid = user.check_password(password)
+        if password_valid:
             # Update last login for SmartCARS profile
             try:
                 profile = user.smartcars_profile
@@ -86,21 +164,186 @@ class SmartCARSAuthentication(BaseAuthentication):
         return False
 
 
-def authenticate_smartcars_user(identifier, password):
+class SmartCARSSessionAuthentication(BaseAuthentication):
+    """
+    SmartCARS session token authentication (Authorization: Bearer <session>)
+    Tokens are issued by the login endpoint; verifying one needs no DB query
+    and no password hash.
+    """
+    
+    def authenticate(self, request):
+        auth_header = request.META.get('HTTP_AUTHORIZATION')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return None
+        
+        claims = verify_session_token(auth_header[7:].strip())
+        if claims is None:
+            raise AuthenticationFailed('Invalid or expired session')
+        
+        return (SessionUser(claims['user_id']), claims)
+    
+    def authenticate_header(self, request):
+        return 'Bearer'
+
+
+def authenticate_smartcars_request(request):
+    """
+    SmartCARSSessionAuthentication + SmartCARSAuthentication for plain Django views.
+    Returns the user or None; raises AuthenticationFailed / Throttled like DRF would.
+    """
+    for authenticator in (SmartCARSSessionAuthentication(), SmartCARSAuthentication()):
+        result = authenticator.authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def authenticate_smartcars_user(identifier, password, request=None):
     """
     Helper function to authenticate SmartCARS user
     Accepts email or username as identifier
-    Returns user object or None
+    Returns user object or None; raises Throttled when the client must back off
     """
     auth = SmartCARSAuthentication()
     
     # Create mock request with basic auth
     class MockRequest:
-        def __init__(self, identifier, password):
+        def __init__(self, identifier, password, meta):
             credentials = base64.b64encode(f"{identifier}:{password}".encode()).decode()
             self.META = {'HTTP_AUTHORIZATION': f'Basic {credentials}'}
+            # Keep the client address for throttling
+            for key in ('REMOTE_ADDR', 'HTTP_X_FORWARDED_FOR'):
+                if key in meta:
+                    self.META[key] = meta[key]
     
-    mock_request = MockRequest(identifier, password)
+    mock_request = MockRequest(identifier, password, request.META if request else {})
     result = auth.authenticate(mock_request)
     
-    return result[0] if result else None 
\ No newline at end of file
+    return result[0] if result else None
+
+
+# Async (ASGI) authentication path
+# Password hashing is CPU-bound, so it runs on a bounded thread pool instead of
+# the event loop or asgiref's single thread-sensitive executor.
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'SMARTCARS_HASH_WORKERS', 4),
+    thread_name_prefix='smartcars-hash',
+)
+
+
+_inflight_verifications = {}
+
+
+async def _aupdate_last_login(profile):
+    # Buffered touches are memory-only; write-through mode needs a sync DB call
+    if last_login_buffer.flush_interval:
+        last_login_buffer.touch(profile)
+    else:
+        await sync_to_async(profile.update_last_login)()
+
+
+async def _aget_cached_user(identifier, password):
+    entry = credential_cache.get(identifier, password)
+    if entry is None:
+        return None
+    
+    user_id, fingerprint = entry
+    user = await User.objects.select_related('smartcars_profile').filter(pk=user_id).afirst()
+    if user is None or not user.is_active or credential_fingerprint(user) != fingerprint:
+        credential_cache.discard(identifier, password)
+        return None
+    
+    profile = getattr(user, 'smartcars_profile', None)
+    if profile is None:
+        await SmartcarsProfile.objects.aget_or_create(user=user)
+    else:
+        await _aupdate_last_login(profile)
+    return user
+
+
+def _timed_check_password(password, encoded):
+    with PASSWORD_HASH_SECONDS.time():
+        return check_password(password, encoded)
+
+
+async def _acheck_user_credentials(user, password):
+    if not user.is_active:
+        return False
+    
+    loop = asyncio.get_running_loop()
+    password_valid = await loop.run_in_executor(
+        password_hash_executor, _timed_check_password, password, user.password
+    )
+    profile = getattr(user, 'smartcars_profile', None)
+    if not password_valid and (profile is None or profile.api_key != password):
+        return False
+    
+    if profile is None:
+        await SmartcarsProfile.objects.aget_or_create(user=user)
+    else:
+        await _aupdate_last_login(profile)
+    return True
+
+
+async def aauthenticate_smartcars_user(identifier, password, request):
+    """
+    Async version of authenticate_smartcars_user()
+    Returns user object or None; raises Throttled when the client must back off
+    """
+    user = await _aget_cached_user(identifier, password)
+    if user:
+        return user
+    
+    # Concurrent requests with the same credentials share one verification,
+    # so a burst of cold SmartCARS connections costs a single password hash
+    key = credential_key(identifier, password)
+    verification = _inflight_verifications.get(key)
+    if verification is None:
+        verification = asyncio.ensure_future(
+            _averify_credentials(identifier, password, request)
+        )
+        _inflight_verifications[key] = verification
+        verification.add_done_callback(lambda _: _inflight_verifications.pop(key, None))
+    return await asyncio.shield(verification)
+
+
+async def _averify_credentials(identifier, password, request):
+    wait = await sync_to_async(auth_throttle.check)(request, identifier)
+    if wait:
+        raise Throttled(wait=wait)
+    
+    for user in await aresolve_smartcars_identity(identifier):
+        if await _acheck_user_credentials(user, password):
+            credential_cache.add(identifier, password, user)
+            return user
+    return None
+
+
+async def aauthenticate_smartcars_request(request):
+    """
+    Async counterpart of SmartCARSSessionAuthentication + SmartCARSAuthentication
+    for plain Django async views. Returns the user or None.
+    Raises AuthenticationFailed / Throttled like the DRF classes.
+    """
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    
+    if auth_header.startswith('Bearer '):
+        claims = await averify_session_token(auth_header[7:].strip())
+        if claims is None:
+            raise AuthenticationFailed('Invalid or expired session')
+        user = await User.objects.select_related('smartcars_profile').filter(
+            pk=claims['user_id']
+        ).afirst()
+        if user is None:
+            raise AuthenticationFailed('Invalid or expired session')
+        return user
+    
+    if auth_header.startswith('Basic '):
+        try:
+            auth_decoded = base64.b64decode(auth_header[6:]).decode('utf-8')
+            identifier, password = auth_decoded.split(':', 1)
+        except (ValueError, UnicodeDecodeError):
+            raise AuthenticationFailed('Invalid authentication header')
+        return await aauthenticate_smartcars_user(identifier, password, request)
+    
+    return None
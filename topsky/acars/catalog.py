@@ -0,0 +1,168 @@
+"""
+Reference data for SmartCARS (airports, aircraft, schedules) served from memory.
+
+SmartCARS downloads these lists at every session start, and they change
+rarely. Each worker therefore holds an immutable CatalogSnapshot, where every
+list has been encoded once to JSON and to gzip (acars.views.PreEncodedJSON).
+Its ETag is the catalog version plus a hash of the body. Serving a list reads
+only the snapshot: a matching If-None-Match gets a 304, anything else gets
+the stored bytes, and the database is not touched.
+
+The Airport, Aircraft and Schedule models are the source. Saving or
+deleting one of them bumps the single CatalogVersion row in the same
+transaction (acars.signals). Once that commits, the worker that made the
+change drops its snapshot; other workers compare their snapshot version with
+the row at most every CHECK_INTERVAL seconds and rebuild when it has moved.
+bulk_create and QuerySet.update()/delete() skip the signals, so code that
+uses them calls bump_version() itself. `manage.py bump_catalog` does the
+same after a raw SQL import.
+"""
+import logging
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from .models import Aircraft, Airport, CatalogVersion, Schedule
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = getattr(settings, 'SMARTCARS_CATALOG_CHECK_SECONDS', 30)
+CACHE_CONTROL = 'private, no-cache'
+VERSION_ID = 1
+
+
+def current_version():
+    return CatalogVersion.objects.filter(pk=VERSION_ID).values_list('version', flat=True).first() or 0
+
+
+def bump_version():
+    """Mark the catalog changed (inside the writing transaction); workers rebuild after the commit"""
+    if not CatalogVersion.objects.filter(pk=VERSION_ID).update(version=F('version') + 1):
+        CatalogVersion.objects.get_or_create(pk=VERSION_ID, defaults={'version': 1})
+    transaction.on_commit(catalog.invalidate)
+
+
+def airport_rows():
+    return [
+        {
+            'id': airport['id'],
+            'code': airport['icao'],
+            'iata': airport['iata'],
+            'name': airport['name'],
+            'city': airport['city'],
+            'country': airport['country'],
+            'latitude': float(airport['latitude']),
+            'longitude': float(airport['longitude']),
+            'elevation': airport['elevation'],
+        }
+        for airport in Airport.objects.order_by('icao').values()
+    ]
+
+
+def aircraft_rows():
+    return [
+        {
+            'id': aircraft['id'],
+            'registration': aircraft['registration'],
+            'code': aircraft['icao_type'],
+            'name': aircraft['name'],
+        }
+        for aircraft in Aircraft.objects.filter(active=True).order_by('registration').values()
+    ]
+
+
+def schedule_rows():
+    schedules = Schedule.objects.filter(active=True).order_by('flight_number', 'departure_time', 'id').values(
+        'id', 'flight_number', 'icao_type', 'departure_time', 'arrival_time', 'days', 'route', 'distance_nm',
+        departure_icao=F('departure__icao'), arrival_icao=F('arrival__icao'),
+    )
+    return [
+        {
+            'id': schedule['id'],
+            'number': schedule['flight_number'],
+            'departureAirport': schedule['departure_icao'],
+            'arrivalAirport': schedule['arrival_icao'],
+            'aircraft': schedule['icao_type'],
+            'departureTime': schedule['departure_time'].strftime('%H:%M'),
+            'arrivalTime': schedule['arrival_time'].strftime('%H:%M'),
+            'days': [int(day) for day in schedule['days']],
+            'route': schedule['route'],
+            'distance': schedule['distance_nm'],
+        }
+        for schedule in schedules
+    ]
+
+
+LISTS = {
+    'airports': airport_rows,
+    'aircraft': aircraft_rows,
+    'schedules': schedule_rows,
+}
+
+
+class CatalogSnapshot:
+    """Encoded catalog lists of one version; never modified after it is built"""
+
+    def __init__(self, version):
+        from .views import PreEncodedJSON
+
+        self.version = version
+        self.payloads = {}
+        for name, rows in LISTS.items():
+            rows = rows()
+            payload = PreEncodedJSON(rows, CACHE_CONTROL, version=version, compress=True)
+            # The rows are only needed for encoding; the request log gets the size
+            payload.data = {'count': len(rows)}
+            self.payloads[name] = payload
+
+
+class Catalog:
+    """The worker's current CatalogSnapshot; thread-safe, one rebuild at a time"""
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _due(self):
+        return self._snapshot is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def refresh(self):
+        """Compare the stored version and rebuild the snapshot if it moved"""
+        # Only the first load waits; later checks leave the old snapshot to the other threads
+        if not self._lock.acquire(blocking=self._snapshot is None):
+            return
+        try:
+            if not self._due():
+                return
+            try:
+                version = current_version()
+                if self._snapshot is None or self._snapshot.version != version:
+                    self._snapshot = CatalogSnapshot(version)
+            except DatabaseError:
+                if self._snapshot is None:
+                    raise
+                logger.warning('Catalog not reloaded, serving version %s', self._snapshot.version, exc_info=True)
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def snapshot(self):
+        if self._due():
+            self.refresh()
+        return self._snapshot
+
+    async def asnapshot(self):
+        if self._due():
+            await sync_to_async(self.refresh)()
+        return self._snapshot
+
+    def invalidate(self):
+        """Check the version on the next request"""
+        self._checked_at = 0.0
+
+
+catalog = Catalog()
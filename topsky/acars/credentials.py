@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+
+def credential_key(identifier, secret):
+    """
+    Server-side HMAC of identifier + secret, so raw secrets are never kept in memory
+    """
+    return salted_hmac(
+        'acars.credentials.key', f"{identifier}\x00{secret}", algorithm='sha256'
+    ).digest()
+
+
+def credential_fingerprint(user):
+    """
+    Fingerprint of everything that can revoke a verified credential:
+    password hash, active flag and SmartCARS API key
+    """
+    profile = getattr(user, 'smartcars_profile', None)
+    api_key = profile.api_key if profile else ''
+    return salted_hmac(
+        'acars.credentials.fingerprint',
+        f"{user.password}\x00{user.is_active}\x00{api_key}",
+        algorithm='sha256',
+    ).digest()
+
+
+class VerifiedCredentialCache:
+    """
+    Bounded, TTL-evicting LRU cache of recently verified SmartCARS credentials.
+
+    Entries map credential_key(identifier, secret) to the user id and the
+    credential fingerprint at verification time. A hit lets the caller skip
+    the password hasher; the caller must still compare the fingerprint with
+    the freshly loaded user, so password, API key or is_active changes made
+    by another worker are picked up immediately.
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, identifier, secret):
+        """Return (user_id, fingerprint) for verified credentials or None"""
+        if not self.max_size:
+            return None
+        key = credential_key(identifier, secret)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user_id, fingerprint, expires_at = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return user_id, fingerprint
+
+    def add(self, identifier, secret, user):
+        """Remember credentials that were just verified for user"""
+        if not self.max_size:
+            return
+        key = credential_key(identifier, secret)
+        fingerprint = credential_fingerprint(user)
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (user.pk, fingerprint, expires_at)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def discard(self, identifier, secret):
+        """Forget a single credential pair (e.g. stale fingerprint)"""
+        key = credential_key(identifier, secret)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id):
+        """Forget every credential pair verified for user_id in this process"""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove(self, key):
+        # Caller must hold self._lock
+        user_id = self._entries.pop(key)[0]
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+credential_cache = VerifiedCredentialCache(
+    max_size=getattr(settings, 'SMARTCARS_CREDENTIAL_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'SMARTCARS_CREDENTIAL_CACHE_TTL', 300),
+)
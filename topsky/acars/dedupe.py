@@ -0,0 +1,138 @@
+"""
+Duplicate suppression for retried ACARS messages.
+
+A message repeats an earlier one of the same user when it carries the same
+client_msg_id, or the same msg_number, for the same report time. The report
+time is part of both keys: a retry resends it unchanged, msg_number alone
+restarts on every flight, and unique indexes on the partitioned acars_message
+must contain the partition key. The unique constraints on ACARSMessage
+enforce the same two keys in the database.
+
+A message with an id but no report time is stored at its arrival time, which
+differs on every retry (ingest.new_message marks it). It repeats a message
+with the same id that the user stored within the last UNTIMED_WINDOW; the
+database cannot enforce this, so only a retry racing its original gets by.
+
+drop_duplicates runs before a batch is assigned to flights. It first checks
+the per-process recent_keys filter of keys stored or seen lately, then asks
+the database for the keys that are left (one query for messages with a report
+time, one for those without). A retry that races its original past both
+checks is rejected by the unique index and save_messages runs the batch again.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from .models import ACARSMessage
+
+RECENT_KEYS = getattr(settings, 'SMARTCARS_DEDUPE_RECENT_KEYS', 200000)
+UNTIMED_WINDOW = timedelta(seconds=getattr(settings, 'SMARTCARS_DEDUPE_UNTIMED_WINDOW', 600))
+
+
+def _keys(user_id, client_msg_id, msg_number, timestamp):
+    keys = []
+    if client_msg_id:
+        keys.append(('client', user_id, client_msg_id, timestamp))
+    if msg_number is not None:
+        keys.append(('number', user_id, msg_number, timestamp))
+    return keys
+
+
+def message_keys(message):
+    """Keys a new message is looked up by; None stands for the report time it did not send"""
+    timestamp = None if getattr(message, 'arrival_time', False) else message.timestamp
+    return _keys(message.user_id, message.client_msg_id, message.msg_number, timestamp)
+
+
+def stored_message_keys(message):
+    return _keys(message.user_id, message.client_msg_id, message.msg_number, message.timestamp)
+
+
+class RecentKeys:
+    """
+    Keys of recently stored messages, in two generations of at most `size`
+    keys: when the current set fills up it becomes the previous one and the
+    oldest generation is forgotten. No false positives; misses (including keys
+    lost to a concurrent swap) fall back to the database check.
+    """
+
+    def __init__(self, size=RECENT_KEYS):
+        self.size = size
+        self.current = set()
+        self.previous = set()
+
+    def __contains__(self, key):
+        return key in self.current or key in self.previous
+
+    def add(self, keys):
+        for key in keys:
+            if len(self.current) >= self.size:
+                self.previous = self.current
+                self.current = set()
+            self.current.add(key)
+
+    def add_messages(self, messages):
+        for message in messages:
+            self.add(stored_message_keys(message))
+
+    def clear(self):
+        self.current = set()
+        self.previous = set()
+
+
+recent_keys = RecentKeys()
+
+
+def _query_keys(user_id, messages, since, until, timed):
+    client_ids = {message.client_msg_id for message in messages if message.client_msg_id}
+    numbers = {message.msg_number for message in messages if message.msg_number is not None}
+    condition = Q()
+    if client_ids:
+        # The redundant <> '' matches the predicate of the partial unique index
+        condition |= Q(client_msg_id__in=client_ids) & ~Q(client_msg_id='')
+    if numbers:
+        condition |= Q(msg_number__in=numbers)
+    rows = ACARSMessage.objects.filter(
+        condition, user_id=user_id,
+        # The time range prunes partitions; the exact match is checked by the caller
+        timestamp__range=(since, until),
+    ).values_list('client_msg_id', 'msg_number', 'timestamp')
+    keys = set()
+    for client_msg_id, msg_number, timestamp in rows:
+        keys.update(_keys(user_id, client_msg_id, msg_number, timestamp if timed else None))
+    return keys
+
+
+def stored_keys(user_id, messages):
+    """Keys of the candidate messages (all with ids) that the user has already stored"""
+    keys = set()
+    timed = [message for message in messages if not getattr(message, 'arrival_time', False)]
+    untimed = [message for message in messages if getattr(message, 'arrival_time', False)]
+    if timed:
+        timestamps = [message.timestamp for message in timed]
+        keys |= _query_keys(user_id, timed, min(timestamps), max(timestamps), timed=True)
+    if untimed:
+        timestamps = [message.timestamp for message in untimed]
+        keys |= _query_keys(user_id, untimed, min(timestamps) - UNTIMED_WINDOW, max(timestamps), timed=False)
+    return keys
+
+
+def drop_duplicates(messages):
+    """Messages of one user without the ones already stored or repeated within the batch"""
+    candidates = []
+    batch_keys = set()
+    for message in messages:
+        keys = message_keys(message)
+        if any(key in batch_keys or key in recent_keys for key in keys):
+            continue
+        batch_keys.update(keys)
+        candidates.append(message)
+    if not batch_keys:
+        return candidates
+
+    stored = stored_keys(messages[0].user_id, [message for message in candidates if message_keys(message)])
+    if not stored:
+        return candidates
+    # Remembered so that further retries of these are answered from memory (only
+    # keys with a report time: the others match by their age)
+    recent_keys.add(key for key in stored if key[3] is not None)
+    return [message for message in candidates if not any(key in stored for key in message_keys(message))]
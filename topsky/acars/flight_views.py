@@ -0,0 +1,195 @@
+"""
+Flights and their position tracks. Flights are opened and closed from the
+incoming ACARS messages (acars.tracks); authentication as for the messages API.
+The public live map stream (live_positions) is served from acars.live and
+the area query (live_area) from the in-memory index in acars.spatial.
+"""
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from .live import hub
+from .models import Flight
+from .phases import detect_phases
+from .request_log import log_request_details, log_response_details
+from .simplify import decode_levels, level_for, mercator_tolerance, simplify
+from .spatial import flight_index
+from .tracks import load_track
+from .views import authenticated_user
+
+FLIGHT_FIELDS = (
+    'id', 'flight_number', 'aircraft_id', 'route', 'status',
+    'started_at', 'last_report_at', 'ended_at',
+    'phase', 'out_at', 'off_at', 'on_at', 'in_at', 'landing_rate',
+)
+# From the flight's PIREP (acars.pireps); null until it is compacted
+PIREP_FIELDS = {
+    name: F(f'pirep__{name}')
+    for name in ('distance_nm', 'block_seconds', 'air_seconds', 'fuel_used', 'max_altitude')
+}
+
+
+@require_GET
+def flights(request):
+    """The user's most recent flights (?limit=20, at most 200)"""
+    log_request_details(request, "FLIGHTS")
+
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 200))
+    except ValueError:
+        limit = 20
+    queryset = Flight.objects.filter(user_id=user.pk).order_by('-started_at')
+    results = list(queryset.values(*FLIGHT_FIELDS, compacted_points=F('track__point_count'), **PIREP_FIELDS)[:limit])
+    log_response_details(request, {'count': len(results)}, 200)
+    return JsonResponse({'count': len(results), 'results': results})
+
+
+def _detail(request):
+    """(zoom, tolerance) from ?zoom=<0-22> or ?tolerance=<metres>; (None, None) for the full track"""
+    try:
+        if request.GET.get('zoom') not in (None, ''):
+            zoom = max(0, min(int(request.GET['zoom']), 22))
+            return zoom, mercator_tolerance(zoom)
+        if request.GET.get('tolerance') not in (None, ''):
+            return None, max(0.0, float(request.GET['tolerance']))
+    except ValueError:
+        raise ValueError('zoom must be an integer and tolerance a number of metres')
+    return None, None
+
+
+def _level_of_detail(flight, track, zoom, tolerance):
+    """The track at the requested detail and the level served ({zoom, tolerance} or None)"""
+    levels = getattr(flight, 'track', None) and flight.track.levels
+    if levels:
+        # Completed flight: serve the coarsest precomputed level that is detailed enough
+        levels = decode_levels(levels)
+        level_zoom = level_for(levels, tolerance=tolerance)
+        if level_zoom is None:
+            return track, None
+        return track.take(levels[level_zoom]), {
+            'zoom': level_zoom, 'tolerance': mercator_tolerance(level_zoom),
+        }
+    return simplify(track, tolerance), {'zoom': zoom, 'tolerance': tolerance}
+
+
+@require_GET
+def flight_track(request, flight_id):
+    """
+    Position track of one flight as columns:
+    {flight, status, compacted, total_count, level, phases, count, t, lat, lon, altitude, speed, heading}
+    ?zoom=<map zoom> or ?tolerance=<metres> returns a simplified track (Douglas-Peucker in
+    Web Mercator); without them every point is returned and level is null.
+    phases is [[phase, first ms, last ms], ...] over the full track (acars.phases).
+    """
+    log_request_details(request, "FLIGHT_TRACK")
+
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+
+    try:
+        zoom, tolerance = _detail(request)
+    except ValueError as exc:
+        error_data = {'error': str(exc)}
+        log_response_details(request, error_data, 400)
+        return JsonResponse(error_data, status=400)
+
+    flight = Flight.objects.select_related('track').filter(pk=flight_id, user_id=user.pk).first()
+    if flight is None:
+        error_data = {'error': 'Flight not found'}
+        log_response_details(request, error_data, 404)
+        return JsonResponse(error_data, status=404)
+
+    track = load_track(flight)
+    total_count = len(track)
+    # Stored when compacted; a live track is classified on the fly
+    phases = flight.phases if flight.phases else detect_phases(track).segments(track.times)
+    level = None
+    if tolerance is not None:
+        track, level = _level_of_detail(flight, track, zoom, tolerance)
+    response_data = {
+        'flight': flight.pk,
+        'status': flight.status,
+        'compacted': hasattr(flight, 'track'),
+        'total_count': total_count,
+        'level': level,
+        'phases': phases,
+        **track.as_json(),
+    }
+    log_response_details(request, {'flight': flight.pk, 'count': len(track)}, 200)
+    return JsonResponse(response_data)
+
+
+@require_GET
+async def live_positions(request):
+    """
+    Server-Sent Events stream for the live map (ASGI only, public): a 'snapshot'
+    event with the known positions, then 'position' events with the newest
+    position of every flight that moved, at most once per SMARTCARS_LIVE_FLUSH_INTERVAL.
+    Under topsky.asgi these requests are answered by acars.live.LiveStreamRouter
+    before Django; this view covers other ASGI setups and refuses WSGI.
+    """
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for the whole connection
+        return JsonResponse({'error': 'The live map is only served by topsky.asgi'}, status=503)
+
+    subscriber = hub.subscribe()
+    response = StreamingHttpResponse(subscriber.stream(await hub.asnapshot()), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+MAX_AREA_RESULTS = 2000
+
+
+def _area(request):
+    """('bbox', south, west, north, east) or ('radius', lat, lon, km) from the query string"""
+    try:
+        if request.GET.get('bbox'):
+            south, west, north, east = (float(value) for value in request.GET['bbox'].split(','))
+            if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+                raise ValueError
+            return 'bbox', south, west, north, east
+        lat, lon = float(request.GET['lat']), float(request.GET['lon'])
+        radius_km = float(request.GET.get('radius_km', 100))
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 < radius_km <= 20000):
+            raise ValueError
+        return 'radius', lat, lon, radius_km
+    except (KeyError, ValueError):
+        raise ValueError(
+            'Pass bbox=<south>,<west>,<north>,<east> (west > east crosses the antimeridian) '
+            'or lat, lon and radius_km (default 100)'
+        )
+
+
+@require_GET
+def live_area(request):
+    """
+    Live flights in a map viewport (?bbox=south,west,north,east) or around a point
+    (?lat=&lon=&radius_km=, nearest first with distance_km); public like the live
+    stream. Answered from acars.spatial.flight_index; ?limit= up to 2000.
+    """
+    log_request_details(request, "LIVE_AREA")
+
+    try:
+        area = _area(request)
+    except ValueError as exc:
+        error_data = {'error': str(exc)}
+        log_response_details(request, error_data, 400)
+        return JsonResponse(error_data, status=400)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', MAX_AREA_RESULTS)), MAX_AREA_RESULTS))
+    except ValueError:
+        limit = MAX_AREA_RESULTS
+
+    if area[0] == 'bbox':
+        results = flight_index.bbox(*area[1:], limit=limit)
+    else:
+        results = flight_index.radius(*area[1:], limit=limit)
+    log_response_details(request, {'count': len(results)}, 200)
+    return JsonResponse({'count': len(results), 'results': results})
@@ -0,0 +1,323 @@
+"""
+ACARS message ingestion.
+
+Incoming messages are validated by a small table of field parsers (no DRF
+serializer per item) and written with bulk_create, one transaction per batch.
+Invalid items are reported by index and skipped; the valid ones are stored.
+Hot payload values are copied into their shadow columns (acars.payload_fields).
+Resent messages (same client_msg_id or msg_number and timestamp, or for
+messages sent without a timestamp the same id stored lately) are dropped and
+counted as duplicates (acars.dedupe).
+NDJSON uploads are read from the request stream line by line and committed
+in chunks (ingest_ndjson). Every stored message is attached to the sender's
+live Flight (acars.tracks.assign_flights), whose phase and OOOI times follow
+its positions (acars.phases), and counted in the pilot's totals
+(acars.stats); the newest position becomes the pilot's LatestPosition
+(acars.latest) and is published to the live map once committed (acars.live).
+"""
+import json
+import math
+from functools import partial
+from datetime import time, timezone as dt_timezone
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from .dedupe import drop_duplicates, recent_keys
+from .latest import latest_cache, record_latest
+from .live import publish_positions
+from .models import ACARSMessage
+from .payload_fields import extract_payload_fields
+from .phases import track_live_phases
+from .stats import record_messages
+from .tracks import assign_flights
+
+MAX_BATCH = getattr(settings, 'SMARTCARS_INGEST_MAX_BATCH', 5000)
+BULK_BATCH_SIZE = 1000
+NDJSON_CHUNK_SIZE = getattr(settings, 'SMARTCARS_NDJSON_CHUNK_SIZE', 1000)
+NDJSON_MAX_LINE = 64 * 1024
+# A batch that loses a race with a concurrent resend is deduplicated again
+SAVE_ATTEMPTS = 3
+# Only the first errors are echoed back; the counts are always complete
+MAX_REPORTED_ERRORS = 100
+
+
+class FieldError(ValueError):
+    pass
+
+
+def _string(max_length):
+    def parse(value):
+        if not isinstance(value, str):
+            raise FieldError('Must be a string')
+        if len(value) > max_length:
+            raise FieldError(f"At most {max_length} characters")
+        return value
+    return parse
+
+
+def _integer(low, high):
+    def parse(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise FieldError('Must be a number')
+        value = int(round(value))
+        if not low <= value <= high:
+            raise FieldError(f"Must be between {low} and {high}")
+        return value
+    return parse
+
+
+def _number(low, high):
+    # Floats go straight to the DecimalField, which rounds them to its decimal_places
+    def parse(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise FieldError('Must be a number')
+        if not low <= value <= high:
+            raise FieldError(f"Must be between {low} and {high}")
+        return value
+    return parse
+
+
+def _time(value):
+    if not isinstance(value, str):
+        raise FieldError('Must be a HH:MM[:SS] string')
+    try:
+        return time.fromisoformat(value)
+    except ValueError:
+        raise FieldError('Must be a HH:MM[:SS] string')
+
+
+def _direction(value):
+    if value not in ('IN', 'OUT'):
+        raise FieldError("Must be 'IN' or 'OUT'")
+    return value
+
+
+def _payload(value):
+    if not isinstance(value, dict):
+        raise FieldError('Must be an object')
+    return value
+
+
+def parse_timestamp(value):
+    if not isinstance(value, str):
+        raise FieldError('Must be an ISO 8601 string')
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise FieldError('Must be an ISO 8601 string')
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+
+FIELD_PARSERS = {
+    'aircraft_id': _string(10),
+    'flight_number': _string(10),
+    'route': _string(50),
+    'latitude': _number(-90, 90),
+    'longitude': _number(-180, 180),
+    'altitude': _integer(-2000, 100000),
+    'speed': _integer(0, 5000),
+    'heading': _integer(0, 360),
+    'time_off': _time,
+    'time_on': _time,
+    'engine_n1': _number(0, 999.99),
+    'engine_epr': _number(0, 999.99),
+    'fuel_flow': _number(0, 99999.99),
+    'pax_count': _integer(0, 10000),
+    'cost_index': _integer(0, 9999),
+    'transmission_mode': _string(4),
+    'label': _string(2),
+    # The IntegerField range; a larger value would fail the whole batch's insert
+    'msg_number': _integer(-2 ** 31, 2 ** 31 - 1),
+    'client_msg_id': _string(64),
+    'direction': _direction,
+    'payload': _payload,
+    'timestamp': parse_timestamp,
+}
+
+
+def validate_message(data):
+    """
+    Validate one incoming message.
+    Returns (field values, None) or (None, {field: error}).
+    Unknown fields are ignored; null means "not sent". The shadow columns are
+    always taken from the payload, never from the message itself.
+    """
+    if not isinstance(data, dict):
+        return None, {'non_field_errors': 'Message must be a JSON object'}
+
+    values = {}
+    errors = {}
+    for name, value in data.items():
+        parser = FIELD_PARSERS.get(name)
+        if parser is None or value is None:
+            continue
+        try:
+            values[name] = parser(value)
+        except FieldError as exc:
+            errors[name] = str(exc)
+    if errors:
+        return None, errors
+
+    if 'timestamp' not in values:
+        # Report time from the client's payload; without one the message gets
+        # its arrival time (new_message)
+        reported = values.get('payload', {}).get('timestamp')
+        if reported:
+            try:
+                values['timestamp'] = parse_timestamp(reported)
+            except FieldError as exc:
+                return None, {'payload.timestamp': str(exc)}
+    values.update(extract_payload_fields(values.get('payload')))
+    return values, None
+
+
+def new_message(user_id, values):
+    """
+    Unsaved ACARSMessage of validated values. One without a report time gets
+    the arrival time (the field default) and is marked, so that acars.dedupe
+    recognises its resends by their ids alone.
+    """
+    message = ACARSMessage(user_id=user_id, **values)
+    message.arrival_time = 'timestamp' not in values
+    return message
+
+
+def build_messages(user, items, start_index=0):
+    """
+    Validate items into unsaved ACARSMessage objects.
+    Returns (messages, errors) where errors are {'index', 'errors'} dicts.
+    """
+    messages = []
+    errors = []
+    for index, item in enumerate(items, start_index):
+        values, item_errors = validate_message(item)
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+        else:
+            # user_id rather than user: a session-token user is never loaded
+            messages.append(new_message(user.pk, values))
+    return messages, errors
+
+
+def save_messages(messages):
+    """
+    Write a batch of validated messages of one user in one transaction.
+    Resends of stored messages are dropped first (acars.dedupe); returns the
+    messages that were stored.
+    """
+    user_id = messages[0].user_id
+    for attempt in range(SAVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                unique = drop_duplicates(messages)
+                if not unique:
+                    return []
+                opened = assign_flights(user_id, unique)
+                created = ACARSMessage.objects.bulk_create(unique, batch_size=BULK_BATCH_SIZE)
+                record_messages(user_id, created, opened)
+                track_live_phases(created)
+                if record_latest(created) is not None:
+                    transaction.on_commit(partial(latest_cache.discard, user_id))
+                transaction.on_commit(partial(recent_keys.add_messages, created))
+                transaction.on_commit(partial(publish_positions, created))
+                return created
+        except IntegrityError:
+            # A concurrent resend committed first; the next pass drops it
+            if attempt == SAVE_ATTEMPTS - 1:
+                raise
+            for message in messages:
+                # Ids given by a bulk_create batch that was rolled back
+                message.pk = None
+                message._state.adding = True
+
+
+def ingest_messages(user, items):
+    """Validate and store a batch; returns the summary sent back to the client"""
+    messages, errors = build_messages(user, items)
+    created = save_messages(messages) if messages else []
+    return {
+        'created_count': len(created),
+        'duplicate_count': len(messages) - len(created),
+        'error_count': len(errors),
+        'errors': errors,
+    }
+
+
+def _ndjson_lines(stream, max_line):
+    """Yield (line number, bytes or None for an overlong line) without buffering the upload"""
+    number = 0
+    while True:
+        line = stream.readline(max_line)
+        if not line:
+            return
+        number += 1
+        if len(line) == max_line and not line.endswith(b'\n'):
+            # Discard the rest of an overlong line
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line)
+            yield number, None
+            continue
+        yield number, line
+
+
+def ingest_ndjson(user, stream, chunk_size=NDJSON_CHUNK_SIZE, max_line=NDJSON_MAX_LINE):
+    """
+    Read newline-delimited JSON messages from stream and commit them every
+    chunk_size valid lines, so memory stays flat for any upload size.
+    Blank lines are skipped; errors are reported by 1-based line number.
+    """
+    accepted = 0
+    duplicates = 0
+    rejected = 0
+    errors = []
+    pending = []
+    pending_lines = []
+
+    def reject(number, line_errors):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': number, 'errors': line_errors})
+
+    def flush():
+        nonlocal accepted, duplicates
+        messages, item_errors = build_messages(user, pending)
+        for item_error in item_errors:
+            reject(pending_lines[item_error['index']], item_error['errors'])
+        if messages:
+            created = save_messages(messages)
+            accepted += len(created)
+            duplicates += len(messages) - len(created)
+        pending.clear()
+        pending_lines.clear()
+
+    for number, line in _ndjson_lines(stream, max_line):
+        if line is None:
+            reject(number, {'non_field_errors': f"Line longer than {max_line} bytes"})
+            continue
+        if not line.strip():
+            continue
+        try:
+            pending.append(json.loads(line))
+        except (ValueError, UnicodeDecodeError):
+            reject(number, {'non_field_errors': 'Invalid JSON'})
+            continue
+        pending_lines.append(number)
+        if len(pending) >= chunk_size:
+            flush()
+    if pending:
+        flush()
+    errors.sort(key=lambda error: error['line'])
+
+    return {
+        'accepted_count': accepted,
+        'duplicate_count': duplicates,
+        'rejected_count': rejected,
+        'errors': errors,
+        'errors_truncated': rejected > len(errors),
+    }
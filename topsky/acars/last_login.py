@@ -0,0 +1,101 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    """
+    Coalescing write-behind buffer for SmartcarsProfile.last_login.
+
+    Logins only record the latest timestamp per profile in memory; a background
+    thread writes everything pending with one bulk_update every flush_interval
+    seconds (and once more at worker shutdown). Logins closer than
+    min_update_interval to the stored value are not recorded at all.
+    With flush_interval = 0 every login is written immediately.
+    """
+
+    def __init__(self, flush_interval=30, min_update_interval=60):
+        self.flush_interval = flush_interval
+        self.min_update_interval = timedelta(seconds=min_update_interval)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def touch(self, profile, when=None):
+        """Record a login for profile; returns False when it was coalesced away"""
+        when = when or timezone.now()
+        with self._lock:
+            last = self._pending.get(profile.pk) or profile.last_login
+            if last and when - last < self.min_update_interval:
+                return False
+            self._pending[profile.pk] = when
+        profile.last_login = when
+
+        if not self.flush_interval:
+            self.flush()
+        else:
+            self._ensure_worker()
+        return True
+
+    def flush(self):
+        """Write all pending timestamps with a single bulk_update"""
+        from .models import SmartcarsProfile
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        profiles = [SmartcarsProfile(pk=pk, last_login=when) for pk, when in pending.items()]
+        try:
+            SmartcarsProfile.objects.bulk_update(profiles, ['last_login'])
+        except Exception:
+            logger.exception("Failed to flush %d SmartCARS last_login updates", len(pending))
+            # Put them back unless a newer login was recorded meanwhile
+            with self._lock:
+                for pk, when in pending.items():
+                    if pk not in self._pending or self._pending[pk] < when:
+                        self._pending[pk] = when
+            return 0
+        return len(profiles)
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so (re)start per worker process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='smartcars-last-login', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # The flush thread owns its own DB connection; don't keep it idle
+                connection.close()
+
+
+last_login_buffer = LastLoginBuffer(
+    flush_interval=getattr(settings, 'SMARTCARS_LAST_LOGIN_FLUSH_INTERVAL', 30),
+    min_update_interval=getattr(settings, 'SMARTCARS_LAST_LOGIN_MIN_INTERVAL', 60),
+)
+
+# Flush on worker shutdown (gunicorn workers exit through sys.exit)
+atexit.register(last_login_buffer.flush)
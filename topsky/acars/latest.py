@@ -0,0 +1,137 @@
+"""
+Last known position of every pilot.
+
+save_messages upserts the newest position of each batch into LatestPosition
+with INSERT ... ON CONFLICT DO UPDATE, guarded by the report time, so a late
+batch of older reports never overwrites a newer position. Reads go through a
+per-process read-through cache (latest_cache): ingest in this process evicts
+the pilot once its batch commits, other processes see the change within
+CACHE_TTL seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from .models import ACARSMessage, LatestPosition
+
+CACHE_TTL = getattr(settings, 'SMARTCARS_LATEST_CACHE_SECONDS', 5)
+CACHE_SIZE = getattr(settings, 'SMARTCARS_LATEST_CACHE_SIZE', 10000)
+REBUILD_BATCH_SIZE = 1000
+
+# Columns copied from the message; message_id is its id
+COPIED_FIELDS = (
+    'flight_id', 'aircraft_id', 'flight_number', 'route', 'latitude', 'longitude',
+    'altitude', 'speed', 'heading', 'timestamp',
+)
+POSITION_FIELDS = ('message_id',) + COPIED_FIELDS
+
+
+def newest_position(messages):
+    """The newest message with coordinates, or None"""
+    newest = None
+    for message in messages:
+        if message.latitude is None or message.longitude is None:
+            continue
+        if newest is None or message.timestamp >= newest.timestamp:
+            newest = message
+    return newest
+
+
+def _upsert_sql(row_count):
+    quote = connection.ops.quote_name
+    table = quote(LatestPosition._meta.db_table)
+    columns = ['user_id', 'message_id'] + [
+        LatestPosition._meta.get_field(name).column for name in COPIED_FIELDS
+    ]
+    row = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    updated = [column for column in columns if column != 'user_id']
+    return (
+        f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES {', '.join([row] * row_count)} "
+        f"ON CONFLICT ({quote('user_id')}) DO UPDATE SET "
+        + ', '.join(f"{quote(column)} = EXCLUDED.{quote(column)}" for column in updated)
+        + f" WHERE {table}.{quote('timestamp')} <= EXCLUDED.{quote('timestamp')}"
+    )
+
+
+def upsert_positions(messages):
+    """Store each message as its user's latest position unless a newer one is stored"""
+    if not messages:
+        return
+    fields = [LatestPosition._meta.get_field(name) for name in COPIED_FIELDS]
+    params = []
+    for message in messages:
+        params += [message.user_id, message.pk]
+        params += [field.get_db_prep_save(getattr(message, field.attname), connection) for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_sql(len(messages)), params)
+
+
+def record_latest(messages):
+    """Upsert the newest position of a saved batch of one user (inside its transaction)"""
+    newest = newest_position(messages)
+    if newest is not None:
+        upsert_positions([newest])
+    return newest
+
+
+def rebuild_latest_positions(user_ids=None):
+    """Fill LatestPosition from acars_message (newest positioned message per user)"""
+    from django.contrib.auth import get_user_model
+
+    newest = ACARSMessage.objects.filter(
+        user=OuterRef('pk'), latitude__isnull=False, longitude__isnull=False,
+    ).order_by('-timestamp')
+    users = get_user_model().objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    ids = [
+        pk for pk in users.annotate(position_id=Subquery(newest.values('id')[:1]))
+        .values_list('position_id', flat=True) if pk is not None
+    ]
+    for start in range(0, len(ids), REBUILD_BATCH_SIZE):
+        batch = ACARSMessage.objects.filter(id__in=ids[start:start + REBUILD_BATCH_SIZE]).only(
+            'id', 'user_id', *COPIED_FIELDS
+        )
+        upsert_positions(list(batch))
+    latest_cache.clear()
+    return len(ids)
+
+
+class LatestPositionCache:
+    """Bounded LRU of {user id: position dict or None} with a time to live"""
+
+    def __init__(self, ttl=CACHE_TTL, max_size=CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """The user's latest position as a dict of POSITION_FIELDS, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(user_id)
+                return entry[1]
+        position = LatestPosition.objects.filter(user_id=user_id).values(*POSITION_FIELDS).first()
+        with self._lock:
+            self.entries[user_id] = (now + self.ttl, position)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return position
+
+    def discard(self, user_id):
+        with self._lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+latest_cache = LatestPositionCache()
@@ -0,0 +1,340 @@
+"""
+Live flight map fan-out.
+
+Ingest publishes the latest position of every flight in a committed batch to
+the configured bridge (SMARTCARS_LIVE_BRIDGE). Each ASGI process runs one
+LiveHub on its event loop: updates are coalesced to the newest position per
+flight and flushed every FLUSH_INTERVAL as a single pre-encoded SSE frame that
+is shared by all subscribers. Every subscriber has a small bounded frame
+queue; a viewer whose queue is full (the client is not reading) is dropped and
+reconnects on its own through EventSource. New viewers first get a snapshot
+of the known positions; after a restart the hub seeds it from LatestPosition
+(acars.latest) before the first snapshot, so the map is not empty until every
+aircraft reports again.
+
+Under ASGI the stream does not go through Django's request handling at all:
+LiveStreamRouter (wrapped around the application in topsky.asgi) recognises
+the live_positions URL and writes frames straight to the connection, so an
+idle viewer costs one small task and a connection costs no middleware thread
+hops.
+
+LocalBridge delivers inside one process (development, tests, a single ASGI
+worker that also ingests). RedisBridge goes through Redis pub/sub so ingest in
+any worker or replica reaches viewers connected to any other.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from functools import lru_cache
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils.module_loading import import_string
+from .spatial import flight_index, load_live_positions
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'SMARTCARS_LIVE_FLUSH_INTERVAL', 1.0)
+QUEUE_SIZE = getattr(settings, 'SMARTCARS_LIVE_QUEUE_SIZE', 16)
+HEARTBEAT_INTERVAL = getattr(settings, 'SMARTCARS_LIVE_HEARTBEAT', 15)
+# Positions not updated for this long are left out of the snapshot sent on connect
+STALE_AFTER = getattr(settings, 'SMARTCARS_LIVE_STALE_AFTER', 600)
+RETRY_MS = 5000
+HEARTBEAT_FRAME = b': ping\n\n'
+
+
+def sse_frame(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class Subscriber:
+    """One connected viewer: a bounded queue of frames"""
+
+    def __init__(self, hub, queue_size):
+        self.hub = hub
+        self.queue_size = queue_size
+        self.frames = deque()
+        self.wakeup = asyncio.Event()
+        self.dropped = False
+
+    def offer(self, frame):
+        if len(self.frames) >= self.queue_size:
+            # Not reading: drop rather than buffer without bound
+            self.dropped = True
+            self.hub.unsubscribe(self)
+            self.hub.dropped_count += 1
+        else:
+            self.frames.append(frame)
+        self.wakeup.set()
+
+    async def stream(self, snapshot, heartbeat=HEARTBEAT_INTERVAL):
+        """Async iterator of SSE bytes for a streaming response"""
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode() + snapshot
+            while not self.dropped:
+                if not self.frames:
+                    self.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        yield HEARTBEAT_FRAME
+                        continue
+                while self.frames:
+                    yield self.frames.popleft()
+        finally:
+            self.hub.unsubscribe(self)
+
+
+class LiveHub:
+    """In-process pub/sub of flight positions, bound to the serving event loop"""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, queue_size=QUEUE_SIZE):
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.pending = {}
+        self.latest = {}
+        self.dropped_count = 0
+        self._loop = None
+        self._tasks = []
+        self._seed = None
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        # First subscriber on this loop (or the previous loop has gone away)
+        self._loop = loop
+        self._seed = None
+        self._tasks = [loop.create_task(self._flush_forever())]
+        listener = get_bridge().listen(self)
+        if listener is not None:
+            self._tasks.append(loop.create_task(listener))
+
+    def publish(self, updates):
+        """Queue updates for the next flush; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self.collect, updates)
+        except RuntimeError:
+            pass
+
+    def collect(self, updates):
+        """Coalesce updates into the next frame (event loop thread only)"""
+        for update in updates:
+            current = self.pending.get(update['flight'])
+            if current is None or update['t'] >= current['t']:
+                self.pending[update['flight']] = update
+
+    async def _flush_forever(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Live map flush failed')
+
+    def flush(self):
+        if not self.pending:
+            return
+        updates = list(self.pending.values())
+        self.latest.update(self.pending)
+        self.pending.clear()
+        frame = sse_frame('position', updates)
+        for subscriber in list(self.subscribers):
+            subscriber.offer(frame)
+
+    def snapshot(self):
+        cutoff = (time.time() - STALE_AFTER) * 1000
+        self.latest = {flight: update for flight, update in self.latest.items() if update['t'] >= cutoff}
+        return sse_frame('snapshot', list(self.latest.values()))
+
+    async def asnapshot(self):
+        """snapshot() once the hub has been seeded from the stored positions"""
+        if self._seed is None:
+            self._seed = asyncio.ensure_future(self._load_seed())
+        # Viewers connecting while the seed loads wait for the same query
+        await asyncio.shield(self._seed)
+        return self.snapshot()
+
+    async def _load_seed(self):
+        try:
+            updates = await sync_to_async(load_live_positions)(STALE_AFTER)
+        except Exception:
+            # The next viewer tries again; until then only live updates are shown
+            logger.exception('Live map not seeded from stored positions')
+            self._seed = None
+            return
+        for update in updates:
+            current = self.latest.get(update['flight'])
+            if current is None or update['t'] > current['t']:
+                self.latest[update['flight']] = update
+
+    def subscribe(self):
+        """Register a viewer; must be called on the serving event loop"""
+        self._ensure_started()
+        subscriber = Subscriber(self, self.queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+
+hub = LiveHub()
+
+STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+async def serve_stream(scope, receive, send):
+    """Stream the live map to one ASGI http connection until it disconnects"""
+    subscriber = hub.subscribe()
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscriber.dropped = True
+        subscriber.wakeup.set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': STREAM_HEADERS})
+        async for chunk in subscriber.stream(await hub.asnapshot()):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not watcher.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    except OSError:
+        pass
+    finally:
+        watcher.cancel()
+        hub.unsubscribe(subscriber)
+
+
+@lru_cache(maxsize=1024)
+def _is_stream_path(path):
+    from .flight_views import live_positions
+
+    try:
+        return resolve(path).func is live_positions
+    except Resolver404:
+        return False
+
+
+class LiveStreamRouter:
+    """ASGI wrapper: GET requests for the live_positions URL are served by serve_stream"""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET' and _is_stream_path(scope['path']):
+            return await serve_stream(scope, receive, send)
+        return await self.application(scope, receive, send)
+
+
+class LocalBridge:
+    """Delivers updates to this process's hub only"""
+
+    def publish(self, updates):
+        hub.publish(updates)
+
+    def listen(self, hub):
+        return None
+
+
+class RedisBridge:
+    """Redis pub/sub between processes and replicas (REDIS_URL)"""
+
+    channel = 'topsky:live-positions'
+
+    def __init__(self, url=None):
+        self.url = url or settings.REDIS_URL
+        self._client = None
+
+    def publish(self, updates):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        try:
+            self._client.publish(self.channel, json.dumps(updates, separators=(',', ':')))
+        except redis.RedisError:
+            logger.warning('Live map update not published', exc_info=True)
+
+    async def listen(self, hub):
+        import redis.asyncio as aioredis
+        from redis.exceptions import RedisError
+
+        while True:
+            client = aioredis.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            updates = json.loads(message['data'])
+                            hub.collect(updates)
+                            flight_index.update(updates)
+            except RedisError:
+                logger.warning('Live map Redis subscription lost, retrying', exc_info=True)
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+_bridge = None
+
+
+def get_bridge():
+    global _bridge
+    if _bridge is None:
+        path = getattr(settings, 'SMARTCARS_LIVE_BRIDGE', None) or (
+            'acars.live.RedisBridge' if getattr(settings, 'REDIS_URL', None) else 'acars.live.LocalBridge'
+        )
+        _bridge = import_string(path)()
+    return _bridge
+
+
+def position_updates(messages):
+    """Newest position per flight of saved messages, as sent to map viewers"""
+    latest = {}
+    for message in messages:
+        if message.flight_id is None or message.latitude is None or message.longitude is None:
+            continue
+        current = latest.get(message.flight_id)
+        if current is None or message.timestamp >= current.timestamp:
+            latest[message.flight_id] = message
+    return [
+        {
+            'flight': message.flight_id,
+            'flight_number': message.flight_number,
+            'aircraft_id': message.aircraft_id,
+            'route': message.route,
+            'lat': float(message.latitude),
+            'lon': float(message.longitude),
+            'altitude': message.altitude,
+            'speed': message.speed,
+            'heading': message.heading,
+            't': int(message.timestamp.timestamp() * 1000),
+        }
+        for message in latest.values()
+    ]
+
+
+def publish_positions(messages):
+    """Hand the positions of a committed batch to the spatial index and the bridge (never raises)"""
+    try:
+        updates = position_updates(messages)
+        if updates:
+            flight_index.update(updates)
+            get_bridge().publish(updates)
+    except Exception:
+        logger.exception('Live map publish failed')
@@ -0,0 +1,79 @@
+from datetime import datetime, timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
+from acars import archive
+from acars.models import MessageArchive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed months of acars_message into compressed columnar files in "
+        "SMARTCARS_ARCHIVE_DIR: write, verify against the database, then delete the rows "
+        "in batches. Closed flights of the month are compacted first. Run monthly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month', action='append', dest='months', metavar='YYYY-MM',
+            help='Archive this month (repeatable); default: every month older than --after-months',
+        )
+        parser.add_argument(
+            '--after-months', type=int, default=archive.ARCHIVE_AFTER_MONTHS,
+            help='Archive months that ended at least this many months ago',
+        )
+        parser.add_argument('--keep-rows', action='store_true', help='Keep the rows after verifying the file')
+        parser.add_argument(
+            '--delete-batch-size', type=int, default=archive.DELETE_BATCH_SIZE,
+            help='Rows deleted per transaction',
+        )
+        parser.add_argument('--verify', action='store_true', help='Only re-check the checksums of existing archives')
+        parser.add_argument('--dry-run', action='store_true', help='Only print the months that would be archived')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            failed = 0
+            for message_archive in MessageArchive.objects.order_by('month', 'first_id'):
+                try:
+                    archive.verify_archive(message_archive)
+                except (archive.ArchiveError, OSError) as exc:
+                    failed += 1
+                    self.stderr.write(f"{message_archive.file_name}: {exc}")
+                else:
+                    self.stdout.write(f"{message_archive.file_name}: ok")
+            if failed:
+                raise CommandError(f"{failed} archive(s) failed verification")
+            return
+
+        if options['months']:
+            try:
+                months = [
+                    datetime.strptime(month, '%Y-%m').replace(tzinfo=dt_timezone.utc)
+                    for month in options['months']
+                ]
+            except ValueError:
+                raise CommandError('--month must be YYYY-MM')
+        else:
+            months = archive.archivable_months(max(1, options['after_months']))
+        if not months:
+            self.stdout.write("Nothing to archive")
+            return
+
+        for month in months:
+            if options['dry_run']:
+                self.stdout.write(f"Would archive {month:%Y-%m}")
+                continue
+            try:
+                message_archive = archive.archive_month(
+                    month, keep_rows=options['keep_rows'],
+                    delete_batch_size=max(1, options['delete_batch_size']),
+                )
+            except archive.ArchiveError as exc:
+                self.stderr.write(f"{month:%Y-%m}: {exc}")
+                continue
+            if message_archive is None:
+                self.stdout.write(f"{month:%Y-%m}: nothing new to archive")
+                continue
+            deleted = 'kept' if options['keep_rows'] else 'deleted'
+            self.stdout.write(self.style.SUCCESS(
+                f"{month:%Y-%m}: {message_archive.row_count} message(s) -> {message_archive.file_name} "
+                f"({message_archive.size} bytes), rows {deleted}"
+            ))
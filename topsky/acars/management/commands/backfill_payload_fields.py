@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from acars.ingest import FieldError, parse_timestamp
+from acars.models import ACARSMessage
+from acars.payload_fields import COLUMNS, extract_payload_fields
+
+# Rows per UPDATE statement (7 parameters each, under SQLite's 32766 limit)
+UPDATE_BATCH_SIZE = 500
+
+
+def store_columns(rows):
+    """
+    Write shadow column values, given as (id, timestamp, {column: value}), in one
+    UPDATE ... FROM a VALUES list (PostgreSQL, SQLite 3.33+). Rows are matched by
+    (id, timestamp) so PostgreSQL prunes partitions; bulk_update's CASE
+    expression grows too slow with the batch size.
+    """
+    quote = connection.ops.quote_name
+    table = quote(ACARSMessage._meta.db_table)
+    fields = [ACARSMessage._meta.get_field(column) for column in COLUMNS]
+    timestamp_field = ACARSMessage._meta.get_field('timestamp')
+    # Typed placeholders, so a column that is NULL in the first row is not taken as text
+    row_sql = '(%s, %s, ' + ', '.join(f'CAST(%s AS {field.db_type(connection)})' for field in fields) + ')'
+    params = []
+    for pk, timestamp, values in rows:
+        params += [pk, timestamp_field.get_db_prep_save(timestamp, connection)]
+        params += [field.get_db_prep_save(values[field.name], connection) for field in fields]
+    names = ['id', 'timestamp'] + [field.column for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"WITH v ({', '.join(quote(name) for name in names)}) AS (VALUES {', '.join([row_sql] * len(rows))}) "
+            f"UPDATE {table} SET {', '.join(f'{quote(field.column)} = v.{quote(field.column)}' for field in fields)} "
+            f"FROM v WHERE {table}.{quote('id')} = v.{quote('id')} AND {table}.{quote('timestamp')} = v.{quote('timestamp')}",
+            params,
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy payload values into the shadow columns (simulator, aircraft_type, weather) "
+        "of stored messages, in batches by id. Run after deploying the columns or after "
+        "changing SMARTCARS_PAYLOAD_FIELDS; rows that already match are left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Messages per batch')
+        parser.add_argument('--since', help='Only messages reported at or after this ISO 8601 time')
+        parser.add_argument('--until', help='Only messages reported before this ISO 8601 time')
+
+    def handle(self, *args, **options):
+        messages = ACARSMessage.objects.exclude(payload={})
+        try:
+            if options['since']:
+                messages = messages.filter(timestamp__gte=parse_timestamp(options['since']))
+            if options['until']:
+                messages = messages.filter(timestamp__lt=parse_timestamp(options['until']))
+        except FieldError as exc:
+            raise CommandError(f"--since/--until: {exc}")
+        # Plain tuples: building model instances would cost more than the extraction
+        messages = messages.order_by('pk').values_list('pk', 'timestamp', 'payload', *COLUMNS)
+
+        batch_size = max(1, options['batch_size'])
+        scanned = updated = 0
+        last_pk = None
+        while True:
+            batch = messages.filter(pk__gt=last_pk) if last_pk is not None else messages
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            changed = []
+            for pk, timestamp, payload, *stored in batch:
+                values = extract_payload_fields(payload)
+                if list(values.values()) != stored:
+                    changed.append((pk, timestamp, values))
+            for start in range(0, len(changed), UPDATE_BATCH_SIZE):
+                store_columns(changed[start:start + UPDATE_BATCH_SIZE])
+            scanned += len(batch)
+            updated += len(changed)
+            last_pk = batch[-1][0]
+            self.stdout.write(f"Scanned {scanned} message(s), updated {updated}")
+        self.stdout.write(self.style.SUCCESS(f"Filled payload columns of {updated} of {scanned} message(s)"))
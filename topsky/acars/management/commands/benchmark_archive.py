@@ -0,0 +1,116 @@
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Avg, Count
+from acars import archive
+from acars.models import ACARSMessage, MessageArchive
+
+
+def _best_of(repeat, function):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare scans of an archived month against the same queries in SQL. The month "
+        "must have been archived with --keep-rows so that both sources hold the rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', required=True, metavar='YYYY-MM')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per query (the best is reported)')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['month'], '%Y-%m').replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            raise CommandError('--month must be YYYY-MM')
+        end = archive.next_month(start)
+        archives = list(MessageArchive.objects.filter(month=start.date()).order_by('first_id'))
+        if not archives:
+            raise CommandError(f"{options['month']} is not archived")
+        messages = ACARSMessage.objects.filter(
+            timestamp__gte=start, timestamp__lt=end,
+            id__gte=archives[0].first_id, id__lte=archives[-1].last_id,
+        )
+        rows = sum(message_archive.row_count for message_archive in archives)
+        if messages.count() != rows:
+            raise CommandError('The archived rows are no longer in the database (archive with --keep-rows)')
+
+        def readers():
+            for message_archive in archives:
+                with archive.open_archive(message_archive) as reader:
+                    yield reader
+
+        # The replay follows the pilot with the most messages in the month
+        pilot = Counter()
+        for reader in readers():
+            for group in range(len(reader.row_groups)):
+                pilot.update(reader.raw('user_id', group))
+        pilot = pilot.most_common(1)[0][0]
+
+        def sql_simulators():
+            return dict(messages.values_list('simulator').annotate(count=Count('id')).order_by())
+
+        def archive_simulators():
+            counts = Counter()
+            for reader in readers():
+                for group in range(len(reader.row_groups)):
+                    dictionary = reader.dictionary('simulator', group)
+                    for code, count in Counter(reader.raw('simulator', group)).items():
+                        counts[dictionary[code]] += count
+            return dict(counts)
+
+        def sql_altitudes():
+            return {
+                user_id: round(float(average), 3)
+                for user_id, average in messages.values_list('user_id').annotate(average=Avg('altitude')).order_by()
+                if average is not None
+            }
+
+        def archive_altitudes():
+            sums = Counter()
+            counts = Counter()
+            for reader in readers():
+                for group in range(len(reader.row_groups)):
+                    users = reader.raw('user_id', group)
+                    altitudes = reader.raw('altitude', group)
+                    nulls = reader.nulls('altitude', group) or bytes(len(users))
+                    for user_id, altitude, null in zip(users, altitudes, nulls):
+                        if not null:
+                            sums[user_id] += altitude
+                            counts[user_id] += 1
+            return {user_id: round(sums[user_id] / counts[user_id], 3) for user_id in counts}
+
+        replay_columns = ('timestamp', 'latitude', 'longitude', 'altitude')
+
+        def sql_replay():
+            return list(messages.filter(user_id=pilot).order_by('timestamp', 'id').values_list(*replay_columns))
+
+        def archive_replay():
+            positions = []
+            for reader in readers():
+                positions.extend(reader.rows(('id',) + replay_columns, user_id=pilot))
+            positions.sort(key=lambda row: (row[1], row[0]))
+            return [row[1:] for row in positions]
+
+        self.stdout.write(f"{options['month']}: {rows} messages in {len(archives)} file(s), "
+                          f"{sum(message_archive.size for message_archive in archives)} bytes")
+        self.stdout.write(f"{'query':<32}{'SQL ms':>10}{'archive ms':>12}")
+        for name, sql_query, archive_query in (
+            ('messages per simulator', sql_simulators, archive_simulators),
+            ('average altitude per pilot', sql_altitudes, archive_altitudes),
+            (f"replay of pilot {pilot}", sql_replay, archive_replay),
+        ):
+            sql_time, sql_result = _best_of(options['repeat'], sql_query)
+            archive_time, archive_result = _best_of(options['repeat'], archive_query)
+            if sql_result != archive_result:
+                raise CommandError(f"{name}: the archive and SQL results differ")
+            self.stdout.write(f"{name:<32}{sql_time * 1000:>10.1f}{archive_time * 1000:>12.1f}")
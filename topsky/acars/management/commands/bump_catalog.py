@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from acars import catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Bump the catalog version so every worker rebuilds its airport, aircraft and "
+        "schedule snapshot within SMARTCARS_CATALOG_CHECK_SECONDS. Run after importing "
+        "catalog rows with bulk_create, QuerySet.update() or raw SQL."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            catalog.bump_version()
+        self.stdout.write(self.style.SUCCESS(f"Catalog version is now {catalog.current_version()}"))
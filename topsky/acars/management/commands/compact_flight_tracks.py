@@ -0,0 +1,53 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from acars import tracks
+from acars.models import Flight, FlightTrack
+from acars.simplify import build_levels, encode_levels
+
+
+class Command(BaseCommand):
+    help = (
+        "Close flights without reports for --idle-minutes and compact the positions of "
+        "closed flights into FlightTrack blobs with precomputed zoom levels. Run "
+        "periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--idle-minutes', type=int, default=int(tracks.FLIGHT_IDLE.total_seconds() // 60),
+            help='Close live flights without reports for this long',
+        )
+        parser.add_argument('--limit', type=int, default=500, help='Compact at most this many flights')
+        parser.add_argument(
+            '--keep-rows', action='store_true',
+            help='Keep the position rows after writing the track',
+        )
+
+    def handle(self, *args, **options):
+        closed = tracks.close_idle_flights(timedelta(minutes=options['idle_minutes']))
+        if closed:
+            self.stdout.write(f"Closed {closed} idle flight(s)")
+
+        pending = (
+            Flight.objects.filter(status=Flight.CLOSED, track__isnull=True)
+            .order_by('ended_at')[:options['limit']]
+        )
+        compacted = points = size = 0
+        for flight in pending:
+            flight_track = tracks.compact_flight(flight, delete_rows=not options['keep_rows'])
+            compacted += 1
+            points += flight_track.point_count
+            size += len(flight_track.data)
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {compacted} flight(s): {points} positions in {size} bytes"
+        ))
+
+        # Tracks compacted before zoom levels existed
+        backfilled = 0
+        for flight_track in FlightTrack.objects.filter(levels=b'')[:options['limit']]:
+            track = tracks.decode_track(flight_track.data)
+            flight_track.levels = encode_levels(build_levels(track))
+            flight_track.save(update_fields=['levels'])
+            backfilled += 1
+        if backfilled:
+            self.stdout.write(f"Added zoom levels to {backfilled} track(s)")
@@ -0,0 +1,74 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from acars import stats
+from acars.models import Flight, Pirep
+from acars.phases import detect_phases
+from acars.pireps import generate_pirep
+from acars.tracks import load_track
+
+PHASE_FIELDS = ('phase', 'phases', 'out_at', 'off_at', 'on_at', 'in_at', 'landing_rate', 'phase_state')
+
+
+class Command(BaseCommand):
+    help = (
+        "Detect the phases, OOOI times and landing rate of closed flights, in batches by id. "
+        "Run once for flights compacted before phases were stored, or with --all after "
+        "changing the thresholds in acars.phases. Existing PIREPs of the flights are "
+        "regenerated with the new OOOI times, then the totals of their pilots are rebuilt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Flights per batch')
+        parser.add_argument('--all', action='store_true', help='Also flights whose phases are already stored')
+
+    def handle(self, *args, **options):
+        flights = Flight.objects.filter(status=Flight.CLOSED).select_related('track').order_by('pk')
+        if not options['all']:
+            flights = flights.filter(phase='')
+
+        batch_size = max(1, options['batch_size'])
+        detected = points = 0
+        user_ids = set()
+        elapsed = 0.0
+        last_pk = None
+        while True:
+            batch = flights.filter(pk__gt=last_pk) if last_pk is not None else flights
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            changed = []
+            tracks = {}
+            for flight in batch:
+                track = load_track(flight)
+                if not len(track):
+                    continue
+                started = time.perf_counter()
+                values = detect_phases(track).flight_values(track.times)
+                elapsed += time.perf_counter() - started
+                for field, value in values.items():
+                    setattr(flight, field, value)
+                changed.append(flight)
+                tracks[flight.pk] = track
+                points += len(track)
+            # Block and air time come from the OOOI times; fuel is kept, the rows may be gone
+            with_pirep = set(Pirep.objects.filter(flight__in=changed).values_list('flight_id', flat=True))
+            with transaction.atomic():
+                Flight.objects.bulk_update(changed, PHASE_FIELDS)
+                for flight in changed:
+                    if flight.pk in with_pirep:
+                        generate_pirep(flight, tracks[flight.pk], distance_nm=flight.track.distance_nm, with_fuel=False)
+                        user_ids.add(flight.user_id)
+            detected += len(changed)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"Detected phases of {detected} flight(s)")
+
+        # PilotStats.flight_seconds counts the PIREPs' block times
+        user_ids = sorted(user_ids)
+        for start in range(0, len(user_ids), 500):
+            with transaction.atomic():
+                stats.rebuild_pilot_stats(user_ids[start:start + 500])
+        self.stdout.write(self.style.SUCCESS(
+            f"Detected phases of {detected} flight(s), {points} points in {elapsed * 1000:.0f} ms, "
+            f"rebuilt the totals of {len(user_ids)} pilot(s)"
+        ))
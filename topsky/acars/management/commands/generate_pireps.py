@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from acars import stats
+from acars.models import Flight
+from acars.pireps import regenerate_pireps
+
+
+def _start_worker():
+    # Spawned workers start without Django; forked ones must not reuse the parent's connections
+    import django
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the PIREPs of compacted flights that have none (or of all with --all), "
+        "in batches spread over a process pool, then rebuild the totals of the pilots "
+        "concerned. Use --workers 1 on SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also regenerate existing PIREPs')
+        parser.add_argument('--batch-size', type=int, default=100, help='Flights per worker task')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+
+    def handle(self, *args, **options):
+        flights = Flight.objects.filter(status=Flight.CLOSED, track__isnull=False)
+        if not options['all']:
+            flights = flights.filter(pirep__isnull=True)
+        flight_ids = list(flights.order_by('pk').values_list('pk', flat=True))
+        if not flight_ids:
+            self.stdout.write("Nothing to generate")
+            return
+
+        batch_size = max(1, options['batch_size'])
+        batches = [flight_ids[start:start + batch_size] for start in range(0, len(flight_ids), batch_size)]
+        user_ids = set()
+        done = 0
+        if options['workers'] <= 1:
+            for batch in batches:
+                user_ids |= regenerate_pireps(batch)
+                done += len(batch)
+                self.stdout.write(f"Generated {done} of {len(flight_ids)} PIREP(s)")
+        else:
+            # Workers open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_start_worker) as executor:
+                futures = {executor.submit(regenerate_pireps, batch): len(batch) for batch in batches}
+                for future in as_completed(futures):
+                    user_ids |= future.result()
+                    done += futures[future]
+                    self.stdout.write(f"Generated {done} of {len(flight_ids)} PIREP(s)")
+
+        # Block times replace the report spans in the pilots' flight hours
+        user_ids = sorted(user_ids)
+        for start in range(0, len(user_ids), 500):
+            with transaction.atomic():
+                stats.rebuild_pilot_stats(user_ids[start:start + 500])
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(flight_ids)} PIREP(s), rebuilt the totals of {len(user_ids)} pilot(s)"
+        ))
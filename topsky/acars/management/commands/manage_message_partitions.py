@@ -0,0 +1,56 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from acars import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-create upcoming acars_message partitions and drop (or detach) partitions "
+        "older than the retention period. Run daily, e.g. from cron. PostgreSQL only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int,
+            default=getattr(settings, 'SMARTCARS_MESSAGE_PARTITIONS_AHEAD', 3),
+            help='Number of future periods to create partitions for',
+        )
+        parser.add_argument(
+            '--retention-days', type=int,
+            default=getattr(settings, 'SMARTCARS_MESSAGE_RETENTION_DAYS', None),
+            help='Drop partitions entirely older than this many days (default: keep everything)',
+        )
+        parser.add_argument(
+            '--detach-only', action='store_true',
+            help='Detach expired partitions and keep them as standalone tables instead of dropping',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only print what would be done')
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            self.stdout.write("acars_message is not partitioned on this database; nothing to do")
+            return
+        if options['ahead'] < 0:
+            raise CommandError('--ahead must not be negative')
+
+        interval = partitions.get_interval()
+        if options['dry_run']:
+            existing = set(partitions.list_partitions())
+            for start in partitions.upcoming_periods(options['ahead'], interval):
+                name = partitions.partition_name(start, interval)
+                if name not in existing:
+                    self.stdout.write(f"Would create {name}")
+        else:
+            for name in partitions.ensure_partitions(options['ahead'], interval):
+                self.stdout.write(self.style.SUCCESS(f"Created {name}"))
+
+        if options['retention_days'] is None:
+            return
+        verb, done = ('detach', 'Detached') if options['detach_only'] else ('drop', 'Dropped')
+        for name in partitions.expired_partitions(timedelta(days=options['retention_days'])):
+            if options['dry_run']:
+                self.stdout.write(f"Would {verb} {name}")
+                continue
+            partitions.drop_partition(name, detach_only=options['detach_only'])
+            self.stdout.write(self.style.SUCCESS(f"{done} {name}"))
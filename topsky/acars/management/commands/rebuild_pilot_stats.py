@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from acars import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute PilotStats from the stored messages, flights and tracks in batches "
+        "of users. Run once after deploying the table, or after history was edited by hand."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users per transaction')
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only this user id (repeatable)')
+
+    def handle(self, *args, **options):
+        filled = stats.fill_track_distances()
+        if filled:
+            self.stdout.write(f"Measured {filled} track(s) compacted without a distance")
+
+        users = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+        batch_size = max(1, options['batch_size'])
+        rebuilt = 0
+        last_pk = None
+        while True:
+            batch = users.filter(pk__gt=last_pk) if last_pk is not None else users
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                rebuilt += stats.rebuild_pilot_stats(batch)
+            last_pk = batch[-1]
+            self.stdout.write(f"Rebuilt {rebuilt} pilot(s)")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics of {rebuilt} pilot(s)"))
@@ -0,0 +1,218 @@
+"""
+ACARS message API described in ACARS_README.md: position reports and
+messages sent by pilot clients. Authentication is the same as for the
+SmartCARS endpoints (session token or Basic).
+"""
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods
+from .ingest import (
+    MAX_BATCH,
+    FieldError,
+    ingest_messages,
+    ingest_ndjson,
+    new_message,
+    parse_timestamp,
+    save_messages,
+    validate_message,
+)
+from .latest import latest_cache
+from .models import ACARSMessage
+from .stats import flight_hours, get_pilot_stats
+from .request_log import log_request_details, log_response_details
+from .views import authenticated_user
+
+MESSAGE_FIELDS = (
+    'id', 'aircraft_id', 'flight_number', 'route', 'latitude', 'longitude',
+    'altitude', 'speed', 'heading', 'time_off', 'time_on', 'engine_n1',
+    'engine_epr', 'fuel_flow', 'pax_count', 'cost_index', 'transmission_mode',
+    'label', 'msg_number', 'client_msg_id', 'timestamp', 'direction', 'payload', 'flight_id',
+)
+# Payload values GET messages/ can filter on (shadow columns, see acars.payload_fields)
+FILTER_COLUMNS = ('simulator', 'aircraft_type')
+# Default lower bound of GET messages/: keeps the scan on the newest partitions
+QUERY_WINDOW = timedelta(days=getattr(settings, 'SMARTCARS_MESSAGE_QUERY_WINDOW_DAYS', 30))
+
+
+def _error(request, error_data, status_code):
+    log_response_details(request, error_data, status_code)
+    return JsonResponse(error_data, status=status_code)
+
+
+def _read_json(request):
+    """Returns (data, None) or (None, 400 response)"""
+    try:
+        return json.loads(request.body), None
+    except (ValueError, UnicodeDecodeError):
+        return None, _error(request, {'error': 'Invalid JSON data'}, 400)
+
+
+def _ingest_response(request, user, items):
+    if len(items) > MAX_BATCH:
+        return _error(request, {'error': f"At most {MAX_BATCH} messages per request"}, 413)
+
+    summary = ingest_messages(user, items)
+    if summary['created_count'] or not items:
+        status_code = 201
+    else:
+        # Nothing new: fine when everything was a resend, an error otherwise
+        status_code = 400 if summary['error_count'] else 200
+    log_response_details(request, summary, status_code)
+    return JsonResponse(summary, status=status_code)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def messages(request):
+    """
+    GET: the user's most recent messages (?limit=100, ?since=<ISO 8601>,
+         default since is SMARTCARS_MESSAGE_QUERY_WINDOW_DAYS ago; ?simulator=,
+         ?aircraft_type= match payload values exactly)
+    POST: one message (201 with the stored message, 200 {duplicate: true} for a resend)
+          or a list (bulk summary)
+    """
+    log_request_details(request, "MESSAGES")
+
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+
+    if request.method == 'GET':
+        queryset = ACARSMessage.objects.filter(user_id=user.pk)
+        since = request.GET.get('since')
+        try:
+            since = parse_timestamp(since) if since else timezone.now() - QUERY_WINDOW
+        except FieldError as exc:
+            return _error(request, {'errors': {'since': str(exc)}}, 400)
+        queryset = queryset.filter(timestamp__gt=since)
+        for column in FILTER_COLUMNS:
+            # Exact match on the indexed shadow column, not a lookup into payload
+            if request.GET.get(column):
+                queryset = queryset.filter(**{column: request.GET[column]})
+        try:
+            limit = max(1, min(int(request.GET.get('limit', 100)), 1000))
+        except ValueError:
+            limit = 100
+
+        results = list(queryset.order_by('-timestamp').values(*MESSAGE_FIELDS)[:limit])
+        response_data = {'count': len(results), 'results': results}
+        log_response_details(request, {'count': len(results)}, 200)
+        return JsonResponse(response_data)
+
+    data, error_response = _read_json(request)
+    if error_response:
+        return error_response
+    if isinstance(data, list):
+        return _ingest_response(request, user, data)
+
+    values, errors = validate_message(data)
+    if errors:
+        return _error(request, {'errors': errors}, 400)
+
+    message = new_message(user.pk, values)
+    if not save_messages([message]):
+        # A resend of a stored message: acknowledged, not stored again
+        response_data = {'duplicate': True, 'timestamp': message.timestamp}
+        log_response_details(request, response_data, 200)
+        return JsonResponse(response_data)
+    response_data = {'id': message.pk, 'timestamp': message.timestamp, 'flight': message.flight_id}
+    log_response_details(request, response_data, 201)
+    return JsonResponse(response_data, status=201)
+
+
+@require_GET
+def latest(request):
+    """
+    The user's last known position: {message_id, flight_id, aircraft_id, flight_number,
+    route, latitude, longitude, altitude, speed, heading, timestamp}; 404 before the first report.
+    One primary key lookup in LatestPosition, usually answered by acars.latest.latest_cache.
+    """
+    log_request_details(request, "MESSAGES_LATEST")
+
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+
+    position = latest_cache.get(user.pk)
+    if position is None:
+        return _error(request, {'error': 'No position reported yet'}, 404)
+    log_response_details(request, {'message_id': position['message_id']}, 200)
+    return JsonResponse(position)
+
+
+@require_GET
+def stats(request):
+    """
+    The user's totals from PilotStats (acars.stats), one primary key lookup:
+    {total_messages, incoming_messages, outgoing_messages, unique_aircraft, unique_flights,
+    completed_flights, flight_hours, distance_nm}
+    """
+    log_request_details(request, "MESSAGES_STATS")
+
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+
+    totals = get_pilot_stats(user.pk)
+    response_data = {
+        'total_messages': totals['total_messages'],
+        'incoming_messages': totals['incoming_messages'],
+        'outgoing_messages': totals['outgoing_messages'],
+        'unique_aircraft': totals['unique_aircraft'],
+        'unique_flights': totals['unique_flights'],
+        'completed_flights': totals['completed_flights'],
+        'flight_hours': flight_hours(totals),
+        'distance_nm': round(totals['distance_nm'], 1),
+    }
+    log_response_details(request, response_data, 200)
+    return JsonResponse(response_data)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def bulk_create(request):
+    """
+    Store a JSON list of messages in one transaction.
+    Invalid items are skipped and reported, resends are dropped:
+    {created_count, duplicate_count, error_count, errors}
+    """
+    log_request_details(request, "BULK_CREATE")
+
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+
+    data, error_response = _read_json(request)
+    if error_response:
+        return error_response
+    if not isinstance(data, list):
+        return _error(request, {'error': 'Expected a JSON list of messages'}, 400)
+
+    return _ingest_response(request, user, data)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def ndjson_ingest(request):
+    """
+    Stream an NDJSON upload (one message per line, e.g. a whole offline flight log).
+    The body is never loaded at once: lines are parsed as they arrive and committed
+    in chunks. Returns {accepted_count, duplicate_count, rejected_count, errors, errors_truncated}.
+    """
+    log_request_details(request, "NDJSON_INGEST")
+
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+
+    summary = ingest_ndjson(user, request)
+    if summary['accepted_count'] or not summary['rejected_count']:
+        status_code = 201 if summary['accepted_count'] or not summary['duplicate_count'] else 200
+    else:
+        status_code = 400
+    log_response_details(request, summary, status_code)
+    return JsonResponse(summary, status=status_code)
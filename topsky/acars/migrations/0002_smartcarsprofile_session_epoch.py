@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smartcarsprofile',
+            name='session_epoch',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Functional indexes backing the case-insensitive SmartCARS identity lookup
+    (email__iexact / username__iexact compile to UPPER(column) = UPPER(%s))
+    """
+
+    dependencies = [
+        # Latest auth_user schema change, so SQLite table rebuilds don't drop the indexes
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('acars', '0002_smartcarsprofile_session_epoch'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS acars_auth_user_email_upper_idx ON auth_user (UPPER(email));',
+            reverse_sql='DROP INDEX IF EXISTS acars_auth_user_email_upper_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS acars_auth_user_username_upper_idx ON auth_user (UPPER(username));',
+            reverse_sql='DROP INDEX IF EXISTS acars_auth_user_username_upper_idx;',
+        ),
+    ]
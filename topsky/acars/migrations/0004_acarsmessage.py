@@ -0,0 +1,51 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0003_auth_user_identity_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ACARSMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aircraft_id', models.CharField(blank=True, max_length=10)),
+                ('flight_number', models.CharField(blank=True, max_length=10)),
+                ('route', models.CharField(blank=True, max_length=50)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('altitude', models.IntegerField(blank=True, null=True)),
+                ('speed', models.IntegerField(blank=True, null=True)),
+                ('heading', models.IntegerField(blank=True, null=True)),
+                ('time_off', models.TimeField(blank=True, null=True)),
+                ('time_on', models.TimeField(blank=True, null=True)),
+                ('engine_n1', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('engine_epr', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('fuel_flow', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True)),
+                ('pax_count', models.IntegerField(blank=True, null=True)),
+                ('cost_index', models.IntegerField(blank=True, null=True)),
+                ('transmission_mode', models.CharField(blank=True, max_length=4)),
+                ('label', models.CharField(blank=True, max_length=2)),
+                ('msg_number', models.IntegerField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('direction', models.CharField(choices=[('IN', 'Incoming'), ('OUT', 'Outgoing')], default='OUT', max_length=4)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='acars_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'ACARS Message',
+                'verbose_name_plural': 'ACARS Messages',
+                'db_table': 'acars_message',
+                'indexes': [models.Index(fields=['user', 'timestamp'], name='acars_msg_user_ts')],
+            },
+        ),
+    ]
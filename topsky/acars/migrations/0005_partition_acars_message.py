@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def partition_messages(apps, schema_editor):
+    # PostgreSQL only; SQLite and others keep the plain table
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from acars.partitions import get_interval, partition_existing_table
+    partition_existing_table(schema_editor.connection, get_interval())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0004_acarsmessage'),
+    ]
+
+    operations = [
+        # Not reversed: the partitioned table is schema-compatible with the model
+        migrations.RunPython(partition_messages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0005_partition_acars_message'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Flight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight_number', models.CharField(blank=True, max_length=10)),
+                ('aircraft_id', models.CharField(blank=True, max_length=10)),
+                ('route', models.CharField(blank=True, max_length=50)),
+                ('status', models.CharField(choices=[('live', 'Live'), ('closed', 'Closed')], default='live', max_length=6)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_report_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flights', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Flight',
+                'verbose_name_plural': 'Flights',
+                'db_table': 'acars_flight',
+            },
+        ),
+        migrations.CreateModel(
+            name='FlightTrack',
+            fields=[
+                ('flight', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='track', serialize=False, to='acars.flight')),
+                ('point_count', models.PositiveIntegerField()),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Flight Track',
+                'verbose_name_plural': 'Flight Tracks',
+                'db_table': 'acars_flight_track',
+            },
+        ),
+        migrations.AddField(
+            model_name='acarsmessage',
+            name='flight',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='acars.flight'),
+        ),
+        migrations.AddIndex(
+            model_name='acarsmessage',
+            index=models.Index(fields=['flight', 'timestamp'], name='acars_msg_flight_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['user', 'status'], name='acars_flight_user_status'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['status', 'last_report_at'], name='acars_flight_status_last'),
+        ),
+    ]
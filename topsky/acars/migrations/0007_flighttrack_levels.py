@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0006_flight_tracks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flighttrack',
+            name='levels',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
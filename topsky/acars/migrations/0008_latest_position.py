@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_latest_positions(apps, schema_editor):
+    # Selects only the position columns, so later fields on the message model don't matter here
+    from acars.latest import rebuild_latest_positions
+    rebuild_latest_positions()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0007_flighttrack_levels'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestPosition',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_position', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('message_id', models.BigIntegerField()),
+                ('aircraft_id', models.CharField(blank=True, max_length=10)),
+                ('flight_number', models.CharField(blank=True, max_length=10)),
+                ('route', models.CharField(blank=True, max_length=50)),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('altitude', models.IntegerField(blank=True, null=True)),
+                ('speed', models.IntegerField(blank=True, null=True)),
+                ('heading', models.IntegerField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+                ('flight', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='acars.flight')),
+            ],
+            options={
+                'verbose_name': 'Latest Position',
+                'verbose_name_plural': 'Latest Positions',
+                'db_table': 'acars_latest_position',
+                'indexes': [models.Index(fields=['timestamp'], name='acars_latest_ts')],
+            },
+        ),
+        migrations.RunPython(fill_latest_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0008_latest_position'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PilotStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pilot_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_messages', models.BigIntegerField(default=0)),
+                ('incoming_messages', models.BigIntegerField(default=0)),
+                ('outgoing_messages', models.BigIntegerField(default=0)),
+                ('unique_aircraft', models.PositiveIntegerField(default=0)),
+                ('unique_flights', models.PositiveIntegerField(default=0)),
+                ('completed_flights', models.PositiveIntegerField(default=0)),
+                ('flight_seconds', models.BigIntegerField(default=0)),
+                ('distance_nm', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Pilot Stats',
+                'verbose_name_plural': 'Pilot Stats',
+                'db_table': 'acars_pilot_stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='flighttrack',
+            name='distance_nm',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flighttrack',
+            name='incoming_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PilotAircraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aircraft_id', models.CharField(max_length=10)),
+                ('first_seen_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'acars_pilot_aircraft',
+                'constraints': [models.UniqueConstraint(fields=('user', 'aircraft_id'), name='acars_pilot_aircraft_unique')],
+            },
+        ),
+    ]
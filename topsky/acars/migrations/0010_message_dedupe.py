@@ -0,0 +1,79 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:28
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Q
+
+
+def delete_duplicates(apps, schema_editor):
+    """
+    Delete later copies of a (user, msg_number, timestamp) report, keeping the
+    first stored one, and correct what counted them: latest positions pointing
+    at a deleted copy move to the kept one and the message totals of affected
+    pilots are recounted like rebuild_pilot_stats does (the archive and PIREPs
+    come later, so rows and compacted tracks are all there is).
+    """
+    ACARSMessage = apps.get_model('acars', 'ACARSMessage')
+    FlightTrack = apps.get_model('acars', 'FlightTrack')
+    LatestPosition = apps.get_model('acars', 'LatestPosition')
+    PilotStats = apps.get_model('acars', 'PilotStats')
+
+    groups = list(
+        ACARSMessage.objects.filter(msg_number__isnull=False)
+        .values('user_id', 'msg_number', 'timestamp')
+        .annotate(copies=Count('id'), keep_id=Min('id')).filter(copies__gt=1).order_by()
+    )
+    user_ids = set()
+    for group in groups:
+        copies = list(ACARSMessage.objects.filter(
+            user_id=group['user_id'], msg_number=group['msg_number'], timestamp=group['timestamp'],
+        ).exclude(id=group['keep_id']).values_list('id', flat=True))
+        LatestPosition.objects.filter(message_id__in=copies).update(message_id=group['keep_id'])
+        ACARSMessage.objects.filter(id__in=copies).delete()
+        user_ids.add(group['user_id'])
+
+    def count(messages):
+        counts = messages.aggregate(total=Count('id'), incoming=Count('id', filter=Q(direction='IN')))
+        return counts['total'], counts['incoming']
+
+    for stats in PilotStats.objects.filter(user_id__in=user_ids):
+        messages = ACARSMessage.objects.filter(user_id=stats.user_id)
+        total, incoming = count(messages)
+        # Positions deleted by compaction are counted by their tracks, less the rows it kept
+        for track in FlightTrack.objects.filter(flight__user_id=stats.user_id):
+            kept, kept_incoming = count(messages.filter(
+                flight_id=track.flight_id, latitude__isnull=False, longitude__isnull=False,
+            ))
+            deleted = max(0, track.point_count - kept)
+            total += deleted
+            incoming += min(deleted, max(0, track.incoming_count - kept_incoming))
+        stats.total_messages = total
+        stats.incoming_messages = incoming
+        stats.outgoing_messages = total - incoming
+        stats.save(update_fields=['total_messages', 'incoming_messages', 'outgoing_messages'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0009_pilot_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Not reversible: the deleted rows were resends of the kept ones
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='acarsmessage',
+            name='client_msg_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='acarsmessage',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_msg_id', ''), _negated=True), fields=('user', 'client_msg_id', 'timestamp'), name='acars_msg_client_id_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='acarsmessage',
+            constraint=models.UniqueConstraint(condition=models.Q(('msg_number__isnull', False)), fields=('user', 'msg_number', 'timestamp'), name='acars_msg_number_unique'),
+        ),
+    ]
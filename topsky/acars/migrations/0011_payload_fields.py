@@ -0,0 +1,62 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_payload_gin(apps, schema_editor):
+    # PostgreSQL only (jsonb); on the partitioned table every partition gets the index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE INDEX IF NOT EXISTS acars_msg_payload_gin ON acars_message USING gin (payload)')
+
+
+def drop_payload_gin(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS acars_msg_payload_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0010_message_dedupe'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='acarsmessage',
+            name='aircraft_type',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='acarsmessage',
+            name='outside_temperature',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='acarsmessage',
+            name='simulator',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='acarsmessage',
+            name='wind_direction',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='acarsmessage',
+            name='wind_speed',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='acarsmessage',
+            index=models.Index(fields=['simulator', 'timestamp'], name='acars_msg_simulator_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='acarsmessage',
+            index=models.Index(fields=['aircraft_type', 'timestamp'], name='acars_msg_aircraft_type_ts'),
+        ),
+        migrations.RunPython(create_payload_gin, drop_payload_gin),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0012_message_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='in_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='landing_rate',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='off_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='on_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='out_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='phase',
+            field=models.CharField(blank=True, choices=[('parked', 'Parked'), ('taxi', 'Taxi'), ('takeoff', 'Takeoff'), ('climb', 'Climb'), ('cruise', 'Cruise'), ('descent', 'Descent'), ('approach', 'Approach'), ('landing', 'Landing')], max_length=8),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='phase_state',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='phases',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0013_flight_phases'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Pirep',
+            fields=[
+                ('flight', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pirep', serialize=False, to='acars.flight')),
+                ('flight_number', models.CharField(blank=True, max_length=10)),
+                ('aircraft_id', models.CharField(blank=True, max_length=10)),
+                ('route', models.CharField(blank=True, max_length=50)),
+                ('distance_nm', models.FloatField(default=0)),
+                ('block_seconds', models.PositiveIntegerField(blank=True, null=True)),
+                ('air_seconds', models.PositiveIntegerField(blank=True, null=True)),
+                ('fuel_used', models.FloatField(blank=True, null=True)),
+                ('max_altitude', models.IntegerField(blank=True, null=True)),
+                ('landing_rate', models.IntegerField(blank=True, null=True)),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pireps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'PIREP',
+                'verbose_name_plural': 'PIREPs',
+                'db_table': 'acars_pirep',
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acars', '0014_pirep'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Aircraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registration', models.CharField(max_length=10, unique=True)),
+                ('icao_type', models.CharField(max_length=4)),
+                ('name', models.CharField(blank=True, max_length=60)),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Aircraft',
+                'verbose_name_plural': 'Aircraft',
+                'db_table': 'acars_aircraft',
+            },
+        ),
+        migrations.CreateModel(
+            name='Airport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('icao', models.CharField(max_length=4, unique=True)),
+                ('iata', models.CharField(blank=True, max_length=3)),
+                ('name', models.CharField(max_length=100)),
+                ('city', models.CharField(blank=True, max_length=60)),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('elevation', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Airport',
+                'verbose_name_plural': 'Airports',
+                'db_table': 'acars_airport',
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Catalog Version',
+                'verbose_name_plural': 'Catalog Version',
+                'db_table': 'acars_catalog_version',
+            },
+        ),
+        migrations.CreateModel(
+            name='Schedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight_number', models.CharField(max_length=10)),
+                ('icao_type', models.CharField(blank=True, max_length=4)),
+                ('departure_time', models.TimeField()),
+                ('arrival_time', models.TimeField()),
+                ('days', models.CharField(default='1234567', max_length=7)),
+                ('route', models.CharField(blank=True, max_length=255)),
+                ('distance_nm', models.PositiveIntegerField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('arrival', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='acars.airport')),
+                ('departure', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='acars.airport')),
+            ],
+            options={
+                'verbose_name': 'Schedule',
+                'verbose_name_plural': 'Schedules',
+                'db_table': 'acars_schedule',
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 import uuid
 import secrets
 from django.db import models
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -15,6 +16,8 @@ class SmartcarsProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_login = models.DateTimeField(null=True, blank=True)
+    # Bumping this invalidates every session token issued for the profile
+    session_epoch = models.PositiveIntegerField(default=0)
     
     class Meta:
         db_table = 'acars_smartcars_profile'
@@ -48,6 +51,392 @@ class SmartcarsProfile(models.Model):
         return profile
     
     def update_last_login(self):
-        """Update last login timestamp"""
-        self.last_login = timezone.now()
-        self.save(update_fields=['last_login']) 
\ No newline at end of file
+        """Update last login timestamp (written behind in batches, see acars.last_login)"""
+        from .last_login import last_login_buffer
+        last_login_buffer.touch(self)
+    
+    def revoke_sessions(self):
+        """Invalidate all issued session tokens ("log out everywhere")"""
+        from .tokens import remember_session_epoch
+        SmartcarsProfile.objects.filter(pk=self.pk).update(session_epoch=F('session_epoch') + 1)
+        self.refresh_from_db(fields=['session_epoch'])
+        remember_session_epoch(self.user_id, self.session_epoch)
+
+
+class Flight(models.Model):
+    """
+    One flight of a pilot, opened by its first report. While live its positions
+    are ACARSMessage rows; once closed they are compacted into a FlightTrack.
+    """
+    LIVE = 'live'
+    CLOSED = 'closed'
+    STATUS_CHOICES = [
+        (LIVE, 'Live'),
+        (CLOSED, 'Closed'),
+    ]
+    # Flight phases (acars.phases)
+    PARKED = 'parked'
+    TAXI = 'taxi'
+    TAKEOFF = 'takeoff'
+    CLIMB = 'climb'
+    CRUISE = 'cruise'
+    DESCENT = 'descent'
+    APPROACH = 'approach'
+    LANDING = 'landing'
+    PHASE_CHOICES = [
+        (PARKED, 'Parked'),
+        (TAXI, 'Taxi'),
+        (TAKEOFF, 'Takeoff'),
+        (CLIMB, 'Climb'),
+        (CRUISE, 'Cruise'),
+        (DESCENT, 'Descent'),
+        (APPROACH, 'Approach'),
+        (LANDING, 'Landing'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='flights')
+    flight_number = models.CharField(max_length=10, blank=True)
+    aircraft_id = models.CharField(max_length=10, blank=True)
+    route = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=6, choices=STATUS_CHOICES, default=LIVE)
+    started_at = models.DateTimeField(default=timezone.now)
+    last_report_at = models.DateTimeField(default=timezone.now)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    # Current phase while live, last phase once closed; '' until detected
+    phase = models.CharField(max_length=8, choices=PHASE_CHOICES, blank=True)
+    # [[phase, first ms, last ms], ...] over the whole track, set when the flight is compacted
+    phases = models.JSONField(default=list, blank=True)
+    # OOOI: gate out, wheels off, wheels on, gate in
+    out_at = models.DateTimeField(null=True, blank=True)
+    off_at = models.DateTimeField(null=True, blank=True)
+    on_at = models.DateTimeField(null=True, blank=True)
+    in_at = models.DateTimeField(null=True, blank=True)
+    # Vertical speed at touchdown in ft/min (negative when descending)
+    landing_rate = models.IntegerField(null=True, blank=True)
+    # Recent points and flags of the live detector; emptied when compacted
+    phase_state = models.JSONField(default=dict, blank=True)
+    
+    class Meta:
+        db_table = 'acars_flight'
+        verbose_name = 'Flight'
+        verbose_name_plural = 'Flights'
+        indexes = [
+            models.Index(fields=['user', 'status'], name='acars_flight_user_status'),
+            models.Index(fields=['status', 'last_report_at'], name='acars_flight_status_last'),
+        ]
+    
+    def __str__(self):
+        return f"{self.flight_number or '?'} ({self.status}) {self.started_at:%Y-%m-%d %H:%M}"
+
+
+class FlightTrack(models.Model):
+    """Compacted position history of a closed flight (format in acars.tracks)"""
+    flight = models.OneToOneField(Flight, on_delete=models.CASCADE, primary_key=True, related_name='track')
+    point_count = models.PositiveIntegerField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    data = models.BinaryField()
+    # Precomputed zoom levels (acars.simplify); empty for tracks compacted before them
+    levels = models.BinaryField(blank=True, default=b'')
+    # Great-circle length of the track; null for tracks compacted before it was recorded
+    distance_nm = models.FloatField(null=True, blank=True)
+    # Positions with direction IN, so statistics can be rebuilt after the rows are deleted
+    incoming_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'acars_flight_track'
+        verbose_name = 'Flight Track'
+        verbose_name_plural = 'Flight Tracks'
+    
+    def __str__(self):
+        return f"Track of flight {self.flight_id} ({self.point_count} points)"
+
+
+class Pirep(models.Model):
+    """Pilot report of a completed flight, generated when it is compacted (acars.pireps)"""
+    flight = models.OneToOneField(Flight, on_delete=models.CASCADE, primary_key=True, related_name='pirep')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pireps')
+    flight_number = models.CharField(max_length=10, blank=True)
+    aircraft_id = models.CharField(max_length=10, blank=True)
+    route = models.CharField(max_length=50, blank=True)
+    distance_nm = models.FloatField(default=0)
+    # Gate out to gate in and wheels off to wheels on (Flight OOOI); null when not detected
+    block_seconds = models.PositiveIntegerField(null=True, blank=True)
+    air_seconds = models.PositiveIntegerField(null=True, blank=True)
+    # fuel_flow integrated over the reports (flow unit x hours); null without fuel_flow reports
+    fuel_used = models.FloatField(null=True, blank=True)
+    max_altitude = models.IntegerField(null=True, blank=True)  # ft
+    landing_rate = models.IntegerField(null=True, blank=True)  # ft/min
+    point_count = models.PositiveIntegerField(default=0)
+    generated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'acars_pirep'
+        verbose_name = 'PIREP'
+        verbose_name_plural = 'PIREPs'
+    
+    def __str__(self):
+        return f"PIREP {self.flight_number or '?'} of flight {self.flight_id}"
+
+
+class ACARSMessage(models.Model):
+    """
+    ACARS message / position report sent by a pilot's client.
+    Hot fields (position, altitude, speed, heading, time) are typed columns;
+    everything else the client sends is kept in payload, with the payload
+    values that are filtered on copied into shadow columns.
+    """
+    DIRECTION_CHOICES = [
+        ('IN', 'Incoming'),
+        ('OUT', 'Outgoing'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='acars_messages')
+    flight = models.ForeignKey(
+        Flight, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='messages', db_index=False,  # covered by acars_msg_flight_ts
+    )
+    
+    # Flight
+    aircraft_id = models.CharField(max_length=10, blank=True)
+    flight_number = models.CharField(max_length=10, blank=True)
+    route = models.CharField(max_length=50, blank=True)
+    
+    # Position and flight parameters
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    altitude = models.IntegerField(null=True, blank=True)  # ft
+    speed = models.IntegerField(null=True, blank=True)     # kts
+    heading = models.IntegerField(null=True, blank=True)   # degrees
+    
+    # OOOI times
+    time_off = models.TimeField(null=True, blank=True)
+    time_on = models.TimeField(null=True, blank=True)
+    
+    # Engine parameters
+    engine_n1 = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    engine_epr = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    fuel_flow = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    
+    # Other parameters
+    pax_count = models.IntegerField(null=True, blank=True)
+    cost_index = models.IntegerField(null=True, blank=True)
+    
+    # ACARS message parameters
+    transmission_mode = models.CharField(max_length=4, blank=True)
+    label = models.CharField(max_length=2, blank=True)
+    msg_number = models.IntegerField(null=True, blank=True)
+    # Client-chosen id of the message; a resend with the same id and timestamp is dropped (acars.dedupe)
+    client_msg_id = models.CharField(max_length=64, blank=True, default='')
+    
+    # Metadata - timestamp is the client's report time when it sends one
+    timestamp = models.DateTimeField(default=timezone.now)
+    direction = models.CharField(max_length=4, choices=DIRECTION_CHOICES, default='OUT')
+    payload = models.JSONField(default=dict, blank=True)
+    
+    # Copied from payload at ingest so they can be indexed (acars.payload_fields)
+    simulator = models.CharField(max_length=32, blank=True, default='')
+    aircraft_type = models.CharField(max_length=40, blank=True, default='')
+    outside_temperature = models.IntegerField(null=True, blank=True)  # °C
+    wind_speed = models.IntegerField(null=True, blank=True)           # kts
+    wind_direction = models.IntegerField(null=True, blank=True)       # degrees
+    
+    class Meta:
+        db_table = 'acars_message'
+        verbose_name = 'ACARS Message'
+        verbose_name_plural = 'ACARS Messages'
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='acars_msg_user_ts'),
+            models.Index(fields=['flight', 'timestamp'], name='acars_msg_flight_ts'),
+            models.Index(fields=['simulator', 'timestamp'], name='acars_msg_simulator_ts'),
+            models.Index(fields=['aircraft_type', 'timestamp'], name='acars_msg_aircraft_type_ts'),
+        ]
+        # PostgreSQL also has acars_msg_payload_gin (GIN on payload), created in migration 0011
+        constraints = [
+            # Both include timestamp, the partition key on PostgreSQL
+            models.UniqueConstraint(
+                fields=['user', 'client_msg_id', 'timestamp'], condition=~Q(client_msg_id=''),
+                name='acars_msg_client_id_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'msg_number', 'timestamp'], condition=Q(msg_number__isnull=False),
+                name='acars_msg_number_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.aircraft_id or '?'} {self.flight_number} @ {self.timestamp:%Y-%m-%d %H:%M:%S}"
+
+
+class LatestPosition(models.Model):
+    """
+    Newest position report of each pilot, upserted on ingest (acars.latest) so
+    "where is this pilot now" never sorts acars_message.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='latest_position')
+    # acars_message has a composite key on PostgreSQL, so the message is referenced by id only
+    message_id = models.BigIntegerField()
+    flight = models.ForeignKey(Flight, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    aircraft_id = models.CharField(max_length=10, blank=True)
+    flight_number = models.CharField(max_length=10, blank=True)
+    route = models.CharField(max_length=50, blank=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    altitude = models.IntegerField(null=True, blank=True)
+    speed = models.IntegerField(null=True, blank=True)
+    heading = models.IntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'acars_latest_position'
+        verbose_name = 'Latest Position'
+        verbose_name_plural = 'Latest Positions'
+        indexes = [
+            models.Index(fields=['timestamp'], name='acars_latest_ts'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.flight_number} @ {self.timestamp:%Y-%m-%d %H:%M:%S}"
+
+
+class PilotStats(models.Model):
+    """
+    Running totals of a pilot, updated by ingest and flight compaction
+    (acars.stats) and rebuilt by `manage.py rebuild_pilot_stats`.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='pilot_stats')
+    total_messages = models.BigIntegerField(default=0)
+    incoming_messages = models.BigIntegerField(default=0)
+    outgoing_messages = models.BigIntegerField(default=0)
+    unique_aircraft = models.PositiveIntegerField(default=0)
+    # Flights opened from the pilot's reports (live and closed)
+    unique_flights = models.PositiveIntegerField(default=0)
+    # Closed flights whose track has been compacted
+    completed_flights = models.PositiveIntegerField(default=0)
+    flight_seconds = models.BigIntegerField(default=0)
+    distance_nm = models.FloatField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'acars_pilot_stats'
+        verbose_name = 'Pilot Stats'
+        verbose_name_plural = 'Pilot Stats'
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.completed_flights} flights, {self.total_messages} messages"
+
+
+class PilotAircraft(models.Model):
+    """Aircraft a pilot has reported from; keeps PilotStats.unique_aircraft incremental"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    aircraft_id = models.CharField(max_length=10)
+    first_seen_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'acars_pilot_aircraft'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'aircraft_id'], name='acars_pilot_aircraft_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.aircraft_id}"
+
+
+class MessageArchive(models.Model):
+    """
+    One file of acars_message rows moved to the cold archive (acars.archive).
+    A month may have several parts when late reports are archived later.
+    """
+    month = models.DateField(db_index=True)  # first day of the month
+    file_name = models.CharField(max_length=100, unique=True)  # in SMARTCARS_ARCHIVE_DIR
+    row_count = models.BigIntegerField()
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    # {user id: [messages, incoming]} not already counted by a FlightTrack, for rebuild_pilot_stats
+    user_counts = models.JSONField(default=dict)
+    rows_deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'acars_message_archive'
+        verbose_name = 'Message Archive'
+        verbose_name_plural = 'Message Archives'
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.row_count} messages)"
+
+
+class Airport(models.Model):
+    """Airport of the SmartCARS catalog (served from memory by acars.catalog)"""
+    icao = models.CharField(max_length=4, unique=True)
+    iata = models.CharField(max_length=3, blank=True)
+    name = models.CharField(max_length=100)
+    city = models.CharField(max_length=60, blank=True)
+    country = models.CharField(max_length=2, blank=True)  # ISO 3166-1 alpha-2
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    elevation = models.IntegerField(default=0)  # ft
+    
+    class Meta:
+        db_table = 'acars_airport'
+        verbose_name = 'Airport'
+        verbose_name_plural = 'Airports'
+    
+    def __str__(self):
+        return f"{self.icao} {self.name}"
+
+
+class Aircraft(models.Model):
+    """Fleet aircraft of the SmartCARS catalog; registration as sent in aircraft_id"""
+    registration = models.CharField(max_length=10, unique=True)
+    icao_type = models.CharField(max_length=4)
+    name = models.CharField(max_length=60, blank=True)
+    active = models.BooleanField(default=True)
+    
+    class Meta:
+        db_table = 'acars_aircraft'
+        verbose_name = 'Aircraft'
+        verbose_name_plural = 'Aircraft'
+    
+    def __str__(self):
+        return f"{self.registration} ({self.icao_type})"
+
+
+class Schedule(models.Model):
+    """Scheduled flight of the SmartCARS catalog"""
+    flight_number = models.CharField(max_length=10)
+    departure = models.ForeignKey(Airport, on_delete=models.PROTECT, related_name='+')
+    arrival = models.ForeignKey(Airport, on_delete=models.PROTECT, related_name='+')
+    icao_type = models.CharField(max_length=4, blank=True)
+    departure_time = models.TimeField()  # UTC
+    arrival_time = models.TimeField()    # UTC
+    # ISO weekdays flown, e.g. '12345' for Monday to Friday
+    days = models.CharField(max_length=7, default='1234567')
+    route = models.CharField(max_length=255, blank=True)
+    distance_nm = models.PositiveIntegerField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    
+    class Meta:
+        db_table = 'acars_schedule'
+        verbose_name = 'Schedule'
+        verbose_name_plural = 'Schedules'
+    
+    def __str__(self):
+        return f"{self.flight_number} {self.departure_id}-{self.arrival_id}"
+
+
+class CatalogVersion(models.Model):
+    """Single row counting changes to the catalog models; workers rebuild their snapshot when it moves"""
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'acars_catalog_version'
+        verbose_name = 'Catalog Version'
+        verbose_name_plural = 'Catalog Version'
+    
+    def __str__(self):
+        return f"Catalog version {self.version}"
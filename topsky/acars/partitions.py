@@ -0,0 +1,217 @@
+"""
+Range partitioning of the ACARS message table by report time (PostgreSQL).
+
+acars_message is a partitioned table with one partition per month (or per day,
+SMARTCARS_MESSAGE_PARTITION_INTERVAL) named acars_message_pYYYY_MM[_DD], plus a
+DEFAULT partition that catches reports outside every existing range. The
+primary key is (id, timestamp) because PostgreSQL requires the partition key in
+every unique constraint; Django keeps treating id as the primary key.
+
+Retention is dropping (or detaching) whole partitions, see the
+manage_message_partitions command. On other databases the table is a plain
+table and every function here is a no-op.
+"""
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+
+TABLE = 'acars_message'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_RE = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})(?:_(\d{{2}}))?$')
+
+
+def get_interval():
+    interval = getattr(settings, 'SMARTCARS_MESSAGE_PARTITION_INTERVAL', 'month')
+    if interval not in ('month', 'day'):
+        raise ValueError("SMARTCARS_MESSAGE_PARTITION_INTERVAL must be 'month' or 'day'")
+    return interval
+
+
+def period_start(when, interval):
+    """Start (UTC midnight) of the partition period containing when"""
+    when = when.astimezone(dt_timezone.utc)
+    if interval == 'day':
+        return datetime(when.year, when.month, when.day, tzinfo=dt_timezone.utc)
+    return datetime(when.year, when.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_period(start, interval):
+    if interval == 'day':
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def partition_name(start, interval):
+    if interval == 'day':
+        return f'{TABLE}_p{start:%Y_%m_%d}'
+    return f'{TABLE}_p{start:%Y_%m}'
+
+
+def partition_bounds(name):
+    """(start, end) of a partition from its name, or None for other tables"""
+    match = PARTITION_RE.match(name)
+    if not match:
+        return None
+    year, month, day = match.groups()
+    start = datetime(int(year), int(month), int(day or 1), tzinfo=dt_timezone.utc)
+    return start, next_period(start, 'day' if day else 'month')
+
+
+def is_partitioned(connection=default_connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND c.relnamespace = to_regnamespace(current_schema())",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection=default_connection):
+    """Names of the attached range partitions, oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND p.relnamespace = to_regnamespace(current_schema())",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return sorted(name for name in names if partition_bounds(name))
+
+
+def create_partition(start, interval, connection=default_connection):
+    """
+    Create the partition for the period starting at start (no-op if it exists).
+    Rows already caught by the DEFAULT partition for that period are moved into it.
+    Returns the partition name, or None if it already existed.
+    """
+    name = partition_name(start, interval)
+    end = next_period(start, interval)
+    qn = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return None
+
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {qn(DEFAULT_PARTITION)} "
+            f'WHERE "timestamp" >= %s AND "timestamp" < %s)',
+            [start, end],
+        )
+        has_default_rows = cursor.fetchone()[0]
+        if has_default_rows:
+            # A new range may not overlap rows in the DEFAULT partition
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(DEFAULT_PARTITION)}")
+
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+
+        if has_default_rows:
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} "
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f"INSERT INTO {qn(TABLE)} SELECT * FROM moved",
+                [start, end],
+            )
+            cursor.execute(
+                f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(DEFAULT_PARTITION)} DEFAULT"
+            )
+    return name
+
+
+def upcoming_periods(ahead, interval, now=None):
+    """Starts of the current period and the `ahead` periods after it"""
+    start = period_start(now or datetime.now(dt_timezone.utc), interval)
+    periods = []
+    for _ in range(ahead + 1):
+        periods.append(start)
+        start = next_period(start, interval)
+    return periods
+
+
+def ensure_partitions(ahead, interval=None, now=None, connection=default_connection):
+    """Create partitions for the current period and `ahead` periods after it"""
+    interval = interval or get_interval()
+    created = []
+    for start in upcoming_periods(ahead, interval, now):
+        name = create_partition(start, interval, connection)
+        if name:
+            created.append(name)
+    return created
+
+
+def expired_partitions(retention, now=None, connection=default_connection):
+    """Partitions whose whole range is older than now - retention (a timedelta)"""
+    cutoff = (now or datetime.now(dt_timezone.utc)) - retention
+    return [
+        name for name in list_partitions(connection)
+        if partition_bounds(name)[1] <= cutoff
+    ]
+
+
+def drop_partition(name, detach_only=False, connection=default_connection):
+    """Detach a partition and drop it (or keep it as a standalone table)"""
+    qn = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}")
+        if not detach_only:
+            cursor.execute(f"DROP TABLE {qn(name)}")
+
+
+def partition_existing_table(connection, interval, ahead=2):
+    """
+    Convert the plain acars_message table into a partitioned one, keeping its rows,
+    columns, identity sequence, foreign key and indexes (used by migration 0005).
+    """
+    qn = connection.ops.quote_name
+    old = f'{TABLE}_unpartitioned'
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} RENAME TO {qn(old)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(TABLE)} (LIKE {qn(old)} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+            'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f"CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(TABLE)} DEFAULT")
+
+        # Index definitions of the old table, re-created on the new one after the drop
+        cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s", [old])
+        index_sql = [
+            row[0] for row in cursor.fetchall() if ' UNIQUE ' not in row[0]
+        ]
+
+        cursor.execute(
+            f"""SELECT DISTINCT date_trunc(%s, "timestamp" AT TIME ZONE 'UTC') FROM {qn(old)}""",
+            [interval],
+        )
+        periods = {row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall()}
+    for start in sorted(periods):
+        create_partition(start, interval, connection)
+    ensure_partitions(ahead, interval, connection=connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {qn(TABLE)} SELECT * FROM {qn(old)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {qn(old)}), false)",
+            [TABLE],
+        )
+        cursor.execute(f"DROP TABLE {qn(old)}")
+
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} ADD PRIMARY KEY (id, "timestamp")')
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + '_user_id_fk_auth_user_id')} "
+            f"FOREIGN KEY (user_id) REFERENCES {qn('auth_user')} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        for sql in index_sql:
+            cursor.execute(sql.replace(f'ON public.{old} ', f'ON public.{TABLE} ').replace(
+                f'ON {old} ', f'ON {TABLE} '
+            ))
@@ -0,0 +1,92 @@
+"""
+Hot payload fields copied into typed ACARSMessage columns.
+
+Clients put simulator details and weather into the free-form payload. The
+values that are filtered on are copied at ingest into shadow columns
+(simulator, aircraft_type, outside_temperature, wind_speed, wind_direction),
+which carry their own (column, timestamp) indexes; the payload itself stays
+complete. On PostgreSQL the payload also has a GIN index for ad-hoc key and
+containment queries (payload__has_key, payload__contains).
+
+Which payload path feeds a column is configured in SMARTCARS_PAYLOAD_FIELDS
+as {column: dotted path or list of paths, first present wins}, merged over
+DEFAULT_PATHS. A value of the wrong type leaves the column empty instead of
+rejecting the message. Rows stored before a column existed, or before its
+path changed, are filled by the backfill_payload_fields command.
+"""
+import math
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from .models import ACARSMessage
+
+DEFAULT_PATHS = {
+    'simulator': 'simulator',
+    'aircraft_type': 'aircraft_type',
+    'outside_temperature': 'raw_data.weather.temperature',
+    'wind_speed': 'raw_data.weather.wind_speed',
+    'wind_direction': 'raw_data.weather.wind_direction',
+}
+
+
+def _paths(value):
+    paths = [value] if isinstance(value, str) else list(value)
+    return [tuple(path.split('.')) for path in paths]
+
+
+def _load_paths():
+    configured = dict(DEFAULT_PATHS, **getattr(settings, 'SMARTCARS_PAYLOAD_FIELDS', {}))
+    unknown = set(configured) - set(DEFAULT_PATHS)
+    if unknown:
+        raise ImproperlyConfigured(f"SMARTCARS_PAYLOAD_FIELDS: no such column {', '.join(sorted(unknown))}")
+    return {column: _paths(value) for column, value in configured.items()}
+
+
+def _string(field):
+    def convert(value):
+        if isinstance(value, str):
+            return value.strip()[:field.max_length]
+        return ''
+    return convert
+
+
+def _integer(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    value = int(round(value))
+    # Out of IntegerField range is garbage, not a reading
+    return value if -2 ** 31 <= value < 2 ** 31 else None
+
+
+def _converter(column):
+    field = ACARSMessage._meta.get_field(column)
+    return _string(field) if isinstance(field, models.CharField) else _integer
+
+
+PATHS = _load_paths()
+COLUMNS = tuple(PATHS)
+CONVERTERS = {column: _converter(column) for column in COLUMNS}
+EMPTY = {column: CONVERTERS[column](None) for column in COLUMNS}
+
+
+def _lookup(payload, path):
+    for key in path:
+        if not isinstance(payload, dict) or key not in payload:
+            return None
+        payload = payload[key]
+    return payload
+
+
+def extract_payload_fields(payload):
+    """Shadow column values for a payload ('' / None where absent or invalid)"""
+    if not payload:
+        return dict(EMPTY)
+    values = {}
+    for column, paths in PATHS.items():
+        value = None
+        for path in paths:
+            value = _lookup(payload, path)
+            if value is not None:
+                break
+        values[column] = CONVERTERS[column](value)
+    return values
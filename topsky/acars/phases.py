@@ -0,0 +1,374 @@
+"""
+Flight phase and OOOI detection from altitude and speed.
+
+A closed flight is classified in one pass over its Track columns by
+detect_phases(): the field elevations are taken from the first and last
+points on the ground, which places wheels off and wheels on, and the points
+in between are labelled from a vertical rate computed over a sliding time
+window. The columns are copied to lists once and every pass is a single
+forward or backward scan, or a slice assignment into a bytearray of phase
+codes, so a 10 000 point track is classified in single-digit milliseconds and
+needs no model instances. compact_flight() stores the
+result on the Flight and the detect_flight_phases command fills in flights
+compacted earlier.
+
+Live flights cannot look ahead, so LivePhases steps a small state machine
+over each ingested batch (acars.ingest). It keeps the last RECENT_MS of
+points in Flight.phase_state to place takeoff and touchdown once they are
+certain; its phase lags real touchdown until the aircraft slows to taxi
+speed. The stored result is replaced by detect_phases() at compaction.
+
+Altitudes are feet above sea level as reported by the simulator, speeds
+knots, times milliseconds since the epoch (as in acars.tracks).
+"""
+from .models import Flight
+from .tracks import EPOCH, ONE_MS
+
+PHASES = (
+    Flight.PARKED, Flight.TAXI, Flight.TAKEOFF, Flight.CLIMB,
+    Flight.CRUISE, Flight.DESCENT, Flight.APPROACH, Flight.LANDING,
+)
+PARKED, TAXI, TAKEOFF, CLIMB, CRUISE, DESCENT, APPROACH, LANDING = range(len(PHASES))
+AIRBORNE = frozenset((CLIMB, CRUISE, DESCENT, APPROACH))
+
+# Faster than this (kt) the aircraft is moving, not parked
+TAXI_SPEED = 5
+# Faster than this on the ground is a takeoff or landing roll; slower is always on the ground
+ROLL_SPEED = 40
+# Height above the field (ft) that proves the aircraft is airborne
+AIRBORNE_HEIGHT = 50
+# Within this height of the field the wheels are on the ground
+GROUND_HEIGHT = 10
+# The takeoff phase ends at this height above the departure field
+TAKEOFF_HEIGHT = 1000
+# The approach starts at this height above the arrival field
+APPROACH_HEIGHT = 3000
+# Vertical rates within this many ft/min are level flight
+LEVEL_RATE = 300
+# Level flight within this many feet of the highest altitude is cruise
+CRUISE_BAND = 4000
+# Vertical rates are averaged over this many milliseconds around each point
+RATE_WINDOW_MS = 60 * 1000
+# The landing rate is measured over the last few seconds before touchdown...
+LANDING_RATE_WINDOW_MS = 5 * 1000
+# ...and not at all when the last airborne report is older than this
+LANDING_RATE_MAX_GAP_MS = 30 * 1000
+# Points kept by the live detector
+RECENT_MS = 2 * 60 * 1000
+
+
+def vertical_rates(times, altitudes, start=0, end=None, window=RATE_WINDOW_MS):
+    """Vertical rate in ft/min of each point in [start, end) of list columns, over window ms centred on it"""
+    end = len(times) if end is None else end
+    rates = [0.0] * (end - start)
+    half = window // 2
+    # Both window edges only move forward: one pass with two pointers
+    low = high = start
+    for index in range(start, end):
+        now = times[index]
+        while times[low] < now - half:
+            low += 1
+        while high + 1 < end and times[high + 1] <= now + half:
+            high += 1
+        elapsed = times[high] - times[low]
+        if elapsed:
+            rates[index - start] = (altitudes[high] - altitudes[low]) * 60000 / elapsed
+    return rates
+
+
+def landing_rate(times, altitudes, touchdown):
+    """Vertical rate (ft/min, rounded) into the touchdown point, or None if the reports are too sparse"""
+    if touchdown < 1 or times[touchdown] - times[touchdown - 1] > LANDING_RATE_MAX_GAP_MS:
+        return None
+    first = touchdown - 1
+    while first > 0 and times[touchdown] - times[first - 1] <= LANDING_RATE_WINDOW_MS:
+        first -= 1
+    elapsed = times[touchdown] - times[first]
+    return round((altitudes[touchdown] - altitudes[first]) * 60000 / elapsed) if elapsed else None
+
+
+def _liftoff(altitudes, elevation, first_airborne):
+    """Index of the first point off the ground before first_airborne"""
+    index = first_airborne
+    while index > 0 and altitudes[index - 1] > elevation + GROUND_HEIGHT:
+        index -= 1
+    return index
+
+
+def _touchdown(altitudes, elevation, last_airborne, end):
+    """Index of the first point back on the ground after last_airborne"""
+    index = last_airborne + 1
+    while index < end - 1 and altitudes[index] > elevation + GROUND_HEIGHT:
+        index += 1
+    return index
+
+
+class FlightPhases:
+    """Phase code of every point of a track, the OOOI point indices (or None) and the landing rate"""
+
+    def __init__(self, labels, out=None, off=None, on=None, gate_in=None, landing_rate=None):
+        self.labels = labels
+        self.out = out
+        self.off = off
+        self.on = on
+        self.gate_in = gate_in
+        self.landing_rate = landing_rate
+
+    def segments(self, times):
+        """[[phase, first ms, last ms], ...] for runs of equal phase"""
+        segments = []
+        labels = self.labels
+        start = 0
+        for index in range(1, len(labels) + 1):
+            if index == len(labels) or labels[index] != labels[start]:
+                segments.append([PHASES[labels[start]], times[start], times[index - 1]])
+                start = index
+        return segments
+
+    def flight_values(self, times):
+        """Flight field values for a closed flight"""
+        def at(index):
+            return None if index is None else EPOCH + times[index] * ONE_MS
+
+        return {
+            'phase': PHASES[self.labels[-1]] if self.labels else '',
+            'phases': self.segments(times),
+            'out_at': at(self.out),
+            'off_at': at(self.off),
+            'on_at': at(self.on),
+            'in_at': at(self.gate_in),
+            'landing_rate': self.landing_rate,
+            'phase_state': {},
+        }
+
+
+def _label_airborne(labels, times, altitudes, start, end, initial):
+    """Climb / cruise / descent by vertical rate for [start, end); level flight below the cruise band continues the previous phase"""
+    if start >= end:
+        return
+    rates = vertical_rates(times, altitudes, start, end)
+    floor = max(altitudes[start:end]) - CRUISE_BAND
+    previous = initial
+    for index, rate, altitude in zip(range(start, end), rates, altitudes[start:end]):
+        if rate >= LEVEL_RATE:
+            previous = CLIMB
+        elif rate <= -LEVEL_RATE:
+            previous = DESCENT
+        elif altitude >= floor:
+            previous = CRUISE
+        labels[index] = previous
+
+
+def detect_phases(track):
+    """Classify every point of a track (acars.tracks.Track) in time order"""
+    # Lists index faster than array('q') in the loops below
+    times, altitudes, speeds = track.times.tolist(), track.altitudes.tolist(), track.speeds.tolist()
+    count = len(times)
+    labels = bytearray(count)
+    if not count:
+        return FlightPhases(labels)
+
+    # Field elevations, when the flight starts or ends on the ground
+    departure = altitudes[0] if speeds[0] < ROLL_SPEED else None
+    arrival = altitudes[-1] if speeds[-1] < ROLL_SPEED else None
+
+    off = on = None
+    if departure is not None:
+        first_airborne = next(
+            (index for index in range(count)
+             if altitudes[index] > departure + AIRBORNE_HEIGHT and speeds[index] >= ROLL_SPEED),
+            None,
+        )
+        if first_airborne is not None:
+            off = _liftoff(altitudes, departure, first_airborne)
+    if arrival is not None:
+        last_airborne = next(
+            (index for index in range(count - 1, (off or 0) - 1, -1)
+             if altitudes[index] > arrival + AIRBORNE_HEIGHT),
+            None,
+        )
+        if last_airborne is not None:
+            on = _touchdown(altitudes, arrival, last_airborne, count)
+    # Points [air_start, air_end) are in flight; a flight that starts on the ground and never lifts off has none
+    air_start = off if off is not None else (count if departure is not None else 0)
+    air_end = on if on is not None else count
+
+    # Departure: parked, taxi, takeoff roll and initial climb
+    out = None
+    if departure is not None:
+        out = next((index for index in range(air_start) if speeds[index] >= TAXI_SPEED), None)
+        if out is not None:
+            labels[out:air_start] = bytes((TAXI,)) * (air_start - out)
+    climb_start = air_start
+    if off is not None:
+        roll = off
+        while roll > 0 and speeds[roll - 1] >= ROLL_SPEED:
+            roll -= 1
+        climb_start = off
+        while climb_start < air_end and altitudes[climb_start] < departure + TAKEOFF_HEIGHT:
+            climb_start += 1
+        labels[roll:climb_start] = bytes((TAKEOFF,)) * (climb_start - roll)
+
+    # Arrival: approach, landing roll, taxi in and parked
+    approach = air_end
+    gate_in = rate = None
+    if on is not None:
+        while approach > climb_start and altitudes[approach - 1] < arrival + APPROACH_HEIGHT:
+            approach -= 1
+        labels[approach:on] = bytes((APPROACH,)) * (on - approach)
+        rollout = on
+        while rollout < count and speeds[rollout] >= ROLL_SPEED:
+            rollout += 1
+        labels[on:rollout] = bytes((LANDING,)) * (rollout - on)
+        labels[rollout:] = bytes((TAXI,)) * (count - rollout)
+        rate = landing_rate(times, altitudes, on)
+    if arrival is not None and speeds[-1] < TAXI_SPEED:
+        stopped = count
+        floor = air_end if air_end < count else (out or 0)
+        while stopped > floor and speeds[stopped - 1] < TAXI_SPEED:
+            stopped -= 1
+        if stopped < count:
+            labels[stopped:] = bytes((PARKED,)) * (count - stopped)
+            if on is not None and stopped > on:
+                gate_in = stopped
+
+    _label_airborne(labels, times, altitudes, climb_start, approach, CLIMB if off is not None else CRUISE)
+    return FlightPhases(labels, out, off, on, gate_in, rate)
+
+
+class LivePhases:
+    """
+    Causal phase detector of one live flight, resumed from and saved to
+    Flight.phase_state: {'air': airborne, 'elevation': last ground altitude,
+    'top': highest altitude since takeoff, 't'/'alt'/'kt': recent points}.
+    """
+
+    def __init__(self, flight):
+        self.flight = flight
+        state = flight.phase_state or {}
+        self.airborne = state.get('air')
+        self.elevation = state.get('elevation')
+        self.top = state.get('top')
+        self.times = state.get('t', [])
+        self.altitudes = state.get('alt', [])
+        self.speeds = state.get('kt', [])
+        self.phase = PHASES.index(flight.phase) if flight.phase else None
+
+    def _at(self, index):
+        return EPOCH + self.times[index] * ONE_MS
+
+    def _rate(self):
+        """Vertical rate over the trailing half window"""
+        now = self.times[-1]
+        first = len(self.times) - 1
+        while first > 0 and now - self.times[first - 1] <= RATE_WINDOW_MS // 2:
+            first -= 1
+        elapsed = now - self.times[first]
+        return (self.altitudes[-1] - self.altitudes[first]) * 60000 / elapsed if elapsed else 0.0
+
+    def add(self, time_ms, altitude, speed):
+        """Step the detector with one position (altitude/speed None repeat the previous value)"""
+        if self.times and time_ms < self.times[-1]:
+            # Late report: too old to change the live phase
+            return
+        if altitude is None:
+            altitude = self.altitudes[-1] if self.altitudes else 0
+        if speed is None:
+            speed = self.speeds[-1] if self.speeds else 0
+        self.times.append(time_ms)
+        self.altitudes.append(altitude)
+        self.speeds.append(speed)
+        flight = self.flight
+        if self.airborne is None:
+            # First report: a fast aircraft is taken to be flying already
+            self.airborne = speed >= ROLL_SPEED
+            self.top = altitude if self.airborne else None
+
+        if not self.airborne:
+            if speed < ROLL_SPEED:
+                self.elevation = altitude
+            if (self.elevation is not None and speed >= ROLL_SPEED
+                    and altitude > self.elevation + AIRBORNE_HEIGHT):
+                self.airborne = True
+                self.top = altitude
+                if flight.off_at is None:
+                    flight.off_at = self._at(_liftoff(self.altitudes, self.elevation, len(self.times) - 1))
+                flight.on_at = flight.in_at = flight.landing_rate = None
+                self.phase = TAKEOFF
+            elif speed >= ROLL_SPEED:
+                self.phase = LANDING if flight.on_at else TAKEOFF
+            elif speed >= TAXI_SPEED:
+                if flight.out_at is None and flight.off_at is None:
+                    flight.out_at = self._at(-1)
+                flight.in_at = None
+                self.phase = TAXI
+            else:
+                if flight.on_at and flight.in_at is None and self.phase != PARKED:
+                    flight.in_at = self._at(-1)
+                self.phase = PARKED
+        elif speed < ROLL_SPEED:
+            # Too slow to fly: the touchdown is among the recent points
+            self.airborne = False
+            self.elevation = altitude
+            last = len(self.times) - 1
+            last_airborne = next(
+                (index for index in range(last, -1, -1) if self.altitudes[index] > altitude + AIRBORNE_HEIGHT),
+                None,
+            )
+            touchdown = last if last_airborne is None else _touchdown(self.altitudes, altitude, last_airborne, last + 1)
+            flight.on_at = self._at(touchdown)
+            flight.landing_rate = landing_rate(self.times, self.altitudes, touchdown)
+            self.phase = TAXI if speed >= TAXI_SPEED else PARKED
+        else:
+            self.top = max(self.top, altitude)
+            rate = self._rate()
+            if (self.phase == TAKEOFF and self.elevation is not None
+                    and altitude < self.elevation + TAKEOFF_HEIGHT):
+                pass
+            elif rate >= LEVEL_RATE:
+                self.phase = CLIMB
+            elif rate <= -LEVEL_RATE:
+                # The arrival field is unknown until touchdown; the departure field stands in
+                near = self.elevation is not None and altitude < self.elevation + APPROACH_HEIGHT
+                self.phase = APPROACH if near else DESCENT
+            elif altitude >= self.top - CRUISE_BAND:
+                self.phase = CRUISE
+            elif self.phase not in AIRBORNE:
+                self.phase = CLIMB
+
+        # Keep RECENT_MS of points
+        cutoff = time_ms - RECENT_MS
+        drop = 0
+        while drop < len(self.times) - 1 and self.times[drop] < cutoff:
+            drop += 1
+        if drop:
+            del self.times[:drop], self.altitudes[:drop], self.speeds[:drop]
+
+    def save(self):
+        flight = self.flight
+        flight.phase = PHASES[self.phase] if self.phase is not None else ''
+        flight.phase_state = {
+            'air': self.airborne, 'elevation': self.elevation, 'top': self.top,
+            't': self.times, 'alt': self.altitudes, 'kt': self.speeds,
+        }
+        flight.save(update_fields=[
+            'phase', 'phase_state', 'out_at', 'off_at', 'on_at', 'in_at', 'landing_rate',
+        ])
+
+
+def track_live_phases(messages):
+    """Step the live detector of every live flight with its positions among saved messages"""
+    positions = {}
+    flights = {}
+    for message in messages:
+        flight = message.flight
+        if flight is None or flight.status != Flight.LIVE or message.latitude is None or message.longitude is None:
+            continue
+        flights[flight.pk] = flight
+        positions.setdefault(flight.pk, []).append(message)
+    for flight_id, flight_positions in positions.items():
+        detector = LivePhases(flights[flight_id])
+        flight_positions.sort(key=lambda message: message.timestamp)
+        for message in flight_positions:
+            detector.add((message.timestamp - EPOCH) // ONE_MS, message.altitude, message.speed)
+        detector.save()
@@ -0,0 +1,114 @@
+"""
+PIREPs: one summary row per completed flight.
+
+compact_flight() generates the Pirep of a closed flight from its Track and
+the OOOI times found by acars.phases, before the position rows are deleted:
+great-circle distance (acars.stats.track_distance_nm), block time (out to
+in), air time (off to on), highest altitude, landing rate and fuel used. The
+pilot's totals (PilotStats.flight_seconds) count block time where it is
+known.
+
+Fuel used is ACARSMessage.fuel_flow integrated over the report times
+(trapezoids), so it needs the message rows. Regenerating the PIREP of a
+flight whose position rows were deleted keeps its stored fuel_used. The
+generate_pireps command regenerates historical PIREPs in a process pool;
+regenerate_pireps() is the task run by each worker.
+"""
+from django.db import transaction
+from django.db.models import Count
+from .models import ACARSMessage, Flight, Pirep
+from .tracks import NULLABLE, decode_track, load_track
+
+ALTITUDE_NULL = dict(NULLABLE)['altitude']
+
+
+def _seconds(start, end):
+    if start is None or end is None:
+        return None
+    return max(0, int((end - start).total_seconds()))
+
+
+def max_altitude(track):
+    """Highest reported altitude of a track, or None if it has none"""
+    if not len(track):
+        return None
+    if not any(track.nulls):
+        return max(track.altitudes)
+    return max(
+        (altitude for altitude, flags in zip(track.altitudes, track.nulls) if not flags & ALTITUDE_NULL),
+        default=None,
+    )
+
+
+def fuel_used(flight):
+    """fuel_flow of the flight's reports integrated over time, or None without fuel_flow reports"""
+    samples = ACARSMessage.objects.filter(
+        flight=flight, fuel_flow__isnull=False,
+        # The time range lets PostgreSQL prune to the flight's partitions
+        timestamp__range=(flight.started_at, flight.last_report_at),
+    ).order_by('timestamp', 'id').values_list('timestamp', 'fuel_flow')
+    total = 0.0
+    previous = None
+    for timestamp, flow in samples.iterator(chunk_size=2000):
+        flow = float(flow)
+        if previous is not None:
+            total += (previous[1] + flow) / 2 * (timestamp - previous[0]).total_seconds() / 3600
+        previous = timestamp, flow
+    return None if previous is None else total
+
+
+def generate_pirep(flight, track=None, distance_nm=None, with_fuel=True):
+    """
+    Create or refresh the Pirep of a closed flight whose phases are stored.
+    Without with_fuel the stored fuel_used is kept (the rows are gone).
+    """
+    from .stats import track_distance_nm
+
+    if track is None:
+        track = load_track(flight)
+    values = {
+        'user_id': flight.user_id,
+        'flight_number': flight.flight_number,
+        'aircraft_id': flight.aircraft_id,
+        'route': flight.route,
+        'distance_nm': track_distance_nm(track) if distance_nm is None else distance_nm,
+        'block_seconds': _seconds(flight.out_at, flight.in_at),
+        'air_seconds': _seconds(flight.off_at, flight.on_at),
+        'max_altitude': max_altitude(track),
+        'landing_rate': flight.landing_rate,
+        'point_count': len(track),
+    }
+    if with_fuel:
+        values['fuel_used'] = fuel_used(flight)
+    pirep, _ = Pirep.objects.update_or_create(flight=flight, defaults=values)
+    return pirep
+
+
+def regenerate_pireps(flight_ids):
+    """
+    Regenerate the PIREPs of compacted flights, detecting their phases first
+    if that was never done. Returns the ids of the users concerned.
+    """
+    from .phases import detect_phases
+
+    flights = Flight.objects.filter(pk__in=flight_ids, track__isnull=False).select_related('track')
+    # Fuel can only be recomputed while every position is still a row
+    position_rows = dict(
+        ACARSMessage.objects.filter(flight_id__in=flight_ids, latitude__isnull=False, longitude__isnull=False)
+        .values('flight_id').annotate(count=Count('id')).order_by().values_list('flight_id', 'count')
+    )
+    user_ids = set()
+    for flight in flights:
+        track = decode_track(flight.track.data)
+        with transaction.atomic():
+            if not flight.phase and len(track):
+                phase_values = detect_phases(track).flight_values(track.times)
+                for field, value in phase_values.items():
+                    setattr(flight, field, value)
+                flight.save(update_fields=list(phase_values))
+            generate_pirep(
+                flight, track, distance_nm=flight.track.distance_nm,
+                with_fuel=position_rows.get(flight.pk, 0) >= len(track),
+            )
+        user_ids.add(flight.user_id)
+    return user_ids
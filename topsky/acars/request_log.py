@@ -0,0 +1,405 @@
+"""
+Structured, sampled SmartCARS request log.
+
+Each exchange produces at most one JSON record on the 'acars.requests' logger.
+Records are handed to a background thread through a bounded queue, so the
+request thread never formats JSON or writes to stdout. Credentials are
+redacted and bodies are capped; full capture (all headers, larger bodies)
+is only enabled for flagged users or requests carrying the debug header.
+Only a prefix of a body the view has already read is kept: logging never
+reads an upload itself.
+
+Independently of sampling, every exchange is kept in a small per-worker ring
+buffer (recent_exchanges) that is published to the shared cache, so staff can
+inspect the last few hundred SmartCARS requests across all workers.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from django.conf import settings
+from django.core.cache import cache
+from django.http import QueryDict
+from django.utils.functional import SimpleLazyObject, empty
+
+logger = logging.getLogger('acars.requests')
+
+DEFAULTS = {
+    # Fraction of successful requests logged per endpoint; errors are always logged
+    'SAMPLE_RATES': {
+        'LOGIN': 1.0, 'TEST_AUTH': 1.0, 'PILOT_INFO': 0.05, 'DATA_INFO': 0.01, 'API_INFO': 0.01,
+        'MESSAGES': 0.01, 'MESSAGES_LATEST': 0.01, 'MESSAGES_STATS': 0.01, 'BULK_CREATE': 0.01, 'NDJSON_INGEST': 1.0,
+        'FLIGHTS': 0.01, 'FLIGHT_TRACK': 0.01, 'LIVE_AREA': 0.01,
+    },
+    'DEFAULT_SAMPLE_RATE': 0.1,
+    'MAX_BODY': 1024,
+    'FULL_CAPTURE_MAX_BODY': 65536,
+    # User ids, usernames or login identifiers whose requests are captured in full
+    'FULL_CAPTURE_USERS': [],
+    # Requests with "X-SmartCARS-Debug: <token>" are captured in full (disabled when empty)
+    'DEBUG_HEADER_TOKEN': '',
+    'QUEUE_SIZE': 10000,
+    # Per-worker ring buffer of recent exchanges (0 disables it)
+    'RING_SIZE': 200,
+    'RING_PUBLISH_INTERVAL': 5,
+    'RING_CACHE_TTL': 600,
+}
+
+REDACTED = '***'
+SENSITIVE_KEYS = {
+    'password', 'passwd', 'secret', 'api_key', 'apikey', 'token', 'session',
+    'acars_token', 'access', 'refresh', 'authorization', 'cookie',
+}
+SENSITIVE_HEADERS = {'HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_X_API_KEY', 'HTTP_X_SMARTCARS_DEBUG'}
+# "key": value / key=value pairs of credential fields in a body prefix that can't be parsed
+SENSITIVE_TEXT = re.compile(
+    r'("?(?:%s)"?\s*[:=]\s*)(?:"[^"]*"?|[^&,}\s]*)' % '|'.join(sorted(SENSITIVE_KEYS)), re.IGNORECASE,
+)
+# Ingest uploads: their bodies are never captured
+UPLOAD_ENDPOINTS = {'BULK_CREATE', 'NDJSON_INGEST'}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'SMARTCARS_REQUEST_LOG', {}))
+    return config
+
+
+def redact(value):
+    """Recursively replace credential fields in JSON-like data"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def _capped(text, limit):
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...[{len(text) - limit} more]"
+
+
+def _mask(text):
+    return SENSITIVE_TEXT.sub(lambda match: match.group(1) + REDACTED, text)
+
+
+def _body_prefix(request, endpoint_name, limit):
+    """
+    (prefix, size) of the request body: its first limit * 4 bytes (enough for
+    `limit` characters) if the view has already read it. Unread and streamed
+    bodies and uploads to the ingest endpoints are only named, never read.
+    """
+    if endpoint_name in UPLOAD_ENDPOINTS:
+        return b'[upload]', None
+    body = getattr(request, '_body', None)
+    if body is None:
+        if getattr(request, '_read_started', False):
+            # Consumed as a stream
+            return b'[streamed]', None
+        return (b'[not read]' if request.META.get('CONTENT_LENGTH') not in (None, '', '0') else b''), None
+    return body[: limit * 4], len(body)
+
+
+def _render_body(raw, size, content_type, limit):
+    if not raw:
+        return None
+
+    text = raw.decode('utf-8', errors='replace')
+    if size is None:
+        return text
+    if size > len(raw):
+        # A prefix does not parse, so credentials are masked in the text itself
+        return f"{_mask(text[:limit])}...[{size} bytes]"
+    try:
+        if content_type == 'application/json' or raw[:1] in (b'{', b'['):
+            return _capped(json.dumps(redact(json.loads(raw)), separators=(',', ':')), limit)
+        if content_type == 'application/x-www-form-urlencoded':
+            return _capped(json.dumps(redact(QueryDict(text).dict()), separators=(',', ':')), limit)
+    except ValueError:
+        pass
+    return _capped(_mask(text), limit)
+
+
+def _headers(request):
+    return {
+        key[5:].replace('_', '-').title(): REDACTED if key in SENSITIVE_HEADERS else value
+        for key, value in request.META.items()
+        if key.startswith('HTTP_')
+    }
+
+
+def _identity(request):
+    user = getattr(request, '_smartcars_log_user', None)
+    if user is None:
+        user = getattr(request, 'user', None)
+    if user is not None and getattr(user, 'is_authenticated', False):
+        # isinstance() would go through the proxied __class__ and load the object
+        if issubclass(type(user), SimpleLazyObject) and user._wrapped is empty:
+            # Session-token user: don't load the User row just for the log
+            return {'id': user.pk}
+        return {'id': user.pk, 'username': user.username}
+    identifier = getattr(request, 'smartcars_identifier', None)
+    return {'identifier': identifier} if identifier else None
+
+
+def _full_capture(request, config, identity):
+    token = config['DEBUG_HEADER_TOKEN']
+    if token and request.META.get('HTTP_X_SMARTCARS_DEBUG') == token:
+        return 'debug-header'
+    flagged = {name.lower() for name in config['FULL_CAPTURE_USERS']}
+    if flagged and identity:
+        names = {str(value).lower() for value in identity.values()}
+        if flagged & names:
+            return 'flagged-user'
+    return None
+
+
+def log_request_details(request, endpoint_name):
+    """Mark the start of a SmartCARS exchange (cheap: no formatting or I/O)"""
+    request._smartcars_log = (endpoint_name, time.perf_counter())
+
+
+def log_response_details(request, response_data, status_code):
+    """Emit the structured record for the exchange, if it is sampled"""
+    endpoint_name, started = getattr(request, '_smartcars_log', ('UNKNOWN', None))
+    duration_ms = round((time.perf_counter() - started) * 1000, 2) if started else None
+
+    config = get_config()
+    identity = _identity(request)
+    if config['RING_SIZE']:
+        recent_exchanges.record(
+            request, endpoint_name, status_code, duration_ms, identity, response_data
+        )
+
+    full_capture = _full_capture(request, config, identity)
+    sample_rate = config['SAMPLE_RATES'].get(endpoint_name, config['DEFAULT_SAMPLE_RATE'])
+    if status_code < 400 and not full_capture and random.random() >= sample_rate:
+        return
+
+    limit = config['FULL_CAPTURE_MAX_BODY'] if full_capture else config['MAX_BODY']
+    record = {
+        'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        'endpoint': endpoint_name,
+        'method': request.method,
+        'path': request.path,
+        'status': status_code,
+        'duration_ms': duration_ms,
+        'user': identity,
+        'client': request.META.get('HTTP_X_FORWARDED_FOR') or request.META.get('REMOTE_ADDR'),
+        'user_agent': request.META.get('HTTP_USER_AGENT'),
+        'sample_rate': 1.0 if full_capture else sample_rate,
+        'request_body': _render_body(*_body_prefix(request, endpoint_name, limit), request.content_type, limit),
+        'response_body': _capped(
+            json.dumps(redact(response_data), separators=(',', ':'), default=str), limit
+        ),
+    }
+    if full_capture:
+        record['capture'] = full_capture
+        record['headers'] = _headers(request)
+        record['query'] = request.GET.dict()
+
+    _ensure_listener()
+    logger.info('smartcars %s %s', endpoint_name, status_code, extra={'exchange': record})
+
+
+class ExchangeRingBuffer:
+    """
+    Last `size` SmartCARS exchanges of this worker.
+
+    Recording is a deque append of the raw pieces (no lock, no formatting);
+    redaction and serialization happen when a background thread publishes the
+    buffer to the cache every publish_interval seconds, under a per-worker key
+    listed in a shared index. merged() reads all workers' buffers back.
+    """
+    INDEX_KEY = 'acars:exchanges:workers'
+
+    def __init__(self, size=200, publish_interval=5, cache_ttl=600, body_limit=1024):
+        self.publish_interval = publish_interval
+        self.cache_ttl = cache_ttl
+        self.body_limit = body_limit
+        self._entries = deque(maxlen=size)
+        self._recorded = 0
+        self._published = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def worker_id(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def record(self, request, endpoint_name, status_code, duration_ms, identity, response_data):
+        raw, size = _body_prefix(request, endpoint_name, self.body_limit)
+        self._entries.append((
+            time.time(), endpoint_name, request.method, request.path, status_code,
+            duration_ms, identity,
+            request.META.get('HTTP_X_FORWARDED_FOR') or request.META.get('REMOTE_ADDR'),
+            raw, size, request.content_type, response_data,
+        ))
+        self._recorded += 1
+        self._ensure_publisher()
+
+    def snapshot(self):
+        """Rendered (redacted) entries of this worker, oldest first"""
+        while True:
+            try:
+                entries = tuple(self._entries)
+                break
+            except RuntimeError:
+                # Appended to while copying; try again
+                continue
+        worker = self.worker_id
+        return [self._render(entry, worker) for entry in entries]
+
+    def _render(self, entry, worker):
+        (ts, endpoint_name, method, path, status_code, duration_ms,
+         identity, client, raw, size, content_type, response_data) = entry
+        return {
+            'ts': datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec='milliseconds'),
+            'worker': worker,
+            'endpoint': endpoint_name,
+            'method': method,
+            'path': path,
+            'status': status_code,
+            'duration_ms': duration_ms,
+            'user': identity,
+            'client': client,
+            'request_body': _render_body(raw, size, content_type, self.body_limit),
+            'response_body': _capped(
+                json.dumps(redact(response_data), separators=(',', ':'), default=str),
+                self.body_limit,
+            ),
+        }
+
+    def publish(self):
+        """Write this worker's buffer to the cache and register it in the index"""
+        recorded = self._recorded
+        if recorded == self._published:
+            return False
+        worker = self.worker_id
+        cache.set(f"acars:exchanges:{worker}", self.snapshot(), self.cache_ttl)
+
+        now = time.time()
+        index = cache.get(self.INDEX_KEY) or {}
+        index = {key: seen for key, seen in index.items() if now - seen < self.cache_ttl}
+        index[worker] = now
+        cache.set(self.INDEX_KEY, index, self.cache_ttl)
+        self._published = recorded
+        return True
+
+    def merged(self):
+        """Entries from every worker that published recently, newest first"""
+        workers = list(cache.get(self.INDEX_KEY) or {})
+        buffers = cache.get_many([f"acars:exchanges:{worker}" for worker in workers])
+        # This worker's own entries are read live rather than from the last publish
+        buffers[f"acars:exchanges:{self.worker_id}"] = self.snapshot()
+        entries = [entry for buffer in buffers.values() for entry in buffer]
+        entries.sort(key=lambda entry: entry['ts'], reverse=True)
+        return entries
+
+    def _ensure_publisher(self):
+        # Threads do not survive a fork, so (re)start per worker process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='smartcars-exchanges', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.publish_interval)
+            try:
+                self.publish()
+            except Exception:
+                logging.getLogger(__name__).exception("Failed to publish SmartCARS exchanges")
+
+
+_ring_config = get_config()
+recent_exchanges = ExchangeRingBuffer(
+    size=_ring_config['RING_SIZE'],
+    publish_interval=_ring_config['RING_PUBLISH_INTERVAL'],
+    cache_ttl=_ring_config['RING_CACHE_TTL'],
+    body_limit=_ring_config['MAX_BODY'],
+)
+
+
+class JSONExchangeFormatter(logging.Formatter):
+    """Formats the 'exchange' dict attached to a record as one JSON line"""
+
+    def format(self, record):
+        exchange = getattr(record, 'exchange', None)
+        if exchange is None:
+            return super().format(record)
+        return json.dumps(exchange, separators=(',', ':'), default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread untouched (formatting happens there)
+    and drops them when the queue is full instead of blocking the request.
+    """
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    # Threads do not survive a fork, so start the listener per worker process
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        record_queue = queue.Queue(get_config()['QUEUE_SIZE'])
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JSONExchangeFormatter())
+
+        for handler in list(logger.handlers):
+            if isinstance(handler, DroppingQueueHandler):
+                logger.removeHandler(handler)
+        logger.addHandler(DroppingQueueHandler(record_queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        _listener = QueueListener(record_queue, output)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+@atexit.register
+def _stop_listener():
+    # Drain queued records on worker shutdown
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
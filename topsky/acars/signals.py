@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .catalog import bump_version
+from .credentials import credential_cache
+from .models import Aircraft, Airport, Schedule, SmartcarsProfile
+from .tokens import forget_session_epoch
+
+
+@receiver(pre_save, sender=User)
+def detect_credential_change(sender, instance, update_fields=None, **kwargs):
+    """Flag password / is_active changes so issued sessions get revoked"""
+    if not instance.pk:
+        return
+    if update_fields is not None and not {'password', 'is_active'} & set(update_fields):
+        return
+    old = User.objects.filter(pk=instance.pk).values('password', 'is_active').first()
+    instance._smartcars_revoke_sessions = bool(old) and (
+        old['password'] != instance.password or old['is_active'] != instance.is_active
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_credentials(sender, instance, **kwargs):
+    """Drop cached credentials when password or is_active may have changed"""
+    credential_cache.invalidate_user(instance.pk)
+    if getattr(instance, '_smartcars_revoke_sessions', False):
+        instance._smartcars_revoke_sessions = False
+        profile = SmartcarsProfile.objects.filter(user_id=instance.pk).first()
+        if profile:
+            profile.revoke_sessions()
+
+
+@receiver(post_save, sender=SmartcarsProfile)
+@receiver(post_delete, sender=SmartcarsProfile)
+def invalidate_profile_credentials(sender, instance, update_fields=None, **kwargs):
+    """Drop cached credentials when the API key may have changed"""
+    if update_fields is not None and 'api_key' not in update_fields:
+        return
+    credential_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=SmartcarsProfile)
+def forget_profile_sessions(sender, instance, **kwargs):
+    """Tokens of a deleted profile (or user) stop verifying at once"""
+    forget_session_epoch(instance.user_id)
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_save, sender=Aircraft)
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Airport)
+@receiver(post_delete, sender=Aircraft)
+@receiver(post_delete, sender=Schedule)
+def bump_catalog_version(sender, **kwargs):
+    """Let every worker rebuild its catalog snapshot once the change commits"""
+    bump_version()
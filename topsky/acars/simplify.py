@@ -0,0 +1,143 @@
+"""
+Level-of-detail simplification of flight tracks (Douglas-Peucker).
+
+Tracks are simplified in Web Mercator metres, the space map clients draw in,
+so a tolerance of one screen pixel at zoom z is mercator_tolerance(z).
+significance() runs Douglas-Peucker once and gives every point the largest
+tolerance at which it survives; any level is then just the points above a
+threshold. Completed flights store a few precomputed levels next to their
+track blob (FlightTrack.levels), each an ascending index list encoded like the
+track columns.
+
+Levels blob layout (before compression, little-endian):
+    header     '<4sBB'  magic, format version, level count
+    per level  '<BI'    zoom, point count; then the indices as packed deltas
+"""
+import math
+import struct
+import zlib
+from array import array
+from .tracks import COMPRESSION_LEVEL, COORDINATE_SCALE, pack_deltas, unpack_deltas
+
+MAGIC = b'ALOD'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBB')
+LEVEL_HEADER = struct.Struct('<BI')
+EARTH_RADIUS = 6378137.0
+# Metres per pixel at zoom 0 of a 256 px Web Mercator tile
+ZOOM0_RESOLUTION = 2 * math.pi * EARTH_RADIUS / 256
+# Zoom levels precomputed for completed flights; finer requests get the full track
+ZOOM_LEVELS = (2, 4, 6, 8, 10, 12, 14, 16)
+MAX_LATITUDE = 85.0511
+
+
+def mercator_tolerance(zoom, pixels=1.0):
+    """Web Mercator distance covered by `pixels` screen pixels at zoom"""
+    return ZOOM0_RESOLUTION / (2 ** zoom) * pixels
+
+
+def project(track):
+    """Web Mercator x, y arrays of a track; longitudes are unwrapped across the antimeridian"""
+    xs = array('d')
+    ys = array('d')
+    scale = math.radians(1) / COORDINATE_SCALE
+    shift = 0
+    previous = None
+    for latitude, longitude in zip(track.latitudes, track.longitudes):
+        if previous is not None and abs(longitude - previous) > 180 * COORDINATE_SCALE:
+            shift += 360 * COORDINATE_SCALE if longitude < previous else -360 * COORDINATE_SCALE
+        previous = longitude
+        latitude = max(-MAX_LATITUDE * COORDINATE_SCALE, min(latitude, MAX_LATITUDE * COORDINATE_SCALE))
+        xs.append(EARTH_RADIUS * (longitude + shift) * scale)
+        ys.append(EARTH_RADIUS * math.log(math.tan(math.pi / 4 + latitude * scale / 2)))
+    return xs, ys
+
+
+def significance(xs, ys):
+    """
+    Largest Douglas-Peucker tolerance at which each point is kept (endpoints are
+    infinite). A point's value is capped by the split that created its segment,
+    so the points above any threshold are exactly the Douglas-Peucker result.
+    """
+    count = len(xs)
+    result = array('d', bytes(8 * count))
+    if count == 0:
+        return result
+    result[0] = result[-1] = math.inf
+    stack = [(0, count - 1, math.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        x0, y0 = xs[first], ys[first]
+        dx, dy = xs[last] - x0, ys[last] - y0
+        length = math.hypot(dx, dy)
+        best = -1.0
+        split = first + 1
+        if length == 0:
+            for index in range(first + 1, last):
+                distance = math.hypot(xs[index] - x0, ys[index] - y0)
+                if distance > best:
+                    best, split = distance, index
+        else:
+            for index in range(first + 1, last):
+                distance = abs(dy * (xs[index] - x0) - dx * (ys[index] - y0))
+                if distance > best:
+                    best, split = distance, index
+            best /= length
+        best = min(best, cap)
+        result[split] = best
+        stack.append((first, split, best))
+        stack.append((split, last, best))
+    return result
+
+
+def select(weights, tolerance):
+    """Indices of the points kept at tolerance"""
+    return array('I', (index for index, weight in enumerate(weights) if weight > tolerance))
+
+
+def simplify(track, tolerance):
+    """Track simplified to `tolerance` metres (Web Mercator) on the fly"""
+    if len(track) < 3:
+        return track
+    return track.take(select(significance(*project(track)), tolerance))
+
+
+def build_levels(track, zooms=ZOOM_LEVELS):
+    """{zoom: indices} for the precomputed zoom levels of a track"""
+    weights = significance(*project(track))
+    return {zoom: select(weights, mercator_tolerance(zoom)) for zoom in zooms}
+
+
+def encode_levels(levels):
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(levels))]
+    for zoom, indices in sorted(levels.items()):
+        parts.append(LEVEL_HEADER.pack(zoom, len(indices)))
+        parts.append(pack_deltas(indices))
+    return zlib.compress(b''.join(parts), COMPRESSION_LEVEL)
+
+
+def decode_levels(blob):
+    raw = memoryview(zlib.decompress(blob))
+    magic, version, level_count = HEADER.unpack_from(raw)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError('Unsupported levels format')
+    offset = HEADER.size
+    levels = {}
+    for _ in range(level_count):
+        zoom, count = LEVEL_HEADER.unpack_from(raw, offset)
+        offset += LEVEL_HEADER.size
+        levels[zoom], offset = unpack_deltas(raw, offset, count, 0)
+    return levels
+
+
+def level_for(levels, zoom=None, tolerance=None):
+    """
+    Precomputed zoom level to serve: the coarsest one at least as detailed as
+    requested, or None when only the full track is detailed enough.
+    """
+    if zoom is not None:
+        tolerance = mercator_tolerance(zoom)
+    candidates = [z for z in levels if mercator_tolerance(z) <= tolerance]
+    return min(candidates) if candidates else None
@@ -0,0 +1,216 @@
+"""
+In-memory spatial index of live flights for viewport and proximity queries.
+
+FlightIndex keeps the newest position of every active flight in a uniform
+grid of CELL_SIZE degree cells. It is fed by ingest in this process (through
+acars.live.publish_positions), by the live map bridge when it listens, and is
+rebuilt from LatestPosition when the worker starts and every REFRESH_INTERVAL
+seconds, so positions ingested by other workers show up as well. Flights
+without a report for EXPIRE_AFTER seconds are dropped.
+"""
+import logging
+import math
+import threading
+import time
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CELL_SIZE = getattr(settings, 'SMARTCARS_FLIGHT_INDEX_CELL_DEGREES', 1.0)
+EXPIRE_AFTER = getattr(settings, 'SMARTCARS_FLIGHT_INDEX_EXPIRE', 600)
+REFRESH_INTERVAL = getattr(settings, 'SMARTCARS_FLIGHT_INDEX_REFRESH', 30)
+SWEEP_INTERVAL = 5
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class FlightIndex:
+    """Grid of live flight positions; all methods are thread-safe"""
+
+    def __init__(self, cell_size=CELL_SIZE, expire_after=EXPIRE_AFTER, refresh_interval=REFRESH_INTERVAL):
+        self.cell_size = cell_size
+        self.expire_after = expire_after
+        self.refresh_interval = refresh_interval
+        self.columns = int(math.ceil(360 / cell_size))
+        # row -> {column -> flight ids}; only occupied cells are stored
+        self.rows = {}
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._rebuilding = threading.Lock()
+        self._loaded_at = None
+        self._swept_at = 0.0
+
+    def _cell(self, lat, lon):
+        column = int((lon + 180) // self.cell_size) % self.columns
+        row = int((min(lat, 89.999999) + 90) // self.cell_size)
+        return row, column
+
+    def _put(self, update):
+        flight = update['flight']
+        entry = self.entries.get(flight)
+        if entry is not None:
+            if update['t'] < entry[0]['t']:
+                return
+            self._unlink(flight, entry[1])
+        cell = self._cell(update['lat'], update['lon'])
+        self.entries[flight] = (update, cell)
+        self.rows.setdefault(cell[0], {}).setdefault(cell[1], set()).add(flight)
+
+    def _unlink(self, flight, cell):
+        row, column = cell
+        columns = self.rows[row]
+        columns[column].discard(flight)
+        if not columns[column]:
+            del columns[column]
+            if not columns:
+                del self.rows[row]
+
+    def _remove(self, flight):
+        self._unlink(flight, self.entries.pop(flight)[1])
+
+    def update(self, updates):
+        """Insert or move flights ({'flight', 'lat', 'lon', 't', ...} as built by acars.live)"""
+        with self._lock:
+            for update in updates:
+                self._put(update)
+
+    def _sweep(self, now):
+        if now - self._swept_at < SWEEP_INTERVAL:
+            return
+        self._swept_at = now
+        cutoff = (now - self.expire_after) * 1000
+        for flight in [flight for flight, (update, _) in self.entries.items() if update['t'] < cutoff]:
+            self._remove(flight)
+
+    def _prepare(self):
+        now = time.time()
+        if self._loaded_at is None or now - self._loaded_at >= self.refresh_interval:
+            self.rebuild()
+        with self._lock:
+            self._sweep(now)
+
+    def rebuild(self):
+        """Reload the positions of live flights from the database (one rebuild at a time)"""
+        if not self._rebuilding.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            updates = load_live_positions(self.expire_after)
+        except DatabaseError:
+            # Keep answering from what ingest has fed in; retry after the interval
+            logger.warning('Live flight index not reloaded', exc_info=True)
+            updates = []
+        try:
+            with self._lock:
+                for update in updates:
+                    self._put(update)
+                self._loaded_at = time.time()
+        finally:
+            self._rebuilding.release()
+
+    def _row_range(self, south, north):
+        first = self._cell(max(south, -90), 0)[0]
+        last = self._cell(min(north, 90), 0)[0]
+        return first, last
+
+    def _column_ranges(self, west, east):
+        """Column intervals covering west..east, split at the antimeridian"""
+        if east - west >= 360:
+            return [(0, self.columns - 1)]
+        west_column = self._cell(0, west)[1]
+        east_column = self._cell(0, east)[1]
+        if west <= east and west_column <= east_column:
+            return [(west_column, east_column)]
+        return [(west_column, self.columns - 1), (0, east_column)]
+
+    def _candidates(self, south, west, north, east):
+        first_row, last_row = self._row_range(south, north)
+        column_ranges = self._column_ranges(west, east)
+        span = sum(last - first + 1 for first, last in column_ranges)
+        for row in range(first_row, last_row + 1):
+            columns = self.rows.get(row)
+            if not columns:
+                continue
+            if span <= 4 * len(columns):
+                for first, last in column_ranges:
+                    for column in range(first, last + 1):
+                        if column in columns:
+                            yield from columns[column]
+            else:
+                # Sparse row: walking its occupied cells is cheaper than the range
+                for column, flights in columns.items():
+                    for first, last in column_ranges:
+                        if first <= column <= last:
+                            yield from flights
+                            break
+
+    def bbox(self, south, west, north, east, limit=None):
+        """
+        Positions inside the box; west > east crosses the antimeridian.
+        Longitudes are expected in -180..180.
+        """
+        self._prepare()
+        crosses = west > east
+        results = []
+        with self._lock:
+            for flight in self._candidates(south, west, north, east):
+                update = self.entries[flight][0]
+                lon = update['lon']
+                if not south <= update['lat'] <= north:
+                    continue
+                if (crosses and west > lon > east) or (not crosses and not west <= lon <= east):
+                    continue
+                results.append(update)
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+    def radius(self, lat, lon, radius_km, limit=None):
+        """Positions within radius_km of (lat, lon), nearest first, with 'distance_km'"""
+        self._prepare()
+        lat_span = math.degrees(radius_km / EARTH_RADIUS_KM)
+        south, north = lat - lat_span, lat + lat_span
+        if south <= -90 or north >= 90:
+            west, east = -180, 180
+        else:
+            lon_span = math.degrees(
+                radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(max(abs(south), abs(north)))))
+            )
+            if lon_span >= 180:
+                west, east = -180, 180
+            else:
+                west = (lon - lon_span + 180) % 360 - 180
+                east = (lon + lon_span + 180) % 360 - 180
+        results = []
+        with self._lock:
+            for flight in self._candidates(south, west, north, east):
+                update = self.entries[flight][0]
+                distance = haversine_km(lat, lon, update['lat'], update['lon'])
+                if distance <= radius_km:
+                    results.append(dict(update, distance_km=round(distance, 1)))
+        results.sort(key=lambda update: update['distance_km'])
+        return results[:limit] if limit else results
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def load_live_positions(max_age):
+    """Latest positions of live flights that reported in the last max_age seconds"""
+    from .live import position_updates
+    from .models import Flight, LatestPosition
+
+    cutoff = timezone.now() - timezone.timedelta(seconds=max_age)
+    return position_updates(
+        LatestPosition.objects.filter(timestamp__gte=cutoff, flight__status=Flight.LIVE)
+    )
+
+
+flight_index = FlightIndex()
@@ -0,0 +1,227 @@
+"""
+Per-pilot statistics kept as running totals in PilotStats.
+
+Ingest adds each batch's message counts, newly seen aircraft (PilotAircraft,
+so counting distinct aircraft never scans the history) and opened flights
+inside the batch's transaction. compact_flight adds a completed flight with
+the block time and distance of its Pirep (acars.pireps); a flight without a
+detected block time counts from its first to its last report. Both go through add_stats, a single
+INSERT ... ON CONFLICT DO UPDATE that adds to the stored totals. Readers
+(pilot_info, messages/stats/, the dashboard) fetch one row by primary key.
+
+rebuild_pilot_stats recomputes the totals from stored history, for example
+after the table was introduced or after flights were deleted by hand.
+Position rows deleted by compaction are counted from their tracks
+(point_count and incoming_count), rows moved to the cold archive from
+MessageArchive.user_counts.
+"""
+import math
+from django.db import connection
+from django.db.models import Count, F, Min, Q, Sum
+from django.utils import timezone
+from .models import ACARSMessage, Flight, FlightTrack, MessageArchive, PilotAircraft, PilotStats
+from .tracks import COORDINATE_SCALE, decode_track
+
+COUNTERS = (
+    'total_messages', 'incoming_messages', 'outgoing_messages', 'unique_aircraft',
+    'unique_flights', 'completed_flights', 'flight_seconds', 'distance_nm',
+)
+EARTH_RADIUS_NM = 3440.065
+
+
+def add_stats(user_id, **deltas):
+    """Add deltas (COUNTERS) to a pilot's totals, creating the row on first use"""
+    quote = connection.ops.quote_name
+    table = quote(PilotStats._meta.db_table)
+    columns = ('user_id',) + COUNTERS + ('updated_at',)
+    updated_at = PilotStats._meta.get_field('updated_at').get_db_prep_save(timezone.now(), connection)
+    params = [user_id] + [deltas.get(name, 0) for name in COUNTERS] + [updated_at]
+    assignments = [f"{quote(name)} = {table}.{quote(name)} + EXCLUDED.{quote(name)}" for name in COUNTERS]
+    assignments.append(f"{quote('updated_at')} = EXCLUDED.{quote('updated_at')}")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON CONFLICT ({quote('user_id')}) DO UPDATE SET {', '.join(assignments)}",
+            params,
+        )
+
+
+def _add_aircraft(user_id, aircraft_ids, seen_at):
+    """Remember aircraft for the pilot; returns how many were new"""
+    if not aircraft_ids:
+        return 0
+    quote = connection.ops.quote_name
+    table = quote(PilotAircraft._meta.db_table)
+    seen_at = PilotAircraft._meta.get_field('first_seen_at').get_db_prep_save(seen_at, connection)
+    params = []
+    for aircraft_id in aircraft_ids:
+        params += [user_id, aircraft_id, seen_at]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({quote('user_id')}, {quote('aircraft_id')}, {quote('first_seen_at')}) "
+            f"VALUES {', '.join(['(%s, %s, %s)'] * len(aircraft_ids))} "
+            f"ON CONFLICT ({quote('user_id')}, {quote('aircraft_id')}) DO NOTHING",
+            params,
+        )
+        return cursor.rowcount
+
+
+def record_messages(user_id, messages, opened_flights=0):
+    """Count a saved batch of one user (inside its transaction)"""
+    incoming = sum(1 for message in messages if message.direction == 'IN')
+    aircraft_ids = sorted({message.aircraft_id for message in messages if message.aircraft_id})
+    add_stats(
+        user_id,
+        total_messages=len(messages),
+        incoming_messages=incoming,
+        outgoing_messages=len(messages) - incoming,
+        unique_aircraft=_add_aircraft(user_id, aircraft_ids, max(message.timestamp for message in messages)),
+        unique_flights=opened_flights,
+    )
+
+
+def track_distance_nm(track):
+    """Great-circle length of a track in nautical miles (haversine between successive points)"""
+    scale = math.radians(1) / COORDINATE_SCALE
+    half = scale / 2
+    # Lists index faster than array('q'); each point's cosine is computed once, not twice
+    latitudes = track.latitudes.tolist()
+    longitudes = track.longitudes.tolist()
+    cosines = [math.cos(latitude * scale) for latitude in latitudes]
+    sin, sqrt, asin = math.sin, math.sqrt, math.asin
+    total = 0.0
+    for index in range(1, len(latitudes)):
+        sin_latitude = sin((latitudes[index] - latitudes[index - 1]) * half)
+        sin_longitude = sin((longitudes[index] - longitudes[index - 1]) * half)
+        a = sin_latitude * sin_latitude + cosines[index - 1] * cosines[index] * sin_longitude * sin_longitude
+        total += asin(sqrt(a if a < 1.0 else 1.0))
+    return 2 * EARTH_RADIUS_NM * total
+
+
+def _flight_seconds(flight):
+    if flight.ended_at is None:
+        return 0
+    return max(0, int((flight.ended_at - flight.started_at).total_seconds()))
+
+
+def record_completed_flight(flight, pirep):
+    """Count a flight whose track has just been compacted (inside that transaction)"""
+    add_stats(
+        flight.user_id,
+        completed_flights=1,
+        flight_seconds=_flight_seconds(flight) if pirep.block_seconds is None else pirep.block_seconds,
+        distance_nm=pirep.distance_nm or 0,
+    )
+
+
+def get_pilot_stats(user_id):
+    """The pilot's totals as a dict (zeros before the first report)"""
+    stats = PilotStats.objects.filter(user_id=user_id).values(*COUNTERS).first()
+    return stats or dict.fromkeys(COUNTERS, 0)
+
+
+async def aget_pilot_stats(user_id):
+    stats = await PilotStats.objects.filter(user_id=user_id).values(*COUNTERS).afirst()
+    return stats or dict.fromkeys(COUNTERS, 0)
+
+
+def flight_hours(stats):
+    return round(stats['flight_seconds'] / 3600, 1)
+
+
+def fill_track_distances(limit=None):
+    """Compute distance_nm of tracks compacted before it was recorded; returns how many"""
+    filled = 0
+    queryset = FlightTrack.objects.filter(distance_nm__isnull=True).only('flight_id', 'data')
+    for flight_track in queryset[:limit] if limit else queryset.iterator(chunk_size=100):
+        flight_track.distance_nm = track_distance_nm(decode_track(flight_track.data))
+        flight_track.save(update_fields=['distance_nm'])
+        filled += 1
+    return filled
+
+
+def rebuild_pilot_stats(user_ids):
+    """Recompute the totals of the given users from the stored history"""
+    user_ids = list(user_ids)
+    totals = {user_id: dict.fromkeys(COUNTERS, 0) for user_id in user_ids}
+
+    messages = ACARSMessage.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+        total=Count('id'), incoming=Count('id', filter=Q(direction='IN')),
+    ).order_by()
+    for row in messages:
+        totals[row['user_id']].update(
+            total_messages=row['total'],
+            incoming_messages=row['incoming'],
+            outgoing_messages=row['total'] - row['incoming'],
+        )
+
+    # Rows moved to the cold archive (acars.archive), except positions counted by their tracks
+    keys = {str(user_id): user_id for user_id in user_ids}
+    for user_counts in MessageArchive.objects.values_list('user_counts', flat=True):
+        for key, (total, incoming) in user_counts.items():
+            if key in keys:
+                stats = totals[keys[key]]
+                stats['total_messages'] += total
+                stats['incoming_messages'] += incoming
+                stats['outgoing_messages'] += total - incoming
+
+    flights = Flight.objects.filter(user_id__in=user_ids)
+    for row in flights.values('user_id').annotate(count=Count('id')).order_by():
+        totals[row['user_id']]['unique_flights'] = row['count']
+    compacted = flights.filter(status=Flight.CLOSED, track__isnull=False).values('user_id').annotate(
+        count=Count('id'),
+        block_seconds=Sum('pirep__block_seconds'),
+        seconds=Sum(F('ended_at') - F('started_at'), filter=Q(pirep__block_seconds__isnull=True)),
+        distance=Sum('track__distance_nm'),
+        points=Sum('track__point_count'),
+        incoming=Sum('track__incoming_count'),
+    ).order_by()
+    # Compacted positions still stored as rows (compact_flight_tracks --keep-rows) are counted already
+    kept = {}
+    rows = ACARSMessage.objects.filter(
+        user_id__in=user_ids, flight__track__isnull=False,
+        latitude__isnull=False, longitude__isnull=False,
+    ).values('user_id').annotate(total=Count('id'), incoming=Count('id', filter=Q(direction='IN'))).order_by()
+    for row in rows:
+        kept[row['user_id']] = row['total'], row['incoming']
+    for row in compacted:
+        stats = totals[row['user_id']]
+        stats['completed_flights'] = row['count']
+        stats['flight_seconds'] = (row['block_seconds'] or 0) + (
+            int(row['seconds'].total_seconds()) if row['seconds'] else 0
+        )
+        stats['distance_nm'] = row['distance'] or 0
+        kept_total, kept_incoming = kept.get(row['user_id'], (0, 0))
+        deleted = max(0, (row['points'] or 0) - kept_total)
+        deleted_incoming = min(deleted, max(0, (row['incoming'] or 0) - kept_incoming))
+        stats['total_messages'] += deleted
+        stats['incoming_messages'] += deleted_incoming
+        stats['outgoing_messages'] += deleted - deleted_incoming
+
+    first_seen = {}
+    for source, time_field in ((ACARSMessage.objects, 'timestamp'), (Flight.objects, 'started_at')):
+        rows = (
+            source.filter(user_id__in=user_ids).exclude(aircraft_id='')
+            .values('user_id', 'aircraft_id').annotate(first=Min(time_field)).order_by()
+        )
+        for row in rows:
+            key = row['user_id'], row['aircraft_id']
+            if key not in first_seen or row['first'] < first_seen[key]:
+                first_seen[key] = row['first']
+    PilotAircraft.objects.filter(user_id__in=user_ids).delete()
+    PilotAircraft.objects.bulk_create(
+        [PilotAircraft(user_id=user_id, aircraft_id=aircraft_id, first_seen_at=seen_at)
+         for (user_id, aircraft_id), seen_at in first_seen.items()],
+        batch_size=1000,
+    )
+    for user_id, _ in first_seen:
+        totals[user_id]['unique_aircraft'] += 1
+
+    now = timezone.now()
+    PilotStats.objects.bulk_create(
+        [PilotStats(user_id=user_id, updated_at=now, **stats) for user_id, stats in totals.items()],
+        update_conflicts=True, unique_fields=['user'], update_fields=list(COUNTERS) + ['updated_at'],
+        batch_size=1000,
+    )
+    return len(totals)
@@ -0,0 +1,35 @@
+import base64
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from acars.credentials import credential_cache
+from acars.dedupe import recent_keys
+from acars.latest import latest_cache
+from acars.models import SmartcarsProfile
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    # Throttle buckets, session epochs, verified credentials, latest positions and
+    # dedupe keys outlive a test's database rollback
+    caches = (cache, credential_cache, latest_cache, recent_keys)
+    for each in caches:
+        each.clear()
+    yield
+    for each in caches:
+        each.clear()
+
+
+@pytest.fixture
+def pilot(db):
+    user = User.objects.create_user('pilot', email='pilot@example.com', password='secret-password')
+    SmartcarsProfile.get_or_create_for_user(user)
+    return user
+
+
+
+@pytest.fixture
+def pilot_auth(pilot):
+    """Basic Authorization header of the pilot fixture, as test client kwargs"""
+    credentials = base64.b64encode(b'pilot:secret-password').decode()
+    return {'HTTP_AUTHORIZATION': f'Basic {credentials}'}
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+import pytest
+from acars import archive
+from acars.ingest import ingest_messages
+from acars.models import ACARSMessage, MessageArchive
+from acars.stats import get_pilot_stats, rebuild_pilot_stats
+from acars.tracks import close_idle_flights
+
+START = datetime(2026, 1, 5, 10, 0, tzinfo=dt_timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def report(minute, **fields):
+    message = {
+        'flight_number': 'TSK1',
+        'aircraft_id': 'SP-LWA',
+        'latitude': 52 + minute / 60,
+        'longitude': -21.5,
+        'altitude': 30000 + minute,
+        'timestamp': (START + timedelta(minutes=minute, microseconds=minute)).isoformat(),
+    }
+    message.update(fields)
+    return message
+
+
+def fly(user):
+    """A closed flight with positions, uplinks, nulls, payloads and a text message"""
+    ingest_messages(user, [
+        report(minute, direction='IN' if minute % 3 == 0 else 'OUT', msg_number=minute,
+               time_off='10:05' if minute == 0 else None,
+               payload={'simulator': 'MSFS', 'fuel': [minute, None]} if minute % 2 else None)
+        for minute in range(40)
+    ])
+    ingest_messages(user, [{'label': 'H1', 'text': 'GATE B4', 'timestamp': (START + timedelta(minutes=41)).isoformat()}])
+    close_idle_flights(now=START + timedelta(days=1))
+
+
+def stored_rows():
+    names = [column['name'] for column in archive.message_columns()]
+    return names, list(ACARSMessage.objects.order_by('id').values_list(*names))
+
+
+def test_round_trip_before_rows_are_deleted(pilot):
+    fly(pilot)
+    names, before = stored_rows()
+
+    written = archive.archive_month(START, keep_rows=True)
+    # Archiving compacts the flight first, which completes it in the totals
+    stats = get_pilot_stats(pilot.pk)
+    assert stats['completed_flights'] == 1
+    assert written.row_count == len(before) == 41
+    assert not written.rows_deleted
+    # The file reads back exactly what the database holds, and verifies against it
+    assert list(archive.iter_archived(names)) == before
+    archive.verify_archive(written, ACARSMessage.objects.all())
+
+    assert archive.delete_archived(written, START.replace(day=1), archive.next_month(START.replace(day=1))) == 41
+    assert not ACARSMessage.objects.exists()
+    assert MessageArchive.objects.get().rows_deleted
+    assert list(archive.iter_archived(names)) == before
+    assert list(archive.iter_archived(['msg_number'], since=START + timedelta(minutes=39), user_id=pilot.pk)) == [
+        (39,), (None,),
+    ]
+
+    # The deleted rows are still counted, through the archive and the flight's track
+    rebuild_pilot_stats([pilot.pk])
+    rebuilt = get_pilot_stats(pilot.pk)
+    assert rebuilt.pop('distance_nm') == pytest.approx(stats.pop('distance_nm'))
+    assert rebuilt == stats
+
+
+def test_archive_month_deletes_only_verified_rows(pilot):
+    fly(pilot)
+    _, before = stored_rows()
+    written = archive.archive_month(START)
+    assert written.rows_deleted
+    assert not ACARSMessage.objects.exists()
+    with archive.open_archive(written) as reader:
+        assert [row for row, in reader.rows(['id'])] == [row[0] for row in before]
+    # A second run finds nothing left for the month
+    assert archive.archive_month(START) is None
+
+
+def test_verify_rejects_changed_file_or_rows(pilot, archive_dir):
+    fly(pilot)
+    written = archive.archive_month(START, keep_rows=True)
+
+    ACARSMessage.objects.filter(msg_number=5).delete()
+    with pytest.raises(archive.ArchiveError, match='database has 40 rows'):
+        archive.verify_archive(written, ACARSMessage.objects.all())
+
+    path = archive_dir / written.file_name
+    data = bytearray(path.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(archive.ArchiveError, match='checksum mismatch'):
+        archive.verify_archive(written)
+
+
+def test_live_flights_are_not_archived(pilot, archive_dir):
+    ingest_messages(pilot, [report(minute) for minute in range(3)])
+    with pytest.raises(archive.ArchiveError, match='still live'):
+        archive.archive_month(START)
+    assert ACARSMessage.objects.count() == 3
+    assert not MessageArchive.objects.exists()
+    assert not any(archive_dir.iterdir())
@@ -0,0 +1,110 @@
+import gzip
+import json
+import pytest
+from acars import catalog
+from acars.catalog import Catalog, bump_version
+from acars.models import Airport, CatalogVersion
+
+AIRPORTS_URL = '/api/smartcars/airports/'
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog(monkeypatch):
+    # The worker's snapshot would otherwise outlive the test's database rollback
+    monkeypatch.setattr(catalog.catalog, '_snapshot', None)
+    monkeypatch.setattr(catalog.catalog, '_checked_at', 0.0)
+
+
+def airport(icao, **fields):
+    values = {'name': icao, 'latitude': 52.0, 'longitude': 21.0}
+    values.update(fields)
+    return Airport.objects.create(icao=icao, **values)
+
+
+def get(client, auth, **headers):
+    return client.get(AIRPORTS_URL, **auth, **headers)
+
+
+def codes(response):
+    body = gzip.decompress(response.content) if response.get('Content-Encoding') == 'gzip' else response.content
+    return [row['code'] for row in json.loads(body)]
+
+
+def test_matching_if_none_match_gets_304(client, pilot_auth, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        airport('EPWA')
+    response = get(client, pilot_auth)
+    assert response.status_code == 200
+    etag = response['ETag']
+    assert etag.startswith(f'"{catalog.current_version()}-')
+
+    for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        response = get(client, pilot_auth, HTTP_IF_NONE_MATCH=header)
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response['ETag'] == etag
+    assert get(client, pilot_auth, HTTP_IF_NONE_MATCH='"0-0000"').status_code == 200
+
+
+def test_gzip_is_sent_to_clients_that_accept_it(client, pilot_auth, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        airport('EPWA')
+        airport('EPKK')
+    plain = get(client, pilot_auth)
+    gzipped = get(client, pilot_auth, HTTP_ACCEPT_ENCODING='deflate, gzip;q=0.8')
+
+    assert not plain.has_header('Content-Encoding')
+    assert gzipped['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gzipped.content) == plain.content
+    assert codes(plain) == codes(gzipped) == ['EPKK', 'EPWA']
+    assert plain['Vary'] == gzipped['Vary'] == 'Accept-Encoding'
+    # The same entity under the weak form of its ETag, which If-None-Match still matches
+    assert gzipped['ETag'] == f'W/{plain["ETag"]}'
+    assert get(client, pilot_auth, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=plain['ETag']).status_code == 304
+    assert not get(client, pilot_auth, HTTP_ACCEPT_ENCODING='identity').has_header('Content-Encoding')
+
+
+def test_saving_a_row_rebuilds_the_snapshot(client, pilot_auth, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        warsaw = airport('EPWA')
+    first = get(client, pilot_auth)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        airport('EPKK')
+    second = get(client, pilot_auth)
+    assert codes(second) == ['EPKK', 'EPWA']
+    assert second['ETag'] != first['ETag']
+    assert get(client, pilot_auth, HTTP_IF_NONE_MATCH=first['ETag']).status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        warsaw.delete()
+    assert codes(get(client, pilot_auth)) == ['EPKK']
+
+
+def test_bump_version_rebuilds_after_signal_free_writes(client, pilot_auth, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        airport('EPWA')
+    etag = get(client, pilot_auth)['ETag']
+
+    # QuerySet.update() sends no signal: the snapshot is served unchanged...
+    Airport.objects.update(icao='EPMO')
+    assert get(client, pilot_auth, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    # ...until the version is bumped
+    with django_capture_on_commit_callbacks(execute=True):
+        bump_version()
+    response = get(client, pilot_auth, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert codes(response) == ['EPMO']
+
+
+def test_other_workers_rebuild_when_they_check_the_version(db):
+    airport('EPWA')
+    checking, waiting = Catalog(check_interval=0), Catalog(check_interval=3600)
+    before = checking.snapshot()
+    assert waiting.snapshot().version == before.version
+
+    # Bumped by another process: no on_commit callback reaches these workers
+    CatalogVersion.objects.filter(pk=catalog.VERSION_ID).update(version=before.version + 1)
+    assert checking.snapshot().version == before.version + 1
+    assert checking.snapshot().payloads['airports'].etag != before.payloads['airports'].etag
+    assert waiting.snapshot().version == before.version
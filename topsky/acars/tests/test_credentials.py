@@ -0,0 +1,136 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from acars import credentials
+from acars.authentication import aauthenticate_smartcars_user, authenticate_smartcars_user
+from acars.credentials import VerifiedCredentialCache, credential_cache
+from acars.models import SmartcarsProfile
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(pilot, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(credentials.time, 'monotonic', clock)
+    cache = VerifiedCredentialCache(max_size=10, ttl=60)
+    cache.add('pilot', 'secret-password', pilot)
+
+    clock.now += 59
+    assert cache.get('pilot', 'secret-password') == (pilot.pk, credentials.credential_fingerprint(pilot))
+    clock.now += 1
+    assert cache.get('pilot', 'secret-password') is None
+    assert cache.stats()['size'] == 0
+    assert cache.stats()['evictions'] == 1
+
+
+def test_least_recently_used_entry_is_evicted(pilot):
+    cache = VerifiedCredentialCache(max_size=2, ttl=60)
+    cache.add('a', 'secret', pilot)
+    cache.add('b', 'secret', pilot)
+    # Reading "a" makes "b" the oldest entry
+    assert cache.get('a', 'secret')
+    cache.add('c', 'secret', pilot)
+
+    assert cache.get('b', 'secret') is None
+    assert cache.get('a', 'secret')
+    assert cache.get('c', 'secret')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_are_keyed_by_secret(pilot):
+    cache = VerifiedCredentialCache(max_size=10, ttl=60)
+    cache.add('pilot', 'secret-password', pilot)
+    assert cache.get('pilot', 'wrong-password') is None
+    assert cache.get('PILOT', 'secret-password') is None
+
+
+def test_disabled_cache_keeps_nothing(pilot):
+    cache = VerifiedCredentialCache(max_size=0, ttl=60)
+    cache.add('pilot', 'secret-password', pilot)
+    assert cache.get('pilot', 'secret-password') is None
+
+
+def test_warm_request_skips_password_hash(pilot, django_assert_num_queries):
+    assert authenticate_smartcars_user('pilot', 'secret-password') == pilot
+    assert credential_cache.get('pilot', 'secret-password')
+
+    pilot.check_password = None  # a second verification would fail loudly
+    with django_assert_num_queries(1):
+        assert authenticate_smartcars_user('pilot', 'secret-password') == pilot
+
+
+def test_password_change_invalidates(pilot):
+    assert authenticate_smartcars_user('pilot', 'secret-password') == pilot
+    pilot.set_password('new-password')
+    pilot.save()
+
+    assert credential_cache.get('pilot', 'secret-password') is None
+    assert authenticate_smartcars_user('pilot', 'secret-password') is None
+    assert authenticate_smartcars_user('pilot', 'new-password') == pilot
+
+
+def test_password_change_without_signals_is_caught_by_fingerprint(pilot):
+    assert authenticate_smartcars_user('pilot', 'secret-password') == pilot
+    # Another worker's change: this process's cache still holds the entry
+    pilot.set_password('new-password')
+    User.objects.filter(pk=pilot.pk).update(password=pilot.password)
+    assert credential_cache.get('pilot', 'secret-password')
+
+    assert authenticate_smartcars_user('pilot', 'secret-password') is None
+    assert credential_cache.stats()['size'] == 0
+
+
+def test_deactivation_invalidates(pilot):
+    assert authenticate_smartcars_user('pilot', 'secret-password') == pilot
+    User.objects.filter(pk=pilot.pk).update(is_active=False)
+    assert authenticate_smartcars_user('pilot', 'secret-password') is None
+
+    User.objects.filter(pk=pilot.pk).update(is_active=True)
+    pilot.refresh_from_db()
+    assert authenticate_smartcars_user('pilot', 'secret-password') == pilot
+    pilot.is_active = False
+    pilot.save()
+    assert credential_cache.stats()['size'] == 0
+
+
+def test_api_key_change_invalidates(pilot):
+    api_key = pilot.smartcars_profile.api_key
+    assert authenticate_smartcars_user('pilot@example.com', api_key) == pilot
+
+    profile = SmartcarsProfile.objects.get(user=pilot)
+    profile.api_key = SmartcarsProfile.generate_api_key()
+    profile.save(update_fields=['api_key'])
+
+    assert credential_cache.stats()['size'] == 0
+    assert authenticate_smartcars_user('pilot@example.com', api_key) is None
+    assert authenticate_smartcars_user('pilot@example.com', profile.api_key) == pilot
+
+
+def test_api_key_change_without_signals_is_caught_by_fingerprint(pilot):
+    api_key = pilot.smartcars_profile.api_key
+    assert authenticate_smartcars_user('pilot@example.com', api_key) == pilot
+    SmartcarsProfile.objects.filter(user=pilot).update(api_key=SmartcarsProfile.generate_api_key())
+
+    assert authenticate_smartcars_user('pilot@example.com', api_key) is None
+
+
+def test_cached_user_without_profile_gets_one(db):
+    user = User.objects.create_user('noprofile', password='secret-password')
+    # Verified before the profile existed, so the fingerprint still matches without one
+    credential_cache.add('noprofile', 'secret-password', user)
+
+    assert authenticate_smartcars_user('noprofile', 'secret-password') == user
+    assert SmartcarsProfile.objects.filter(user=user).exists()
+
+
+def test_async_cached_user_without_profile_gets_one(db):
+    user = User.objects.create_user('noprofile', password='secret-password')
+    credential_cache.add('noprofile', 'secret-password', user)
+
+    assert async_to_sync(aauthenticate_smartcars_user)('noprofile', 'secret-password', None) == user
+    assert SmartcarsProfile.objects.filter(user=user).exists()
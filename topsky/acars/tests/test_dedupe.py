@@ -0,0 +1,114 @@
+import importlib
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+import pytest
+from django.apps import apps
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from acars.dedupe import UNTIMED_WINDOW, recent_keys
+from acars.ingest import ingest_messages
+from acars.models import ACARSMessage, Flight, LatestPosition, PilotStats
+from acars.stats import get_pilot_stats
+
+START = datetime(2026, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+MESSAGES_URL = '/api/smartcars/messages/'
+
+dedupe_migration = importlib.import_module('acars.migrations.0010_message_dedupe')
+
+
+def report(minute, **fields):
+    message = {
+        'flight_number': 'TSK1',
+        'latitude': 52 + minute / 60,
+        'longitude': 21.0,
+        'timestamp': (START + timedelta(minutes=minute)).isoformat(),
+    }
+    message.update(fields)
+    return message
+
+
+def post(client, data, auth):
+    return client.post(MESSAGES_URL, json.dumps(data), content_type='application/json', **auth)
+
+
+def test_resend_is_answered_as_duplicate(client, pilot_auth, pilot):
+    message = report(1, client_msg_id='a1', msg_number=7)
+    assert post(client, message, pilot_auth).status_code == 201
+    stats = get_pilot_stats(pilot.pk)
+
+    response = post(client, message, pilot_auth)
+    assert response.status_code == 200
+    assert response.json()['duplicate'] is True
+    # Answered from the database too, not only from this process' memory
+    recent_keys.clear()
+    assert post(client, message, pilot_auth).status_code == 200
+    assert ACARSMessage.objects.count() == 1
+    assert get_pilot_stats(pilot.pk) == stats
+
+
+@pytest.mark.parametrize('ids', [{'client_msg_id': 'a1'}, {'msg_number': 7}])
+def test_resend_without_timestamp_matches_by_id(client, pilot_auth, pilot, ids):
+    message = report(1, **ids)
+    del message['timestamp']
+    assert [post(client, message, pilot_auth).status_code for _ in range(2)] == [201, 200]
+    recent_keys.clear()
+    assert post(client, message, pilot_auth).status_code == 200
+    assert ACARSMessage.objects.count() == 1
+    assert get_pilot_stats(pilot.pk)['total_messages'] == 1
+
+    # Only the ids stored lately count: msg_number restarts on every flight
+    ACARSMessage.objects.update(timestamp=timezone.now() - UNTIMED_WINDOW - timedelta(seconds=1))
+    assert post(client, message, pilot_auth).status_code == 201
+    assert ACARSMessage.objects.count() == 2
+
+
+def test_timed_and_untimed_resends_in_one_batch(pilot):
+    untimed = report(1, client_msg_id='a1')
+    del untimed['timestamp']
+    summary = ingest_messages(pilot, [untimed, untimed, report(2, client_msg_id='b2')])
+    assert (summary['created_count'], summary['duplicate_count']) == (2, 1)
+    summary = ingest_messages(pilot, [untimed, report(2, client_msg_id='b2')])
+    assert (summary['created_count'], summary['duplicate_count']) == (0, 2)
+
+
+def test_messages_without_ids_need_no_timestamp(client, pilot_auth):
+    message = report(1)
+    del message['timestamp']
+    assert [post(client, message, pilot_auth).status_code for _ in range(2)] == [201, 201]
+    assert ACARSMessage.objects.count() == 2
+
+
+def test_msg_number_key_ignores_the_flight(pilot):
+    ingest_messages(pilot, [report(1, msg_number=7)])
+    # The flight is assigned after deduplication, so a resend under another flight number is still one
+    summary = ingest_messages(pilot, [report(1, msg_number=7, flight_number='TSK2')])
+    assert summary['duplicate_count'] == 1
+
+    flight = Flight.objects.create(user=pilot, flight_number='TSK2', started_at=START, last_report_at=START)
+    with pytest.raises(IntegrityError), transaction.atomic():
+        ACARSMessage.objects.create(user=pilot, flight=flight, msg_number=7, timestamp=START + timedelta(minutes=1))
+
+
+def test_migration_deletes_duplicates_and_corrects_totals(pilot):
+    ingest_messages(pilot, [report(minute, msg_number=minute) for minute in range(3)])
+    kept = ACARSMessage.objects.get(msg_number=2)
+    # Copies stored before the unique index existed
+    with connection.cursor() as cursor:
+        cursor.execute('DROP INDEX acars_msg_number_unique')
+    copies = [
+        ACARSMessage.objects.create(
+            user=pilot, flight=kept.flight, msg_number=2, timestamp=kept.timestamp, direction='IN',
+            latitude=kept.latitude, longitude=kept.longitude,
+        )
+        for _ in range(2)
+    ]
+    LatestPosition.objects.filter(user=pilot).update(message_id=copies[-1].pk)
+    PilotStats.objects.filter(user=pilot).update(total_messages=5, incoming_messages=2, outgoing_messages=3)
+
+    dedupe_migration.delete_duplicates(apps, None)
+
+    assert sorted(ACARSMessage.objects.values_list('msg_number', flat=True)) == [0, 1, 2]
+    assert ACARSMessage.objects.get(msg_number=2).pk == kept.pk
+    assert LatestPosition.objects.get(user=pilot).message_id == kept.pk
+    stats = get_pilot_stats(pilot.pk)
+    assert (stats['total_messages'], stats['incoming_messages'], stats['outgoing_messages']) == (3, 0, 3)
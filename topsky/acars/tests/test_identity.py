@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from acars.authentication import authenticate_smartcars_user, resolve_smartcars_identity
+from acars.models import SmartcarsProfile
+
+
+def create_pilot(username, email, password='secret-password'):
+    user = User.objects.create_user(username, email=email, password=password)
+    SmartcarsProfile.get_or_create_for_user(user)
+    return user
+
+
+def resolve(identifier, django_assert_num_queries):
+    # One joined query; reading the profiles afterwards costs nothing
+    with django_assert_num_queries(1) as queries:
+        users = resolve_smartcars_identity(identifier)
+        for user in users:
+            assert user.smartcars_profile.user_id == user.pk
+    assert 'JOIN "acars_smartcars_profile"' in queries.captured_queries[0]['sql']
+    return users
+
+
+def test_email(pilot, django_assert_num_queries):
+    assert resolve('pilot@example.com', django_assert_num_queries) == [pilot]
+
+
+def test_username(pilot, django_assert_num_queries):
+    assert resolve('pilot', django_assert_num_queries) == [pilot]
+
+
+def test_different_case(pilot, django_assert_num_queries):
+    assert resolve('PILOT@Example.COM', django_assert_num_queries) == [pilot]
+    assert resolve('Pilot', django_assert_num_queries) == [pilot]
+
+
+def test_unknown_identifier(pilot, django_assert_num_queries):
+    assert resolve('nobody@example.com', django_assert_num_queries) == []
+
+
+def test_duplicate_email_resolves_to_oldest_account(db, django_assert_num_queries):
+    oldest = create_pilot('first', 'shared@example.com')
+    create_pilot('second', 'SHARED@example.com')
+    assert resolve('shared@example.com', django_assert_num_queries) == [oldest]
+
+
+def test_email_match_comes_before_username_match(db, django_assert_num_queries):
+    by_username = create_pilot('someone@example.com', 'other@example.com')
+    by_email = create_pilot('someone', 'someone@example.com')
+    assert resolve('someone@example.com', django_assert_num_queries) == [by_email, by_username]
+
+
+def test_username_match_is_tried_after_email_match(db):
+    create_pilot('someone', 'someone@example.com', password='email-password')
+    by_username = create_pilot('someone@example.com', 'other@example.com', password='username-password')
+    assert authenticate_smartcars_user('someone@example.com', 'username-password') == by_username
+
+
+def test_user_without_profile(db, django_assert_num_queries):
+    user = User.objects.create_user('bare', email='bare@example.com', password='secret-password')
+    with django_assert_num_queries(1):
+        assert resolve_smartcars_identity('bare') == [user]
@@ -0,0 +1,145 @@
+import json
+from datetime import datetime, time, timezone as dt_timezone
+from decimal import Decimal
+from acars import message_views
+from acars.ingest import validate_message
+from acars.models import ACARSMessage
+
+MESSAGES_URL = '/api/smartcars/messages/'
+BULK_URL = '/api/smartcars/bulk-create/'
+
+
+def report(minute=0, **fields):
+    message = {
+        'aircraft_id': 'SP-LWA',
+        'flight_number': 'TSK123',
+        'latitude': 52.1657,
+        'longitude': 20.9671,
+        'altitude': 35000,
+        'speed': 450,
+        'heading': 90,
+        'timestamp': f'2026-05-01T10:{minute:02d}:00Z',
+    }
+    message.update(fields)
+    return message
+
+
+def post(client, url, data, auth):
+    return client.post(url, json.dumps(data), content_type='application/json', **auth)
+
+
+def test_valid_message():
+    values, errors = validate_message(report(
+        time_off='10:05', fuel_flow=2400.5, direction='IN', payload={'simulator': 'MSFS'},
+    ))
+    assert errors is None
+    assert values['timestamp'] == datetime(2026, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+    assert values['time_off'] == time(10, 5)
+    assert values['direction'] == 'IN'
+    assert values['simulator'] == 'MSFS'
+
+
+def test_invalid_fields_are_reported_together():
+    values, errors = validate_message(report(
+        latitude=91, altitude='high', heading=True, direction='UP', timestamp='yesterday',
+        route='X' * 51, time_on=1005,
+    ))
+    assert values is None
+    assert set(errors) == {'latitude', 'altitude', 'heading', 'direction', 'timestamp', 'route', 'time_on'}
+
+
+def test_nulls_and_unknown_fields_are_ignored():
+    values, errors = validate_message(report(speed=None, squawk='7000'))
+    assert errors is None
+    assert 'speed' not in values and 'squawk' not in values
+
+
+def test_timestamp_defaults():
+    values, _ = validate_message({'timestamp': '2026-05-01T10:00:00'})
+    assert values['timestamp'].tzinfo is not None
+
+    values, _ = validate_message({'payload': {'timestamp': '2026-05-01T12:00:00+02:00'}})
+    assert values['timestamp'] == datetime(2026, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+    _, errors = validate_message({'payload': {'timestamp': 'soon'}})
+    assert 'payload.timestamp' in errors
+
+
+def test_non_object_message():
+    assert validate_message([1, 2])[1] == {'non_field_errors': 'Message must be a JSON object'}
+
+
+def test_post_single_message(client, pilot_auth, pilot):
+    response = post(client, MESSAGES_URL, report(), pilot_auth)
+    assert response.status_code == 201
+    message = ACARSMessage.objects.get(pk=response.json()['id'])
+    assert message.user == pilot
+    assert message.latitude == Decimal('52.165700')
+    assert message.flight_id == response.json()['flight']
+
+
+def test_post_single_invalid_message(client, pilot_auth):
+    response = post(client, MESSAGES_URL, report(speed=-1), pilot_auth)
+    assert response.status_code == 400
+    assert 'speed' in response.json()['errors']
+    assert not ACARSMessage.objects.exists()
+
+
+def test_bulk_stores_valid_items_and_reports_invalid_ones(client, pilot_auth):
+    items = [report(0), report(1, latitude='north'), report(2), 'garbage']
+    response = post(client, BULK_URL, items, pilot_auth)
+    assert response.status_code == 201
+    summary = response.json()
+    assert summary['created_count'] == 2
+    assert summary['error_count'] == 2
+    assert [error['index'] for error in summary['errors']] == [1, 3]
+    assert ACARSMessage.objects.count() == 2
+
+
+def test_out_of_range_msg_number_is_an_item_error(client, pilot_auth):
+    assert validate_message(report(msg_number=2 ** 31 - 1))[1] is None
+    assert 'msg_number' in validate_message(report(msg_number=-2 ** 31 - 1))[1]
+
+    items = [report(0, msg_number=1), report(1, msg_number=2 ** 31), report(2, msg_number=2 ** 40)]
+    response = post(client, BULK_URL, items, pilot_auth)
+    assert response.status_code == 201
+    summary = response.json()
+    assert summary['created_count'] == 1
+    assert [(error['index'], list(error['errors'])) for error in summary['errors']] == [
+        (1, ['msg_number']), (2, ['msg_number']),
+    ]
+    assert list(ACARSMessage.objects.values_list('msg_number', flat=True)) == [1]
+
+
+def test_bulk_with_only_invalid_items(client, pilot_auth):
+    response = post(client, BULK_URL, [report(latitude=100)], pilot_auth)
+    assert response.status_code == 400
+    assert response.json()['created_count'] == 0
+
+
+def test_bulk_size_limit(client, pilot_auth, monkeypatch):
+    monkeypatch.setattr(message_views, 'MAX_BATCH', 2)
+    response = post(client, BULK_URL, [report(0), report(1), report(2)], pilot_auth)
+    assert response.status_code == 413
+    assert not ACARSMessage.objects.exists()
+
+
+def test_bulk_expects_a_list(client, pilot_auth):
+    assert post(client, BULK_URL, report(), pilot_auth).status_code == 400
+    response = client.post(BULK_URL, '{', content_type='application/json', **pilot_auth)
+    assert response.status_code == 400
+
+
+def test_authentication_required(client, db):
+    assert post(client, MESSAGES_URL, report(), {}).status_code == 401
+
+
+def test_get_returns_own_recent_messages(client, pilot_auth, django_user_model):
+    post(client, BULK_URL, [report(0), report(1)], pilot_auth)
+    other = django_user_model.objects.create_user('other', password='x')
+    ACARSMessage.objects.create(user=other, timestamp=datetime(2026, 5, 1, tzinfo=dt_timezone.utc))
+
+    response = client.get(MESSAGES_URL, {'since': '2026-04-30T00:00:00Z', 'limit': 1}, **pilot_auth)
+    assert response.status_code == 200
+    assert response.json()['count'] == 1
+    assert response.json()['results'][0]['timestamp'] == '2026-05-01T10:01:00Z'
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from acars.ingest import ingest_messages
+from acars.latest import rebuild_latest_positions
+from acars.models import ACARSMessage, LatestPosition
+
+START = datetime(2026, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+LATEST_URL = '/api/smartcars/messages/latest/'
+
+
+def report(minute, latitude, **fields):
+    message = {
+        'flight_number': 'TSK1',
+        'latitude': latitude,
+        'longitude': 21.0,
+        'timestamp': (START + timedelta(minutes=minute)).isoformat(),
+    }
+    message.update(fields)
+    return message
+
+
+def stored_latitude(user):
+    return LatestPosition.objects.get(user=user).latitude
+
+
+def test_newest_position_of_a_batch_is_stored(pilot):
+    ingest_messages(pilot, [report(5, 52.5), report(9, 52.9), report(7, 52.7)])
+    position = LatestPosition.objects.get(user=pilot)
+    assert position.latitude == Decimal('52.9')
+    assert position.message_id == ACARSMessage.objects.get(timestamp=START + timedelta(minutes=9)).pk
+
+
+def test_older_batch_does_not_overwrite_newer_position(pilot):
+    ingest_messages(pilot, [report(10, 53.0)])
+    # A late upload of earlier reports
+    ingest_messages(pilot, [report(1, 51.0), report(2, 51.5)])
+    assert stored_latitude(pilot) == Decimal('53.0')
+
+    ingest_messages(pilot, [report(11, 54.0)])
+    assert stored_latitude(pilot) == Decimal('54.0')
+
+
+def test_reports_without_position_are_ignored(pilot):
+    ingest_messages(pilot, [report(1, 51.0)])
+    ingest_messages(pilot, [{'label': 'H1', 'timestamp': (START + timedelta(minutes=5)).isoformat()}])
+    assert stored_latitude(pilot) == Decimal('51.0')
+
+
+def test_rebuild_matches_incremental_positions(pilot, django_user_model):
+    other = django_user_model.objects.create_user('other', password='x')
+    ingest_messages(pilot, [report(10, 53.0)])
+    ingest_messages(pilot, [report(1, 51.0)])
+    ingest_messages(other, [report(3, 40.0), report(4, 41.0)])
+    incremental = list(LatestPosition.objects.order_by('user_id').values())
+
+    LatestPosition.objects.all().delete()
+    assert rebuild_latest_positions() == 2
+    assert list(LatestPosition.objects.order_by('user_id').values()) == incremental
+
+
+def test_endpoint_and_cache_eviction(client, pilot_auth, pilot, django_capture_on_commit_callbacks):
+    assert client.get(LATEST_URL, **pilot_auth).status_code == 404
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ingest_messages(pilot, [report(1, 51.0)])
+    # Ingest in this process evicts the cached "no position" once it commits
+    response = client.get(LATEST_URL, **pilot_auth)
+    assert response.status_code == 200
+    assert response.json()['latitude'] == '51.000000'
+    assert response.json()['flight_number'] == 'TSK1'
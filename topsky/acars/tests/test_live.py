@@ -0,0 +1,76 @@
+import json
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.utils import timezone
+from acars.ingest import ingest_messages
+from acars.live import LiveHub, Subscriber
+from acars.models import Flight
+
+
+def report(minutes_ago, flight_number='TSK1', latitude=52.0):
+    return {
+        'flight_number': flight_number,
+        'latitude': latitude,
+        'longitude': 21.0,
+        'altitude': 30000,
+        'timestamp': (timezone.now() - timedelta(minutes=minutes_ago)).isoformat(),
+    }
+
+
+def frame_data(frame):
+    event, data = frame.decode().strip().split('\n')
+    return event.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+
+def test_snapshot_is_seeded_from_stored_positions(pilot):
+    other = User.objects.create_user('other', password='x')
+    ingest_messages(pilot, [report(3), report(2, latitude=52.5)])
+    ingest_messages(other, [report(2, flight_number='TSK9')])
+    # Closed flights and stale positions are not on the map
+    Flight.objects.filter(user=other).update(status=Flight.CLOSED)
+
+    hub = LiveHub()
+    event, positions = frame_data(async_to_sync(hub.asnapshot)())
+    assert event == 'snapshot'
+    assert [(position['flight_number'], position['lat']) for position in positions] == [('TSK1', 52.5)]
+
+
+def test_seed_keeps_newer_live_updates(pilot):
+    ingest_messages(pilot, [report(2)])
+    flight = Flight.objects.get()
+    newer = {'flight': flight.pk, 'lat': 53.0, 'lon': 21.0, 't': int(timezone.now().timestamp() * 1000)}
+
+    hub = LiveHub()
+    hub.collect([newer])
+    hub.flush()
+    _, positions = frame_data(async_to_sync(hub.asnapshot)())
+    assert positions == [newer]
+
+
+def test_seed_runs_once(pilot, django_assert_num_queries):
+    ingest_messages(pilot, [report(2)])
+    hub = LiveHub()
+
+    async def connect_twice():
+        return await hub.asnapshot(), await hub.asnapshot()
+
+    with django_assert_num_queries(1):
+        first, second = async_to_sync(connect_twice)()
+    assert first == second
+
+
+def test_flush_coalesces_and_drops_slow_viewers():
+    hub = LiveHub(queue_size=1)
+    viewer = Subscriber(hub, hub.queue_size)
+    hub.subscribers.add(viewer)
+
+    hub.collect([{'flight': 1, 't': 2, 'lat': 1}, {'flight': 1, 't': 1, 'lat': 0}, {'flight': 2, 't': 1, 'lat': 5}])
+    hub.flush()
+    _, updates = frame_data(viewer.frames[0])
+    assert sorted((update['flight'], update['lat']) for update in updates) == [(1, 1), (2, 5)]
+
+    hub.collect([{'flight': 1, 't': 3, 'lat': 2}])
+    hub.flush()
+    assert viewer.dropped
+    assert viewer not in hub.subscribers
@@ -0,0 +1,93 @@
+import io
+import json
+from acars import ingest
+from acars.ingest import ingest_ndjson
+from acars.models import ACARSMessage
+
+NDJSON_URL = '/api/smartcars/messages/ndjson/'
+
+
+def line(minute, **fields):
+    message = {
+        'latitude': 52.0 + minute / 100,
+        'longitude': 21.0,
+        'altitude': 3000,
+        'speed': 200,
+        'timestamp': f'2026-05-01T10:{minute:02d}:00Z',
+    }
+    message.update(fields)
+    return json.dumps(message).encode() + b'\n'
+
+
+def upload(*lines):
+    return io.BytesIO(b''.join(lines))
+
+
+def test_lines_are_committed_in_chunks(pilot, monkeypatch):
+    chunks = []
+    save_messages = ingest.save_messages
+
+    def counting_save(messages):
+        chunks.append(len(messages))
+        return save_messages(messages)
+
+    monkeypatch.setattr(ingest, 'save_messages', counting_save)
+    summary = ingest_ndjson(pilot, upload(*(line(minute) for minute in range(5))), chunk_size=2)
+
+    assert chunks == [2, 2, 1]
+    assert summary['accepted_count'] == 5
+    assert ACARSMessage.objects.count() == 5
+
+
+def test_errors_are_reported_by_line_number(pilot):
+    stream = upload(
+        line(0),
+        b'\n',
+        b'{not json\n',
+        line(1, altitude='high'),
+        b'x' * 300 + b'\n',
+        line(2),
+    )
+    summary = ingest_ndjson(pilot, stream, chunk_size=2, max_line=200)
+
+    assert summary['accepted_count'] == 2
+    assert summary['rejected_count'] == 3
+    assert [error['line'] for error in summary['errors']] == [3, 4, 5]
+    assert summary['errors'][1]['errors'] == {'altitude': 'Must be a number'}
+    assert summary['errors'][2]['errors'] == {'non_field_errors': 'Line longer than 200 bytes'}
+    assert not summary['errors_truncated']
+
+
+def test_reported_errors_are_capped(pilot, monkeypatch):
+    monkeypatch.setattr(ingest, 'MAX_REPORTED_ERRORS', 2)
+    summary = ingest_ndjson(pilot, upload(*(b'[]\n' for _ in range(5))))
+    assert summary['rejected_count'] == 5
+    assert len(summary['errors']) == 2
+    assert summary['errors_truncated']
+
+
+def test_last_line_without_newline(pilot):
+    summary = ingest_ndjson(pilot, upload(line(0), line(1)[:-1]))
+    assert summary['accepted_count'] == 2
+
+
+def test_resent_upload_is_counted_as_duplicates(pilot):
+    lines = [line(minute, client_msg_id=f'm{minute}') for minute in range(3)]
+    assert ingest_ndjson(pilot, upload(*lines), chunk_size=2)['accepted_count'] == 3
+
+    summary = ingest_ndjson(pilot, upload(*lines), chunk_size=2)
+    assert summary['accepted_count'] == 0
+    assert summary['duplicate_count'] == 3
+    assert ACARSMessage.objects.count() == 3
+
+
+def test_endpoint(client, pilot_auth):
+    response = client.post(
+        NDJSON_URL, line(0) + line(1) + b'{\n', content_type='application/x-ndjson', **pilot_auth,
+    )
+    assert response.status_code == 201
+    assert response.json()['accepted_count'] == 2
+    assert response.json()['rejected_count'] == 1
+
+    response = client.post(NDJSON_URL, b'{\n', content_type='application/x-ndjson', **pilot_auth)
+    assert response.status_code == 400
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.core.management import call_command
+from acars.ingest import ingest_messages
+from acars.models import Flight, Pirep
+from acars.phases import PHASES, LivePhases, detect_phases
+from acars.stats import get_pilot_stats, rebuild_pilot_stats
+from acars.tracks import EPOCH, ONE_MS, Track, close_idle_flights, compact_flight
+
+START = datetime(2026, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+FIELD = 300
+
+FLIGHT_PHASES = [
+    Flight.PARKED, Flight.TAXI, Flight.TAKEOFF, Flight.CLIMB, Flight.CRUISE,
+    Flight.DESCENT, Flight.APPROACH, Flight.LANDING, Flight.TAXI, Flight.PARKED,
+]
+
+
+def profile():
+    """(altitude, speed) every 10 s: parked, taxi out, takeoff, climb, cruise, descent, landing, taxi in, parked"""
+    points = [(FIELD, 0)] * 7 + [(FIELD, 15)] * 6 + [(FIELD, 60), (FIELD, 100), (FIELD, 140)]
+    points += [(FIELD + 100 + 500 * step, 160 + step * 5) for step in range(61)]
+    top = points[-1][0]
+    points += [(top, 450)] * 60
+    points += [(top - 250 * step, 400 - step * 2) for step in range(1, 121)]
+    points += [(FIELD, 130), (FIELD, 100), (FIELD, 60), (FIELD, 30)] + [(FIELD, 20)] * 6 + [(FIELD, 0)] * 6
+    return points
+
+
+POINTS = profile()
+OUT = 7
+OFF = 16
+ON = 16 + 61 + 60 + 120
+IN = len(POINTS) - 6
+PIREP_FIELDS = ('block_seconds', 'air_seconds', 'landing_rate', 'distance_nm', 'max_altitude', 'fuel_used')
+
+
+def at(index):
+    return START + timedelta(seconds=10 * index)
+
+
+def sequence(phases):
+    """Phases in order with repeats collapsed"""
+    collapsed = []
+    for phase in phases:
+        if not collapsed or collapsed[-1] != phase:
+            collapsed.append(phase)
+    return collapsed
+
+
+def synthetic_track():
+    return Track.from_rows([
+        (at(index), 52.0, 21.0 + index / 1000, altitude, speed, 90)
+        for index, (altitude, speed) in enumerate(POINTS)
+    ])
+
+
+def test_detect_phases_of_a_whole_flight():
+    track = synthetic_track()
+    phases = detect_phases(track)
+    assert [segment[0] for segment in phases.segments(track.times)] == FLIGHT_PHASES
+    assert (phases.out, phases.off, phases.on, phases.gate_in) == (OUT, OFF, ON, IN)
+    # 100 ft in the 10 s before touchdown
+    assert phases.landing_rate == -600
+
+    values = phases.flight_values(track.times)
+    assert values['phase'] == Flight.PARKED
+    assert (values['out_at'], values['off_at'], values['on_at'], values['in_at']) == (at(OUT), at(OFF), at(ON), at(IN))
+
+
+def test_live_phases_follow_the_flight(pilot):
+    flight = Flight.objects.create(user=pilot, flight_number='TSK1', started_at=START, last_report_at=START)
+    seen = []
+    for first in range(0, len(POINTS), 25):
+        # Resumed from Flight.phase_state, as for every ingested batch
+        flight = Flight.objects.get(pk=flight.pk)
+        detector = LivePhases(flight)
+        for index in range(first, min(first + 25, len(POINTS))):
+            altitude, speed = POINTS[index]
+            detector.add((at(index) - EPOCH) // ONE_MS, altitude, speed)
+            seen.append(PHASES[detector.phase])
+        detector.save()
+
+    # Touchdown is only certain below roll speed, so the landing roll stays approach
+    assert sequence(seen) == [phase for phase in FLIGHT_PHASES if phase != Flight.LANDING]
+    flight.refresh_from_db()
+    assert flight.phase == Flight.PARKED
+    assert (flight.out_at, flight.off_at, flight.on_at, flight.in_at) == (at(OUT), at(OFF), at(ON), at(IN))
+    assert flight.landing_rate == -600
+
+
+def test_redetection_refreshes_pireps_and_totals(pilot):
+    ingest_messages(pilot, [
+        {'flight_number': 'TSK1', 'latitude': 52.0, 'longitude': 21.0 + index / 1000,
+         'altitude': altitude, 'speed': speed, 'timestamp': at(index).isoformat()}
+        for index, (altitude, speed) in enumerate(POINTS)
+    ])
+    close_idle_flights(now=START + timedelta(days=1))
+    compact_flight(Flight.objects.get())
+    pirep = Pirep.objects.values(*PIREP_FIELDS).get()
+    stats = get_pilot_stats(pilot.pk)
+    assert pirep['block_seconds'] == (IN - OUT) * 10
+    assert pirep['air_seconds'] == (ON - OFF) * 10
+
+    # As if compacted before phases were detected
+    Flight.objects.update(phase='', phases=[], out_at=None, off_at=None, on_at=None, in_at=None, landing_rate=None)
+    Pirep.objects.update(block_seconds=None, air_seconds=None, landing_rate=None)
+    rebuild_pilot_stats([pilot.pk])
+    assert get_pilot_stats(pilot.pk)['flight_seconds'] != stats['flight_seconds']
+
+    call_command('detect_flight_phases', stdout=StringIO())
+    assert Flight.objects.get().in_at == at(IN)
+    assert Pirep.objects.values(*PIREP_FIELDS).get() == pirep
+    assert get_pilot_stats(pilot.pk) == stats
@@ -0,0 +1,65 @@
+import json
+import pytest
+from django.test import RequestFactory
+from acars import request_log
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """Records logged by log_response_details and a fresh ring buffer, without background threads"""
+    records = []
+    ring = request_log.ExchangeRingBuffer(size=10, body_limit=64)
+    monkeypatch.setattr(ring, '_ensure_publisher', lambda: None)
+    monkeypatch.setattr(request_log, 'recent_exchanges', ring)
+    monkeypatch.setattr(request_log, '_ensure_listener', lambda: None)
+    monkeypatch.setattr(request_log, 'get_config', lambda: dict(request_log.DEFAULTS, MAX_BODY=64))
+    monkeypatch.setattr(request_log.logger, 'info', lambda *args, extra: records.append(extra['exchange']))
+    return records, ring
+
+
+def exchange(request, endpoint_name, status_code=401):
+    request_log.log_request_details(request, endpoint_name)
+    request_log.log_response_details(request, {'error': 'x'}, status_code)
+
+
+def logged_bodies(captured):
+    records, ring = captured
+    return records[-1]['request_body'], ring.snapshot()[-1]['request_body']
+
+
+def test_uploads_are_never_read(captured):
+    upload = json.dumps([{'latitude': 52.0}] * 10000)
+    for endpoint_name in ('BULK_CREATE', 'NDJSON_INGEST'):
+        request = RequestFactory().post('/upload/', upload, content_type='application/json')
+        exchange(request, endpoint_name, 413)
+        assert not hasattr(request, '_body')
+        assert logged_bodies(captured) == ('[upload]', '[upload]')
+
+
+def test_unread_bodies_are_not_loaded_for_the_log(captured):
+    request = RequestFactory().post('/login/', 'x' * 100000, content_type='text/plain')
+    exchange(request, 'LOGIN')
+    assert not hasattr(request, '_body')
+    assert logged_bodies(captured) == ('[not read]', '[not read]')
+
+    exchange(RequestFactory().get('/pilot/'), 'PILOT_INFO')
+    assert logged_bodies(captured) == (None, None)
+
+
+def test_read_bodies_are_redacted_and_capped(captured):
+    request = RequestFactory().post(
+        '/login/', json.dumps({'email': 'pilot@example.com', 'password': 'hunter2'}), content_type='application/json',
+    )
+    assert request.body
+    exchange(request, 'LOGIN')
+    assert logged_bodies(captured) == ('{"email":"pilot@example.com","password":"***"}',) * 2
+
+    body = json.dumps({'password': 'hunter2', 'notes': 'x' * 1000})
+    request = RequestFactory().post('/login/', body, content_type='application/json')
+    assert request.body
+    exchange(request, 'LOGIN')
+    for logged in logged_bodies(captured):
+        # Only a prefix is decoded, and masked without being parsed
+        assert logged.startswith('{"password": ***, "notes": "xxx')
+        assert logged.endswith(f'...[{len(body)} bytes]')
+        assert 'hunter2' not in logged
@@ -0,0 +1,112 @@
+import math
+import random
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+import pytest
+from acars.simplify import (
+    ZOOM_LEVELS, build_levels, decode_levels, encode_levels, level_for, mercator_tolerance, project,
+    select, significance, simplify,
+)
+from acars.tracks import Track
+
+START = datetime(2026, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+
+def track(points):
+    return Track.from_rows([
+        (START + timedelta(seconds=10 * index), latitude, longitude, None, None, None)
+        for index, (latitude, longitude) in enumerate(points)
+    ])
+
+
+def wandering(count, seed=7):
+    """A random walk with turns on every scale"""
+    rng = random.Random(seed)
+    latitude, longitude, heading = 50.0, 10.0, 0.0
+    points = []
+    for _ in range(count):
+        heading += rng.gauss(0, 0.4)
+        step = rng.choice([0.001, 0.01, 0.1])
+        latitude += step * math.cos(heading)
+        longitude += step * math.sin(heading)
+        points.append((latitude, longitude))
+    return points
+
+
+def douglas_peucker(xs, ys, first, last, tolerance):
+    """Textbook recursive Douglas-Peucker, for reference"""
+    if last - first < 2:
+        return [first, last]
+    dx, dy = xs[last] - xs[first], ys[last] - ys[first]
+    length = math.hypot(dx, dy)
+    distances = [
+        abs(dy * (xs[index] - xs[first]) - dx * (ys[index] - ys[first])) / length if length else
+        math.hypot(xs[index] - xs[first], ys[index] - ys[first])
+        for index in range(first + 1, last)
+    ]
+    best = max(distances)
+    if best <= tolerance:
+        return [first, last]
+    split = first + 1 + distances.index(best)
+    return douglas_peucker(xs, ys, first, split, tolerance)[:-1] + douglas_peucker(xs, ys, split, last, tolerance)
+
+
+def test_straight_line_collapses_to_its_endpoints():
+    # Along a parallel, which stays straight in Web Mercator
+    line = track([(50.0, 10 + index / 50) for index in range(50)])
+    assert list(select(significance(*project(line)), 0.5)) == [0, 49]
+    assert len(simplify(line, 0.5)) == 2
+
+
+def test_endpoints_are_kept_at_every_level():
+    points = wandering(300)
+    levels = build_levels(track(points))
+    for indices in levels.values():
+        assert indices[0] == 0 and indices[-1] == len(points) - 1
+    assert len(simplify(track(points[:2]), 1e9)) == 2
+
+
+def test_levels_match_douglas_peucker_and_grow_with_zoom():
+    points = wandering(400)
+    xs, ys = project(track(points))
+    levels = build_levels(track(points))
+    counts = [len(levels[zoom]) for zoom in ZOOM_LEVELS]
+    assert counts == sorted(counts)
+    assert counts[0] < counts[-1] <= len(points)
+    for coarser, finer in zip(ZOOM_LEVELS, ZOOM_LEVELS[1:]):
+        assert set(levels[coarser]) <= set(levels[finer])
+    for zoom in (4, 10, 16):
+        assert list(levels[zoom]) == douglas_peucker(xs, ys, 0, len(points) - 1, mercator_tolerance(zoom))
+
+
+def test_antimeridian_crossing_is_not_a_detour():
+    # Straight east from 179°E to 179°W: unwrapped, it is a line with nothing to keep
+    longitudes = [179 + index / 10 for index in range(21)]
+    crossing = track([(10.0, longitude - 360 if longitude > 180 else longitude) for longitude in longitudes])
+    xs, _ = project(crossing)
+    assert all(later > earlier for earlier, later in zip(xs, xs[1:]))
+    assert len(simplify(crossing, 1.0)) == 2
+
+
+def test_levels_blob_round_trip_through_level_for():
+    original = track(wandering(300))
+    levels = build_levels(original)
+    decoded = decode_levels(encode_levels(levels))
+    assert {zoom: list(indices) for zoom, indices in decoded.items()} == {
+        zoom: list(indices) for zoom, indices in levels.items()
+    }
+
+    # The coarsest stored level at least as detailed as asked for
+    assert level_for(decoded, zoom=1) == 2
+    assert level_for(decoded, zoom=5) == 6
+    assert level_for(decoded, zoom=16) == 16
+    assert level_for(decoded, zoom=17) is None
+    assert level_for(decoded, tolerance=mercator_tolerance(9) * 1.01) == 10
+    zoom = level_for(decoded, zoom=7)
+    served = original.take(decoded[zoom])
+    assert served.latitudes == simplify(original, mercator_tolerance(zoom)).latitudes
+
+
+def test_unknown_levels_format_is_rejected():
+    with pytest.raises(ValueError):
+        decode_levels(zlib.compress(b'XXXX' + bytes(2)))
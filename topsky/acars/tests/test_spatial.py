@@ -0,0 +1,91 @@
+import time
+import pytest
+from acars import spatial
+from acars.spatial import FlightIndex, haversine_km
+
+
+@pytest.fixture
+def index(monkeypatch):
+    # Only what the tests feed in: the database reload finds nothing
+    monkeypatch.setattr(spatial, 'load_live_positions', lambda max_age: [])
+    return FlightIndex(cell_size=1.0, expire_after=600, refresh_interval=3600)
+
+
+def now_ms(seconds_ago=0):
+    return int((time.time() - seconds_ago) * 1000)
+
+
+def place(index, positions, seconds_ago=0):
+    index.update([
+        {'flight': flight, 'lat': lat, 'lon': lon, 't': now_ms(seconds_ago)}
+        for flight, (lat, lon) in positions.items()
+    ])
+
+
+def flights(results):
+    return sorted(update['flight'] for update in results)
+
+
+def nearby(index, lat, lon, radius_km):
+    """Brute force over every entry, for reference"""
+    return sorted(
+        flight for flight, (update, _) in index.entries.items()
+        if haversine_km(lat, lon, update['lat'], update['lon']) <= radius_km
+    )
+
+
+def test_bbox_across_the_antimeridian(index):
+    place(index, {1: (0, 179.5), 2: (0, -179.5), 3: (0, 0), 4: (0, 170), 5: (20, 179.9), 6: (0, -180)})
+    assert flights(index.bbox(-10, 175, 10, -175)) == [1, 2, 6]
+    # Narrow enough to walk the range, wide enough to walk the occupied cells
+    assert flights(index.bbox(-10, 179, 10, -179)) == [1, 2, 6]
+    assert flights(index.bbox(-10, 100, 30, -100)) == [1, 2, 4, 5, 6]
+    assert flights(index.bbox(-10, -180, 10, 180)) == [1, 2, 3, 4, 6]
+    assert flights(index.bbox(-10, 160, 10, 175)) == [4]
+
+
+def test_radius_across_the_dateline(index):
+    place(index, {1: (0, -179.8), 2: (0, 179.5), 3: (0, -179.0), 4: (0.2, 179.9), 5: (0, 0)})
+    results = index.radius(0, 179.9, 50)
+    assert flights(results) == nearby(index, 0, 179.9, 50) == [1, 2, 4]
+    # 22, 33 and 44 km: nearest first, measured across the dateline
+    assert [update['flight'] for update in results] == [4, 1, 2]
+    assert results[1]['distance_km'] == pytest.approx(haversine_km(0, 179.9, 0, -179.8), abs=0.1)
+    assert [update['flight'] for update in index.radius(0, 179.9, 500, limit=2)] == [4, 1]
+
+
+@pytest.mark.parametrize('lat', [89.5, -89.5])
+def test_radius_near_a_pole(index, lat):
+    sign = 1 if lat > 0 else -1
+    place(index, {
+        1: (sign * 89.0, 180), 2: (sign * 89.9, -90), 3: (sign * 88.5, 45),
+        4: (sign * 87.0, 0), 5: (sign * 80.0, 10),
+    })
+    assert flights(index.radius(lat, 0, 200)) == nearby(index, lat, 0, 200) == [1, 2, 3]
+    assert flights(index.radius(lat, 0, 400)) == nearby(index, lat, 0, 400) == [1, 2, 3, 4]
+
+
+def test_moving_a_flight_changes_its_cell(index):
+    place(index, {1: (10.5, 20.5), 2: (10.2, 20.2)}, seconds_ago=60)
+    place(index, {1: (45.5, -100.5)})
+    assert flights(index.bbox(10, 20, 11, 21)) == [2]
+    assert flights(index.bbox(45, -101, 46, -100)) == [1]
+    # The old cell only holds the flight that stayed
+    assert index.rows[index._cell(10.5, 20.5)[0]] == {index._cell(10.5, 20.5)[1]: {2}}
+
+    # An older report does not move it back
+    place(index, {1: (10.5, 20.5)}, seconds_ago=30)
+    assert flights(index.bbox(45, -101, 46, -100)) == [1]
+    assert len(index) == 2
+
+
+def test_expired_flights_are_removed(index):
+    place(index, {1: (10, 10), 2: (10.5, 10.5)}, seconds_ago=601)
+    place(index, {3: (10.2, 10.2)})
+    assert flights(index.bbox(0, 0, 20, 20)) == [3]
+    assert len(index) == 1
+    assert index.rows == {index._cell(10.2, 10.2)[0]: {index._cell(10.2, 10.2)[1]: {3}}}
+
+    # A newer report brings a flight back
+    place(index, {1: (10, 10)})
+    assert flights(index.radius(10, 10, 100)) == [1, 3]
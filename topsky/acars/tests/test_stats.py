@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+import pytest
+from acars.ingest import ingest_messages
+from acars.models import Flight, PilotAircraft, PilotStats
+from acars.stats import get_pilot_stats, rebuild_pilot_stats, track_distance_nm
+from acars.tracks import Track, close_idle_flights, compact_flight
+
+START = datetime(2026, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+
+def report(minute, flight_number, aircraft_id, **fields):
+    message = {
+        'flight_number': flight_number,
+        'aircraft_id': aircraft_id,
+        'latitude': 52 + minute / 60,
+        'longitude': 21.0,
+        'altitude': 30000,
+        'speed': 400,
+        'timestamp': (START + timedelta(minutes=minute)).isoformat(),
+    }
+    message.update(fields)
+    return message
+
+
+def fly(user):
+    """Two compacted flights on two aircraft, then a live one, with uplinks and text messages"""
+    ingest_messages(user, [report(minute, 'TSK1', 'SP-LWA') for minute in range(20)])
+    ingest_messages(user, [
+        report(20, 'TSK1', 'SP-LWA', direction='IN'),
+        {'label': 'H1', 'timestamp': (START + timedelta(minutes=21)).isoformat()},
+    ])
+    ingest_messages(user, [report(minute, 'TSK2', 'SP-LWB') for minute in range(30, 60)])
+    ingest_messages(user, [report(minute, 'TSK3', 'SP-LWA', direction='IN' if minute % 2 else 'OUT')
+                           for minute in range(70, 75)])
+    for flight in Flight.objects.filter(user=user, status=Flight.CLOSED):
+        compact_flight(flight)
+
+
+def test_incremental_totals(pilot):
+    fly(pilot)
+    stats = get_pilot_stats(pilot.pk)
+    assert stats['total_messages'] == 57
+    assert stats['incoming_messages'] == 3
+    assert stats['outgoing_messages'] == 54
+    assert stats['unique_aircraft'] == 2
+    assert stats['unique_flights'] == 3
+    assert stats['completed_flights'] == 2
+    # 21 + 29 minutes between the first and the last report of each flight
+    assert stats['flight_seconds'] == (21 + 29) * 60
+    # One nautical mile north per minute of positions
+    assert stats['distance_nm'] == pytest.approx(20 + 29, rel=1e-3)
+
+
+def test_rebuild_matches_incremental_totals(pilot, django_user_model):
+    other = django_user_model.objects.create_user('other', password='x')
+    fly(pilot)
+    ingest_messages(other, [report(minute, 'TSK9', 'SP-KTA') for minute in range(5)])
+    incremental = {user_id: get_pilot_stats(user_id) for user_id in (pilot.pk, other.pk)}
+    aircraft = set(PilotAircraft.objects.values_list('user_id', 'aircraft_id'))
+
+    PilotStats.objects.all().delete()
+    PilotAircraft.objects.all().delete()
+    assert rebuild_pilot_stats([pilot.pk, other.pk]) == 2
+
+    for user_id, stats in incremental.items():
+        rebuilt = get_pilot_stats(user_id)
+        assert rebuilt.pop('distance_nm') == pytest.approx(stats.pop('distance_nm'))
+        assert rebuilt == stats
+    assert set(PilotAircraft.objects.values_list('user_id', 'aircraft_id')) == aircraft
+
+
+def test_closing_and_compacting_later_keeps_totals_consistent(pilot):
+    ingest_messages(pilot, [report(minute, 'TSK1', 'SP-LWA') for minute in range(10)])
+    assert close_idle_flights(now=START + timedelta(hours=3)) == 1
+    compact_flight(Flight.objects.get())
+    incremental = get_pilot_stats(pilot.pk)
+
+    rebuild_pilot_stats([pilot.pk])
+    assert get_pilot_stats(pilot.pk) == incremental
+    assert incremental['total_messages'] == 10
+    assert incremental['completed_flights'] == 1
+
+
+def test_pilot_without_history(db):
+    assert get_pilot_stats(0)['total_messages'] == 0
+
+
+def test_track_distance():
+    # One minute of latitude is one nautical mile
+    rows = [(START + timedelta(minutes=index), 50 + index / 60, 10, None, None, None) for index in range(61)]
+    assert track_distance_nm(Track.from_rows(rows)) == pytest.approx(60, rel=1e-3)
+    assert track_distance_nm(Track.from_rows(rows[:1])) == 0
@@ -0,0 +1,119 @@
+from datetime import timedelta
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from acars import tokens
+from acars.models import SmartcarsProfile
+from acars.tokens import (
+    SessionUser, averify_session_token, issue_session_token, verify_session_token,
+)
+
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    # The test cache is LocMem; pretend it is Redis
+    monkeypatch.setattr(tokens, 'EPOCH_CACHE_SHARED', True)
+
+
+def issue(user):
+    return issue_session_token(user, SmartcarsProfile.objects.get(user=user))
+
+
+def bearer(token):
+    return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+
+def test_issue_and_verify(pilot):
+    token = issue(pilot)
+    assert verify_session_token(token) == {'user_id': pilot.pk, 'epoch': 0}
+    assert async_to_sync(averify_session_token)(token) == {'user_id': pilot.pk, 'epoch': 0}
+
+
+def test_tampered_and_expired_tokens_fail(pilot, monkeypatch):
+    token = issue(pilot)
+    assert verify_session_token(token[:-2] + 'xx') is None
+    assert verify_session_token(signing.dumps({'u': pilot.pk, 'e': 0}, salt='other')) is None
+
+    monkeypatch.setattr(tokens, 'SESSION_TOKEN_TTL', timedelta(seconds=-1))
+    assert verify_session_token(token) is None
+
+
+def test_revoke_invalidates_issued_tokens(pilot):
+    token = issue(pilot)
+    pilot.smartcars_profile.revoke_sessions()
+
+    assert verify_session_token(token) is None
+    assert verify_session_token(issue(pilot)) == {'user_id': pilot.pk, 'epoch': 1}
+
+
+def test_password_change_revokes(pilot):
+    token = issue(pilot)
+    pilot.set_password('new-password')
+    pilot.save()
+    assert verify_session_token(token) is None
+
+
+def test_revocation_in_another_worker_without_shared_cache(pilot, django_assert_num_queries):
+    token = issue(pilot)
+    assert verify_session_token(token)
+    # Another worker revokes; nothing reaches this process's cache
+    SmartcarsProfile.objects.filter(user=pilot).update(session_epoch=1)
+
+    with django_assert_num_queries(1):
+        assert verify_session_token(token) is None
+
+
+def test_shared_cache_verifies_without_queries(pilot, shared_cache, django_assert_num_queries):
+    token = issue(pilot)
+    assert verify_session_token(token)
+    with django_assert_num_queries(0):
+        assert verify_session_token(token)
+
+    # revoke_sessions() writes the new epoch to the shared cache
+    SmartcarsProfile.objects.get(user=pilot).revoke_sessions()
+    with django_assert_num_queries(0):
+        assert verify_session_token(token) is None
+
+
+def test_pilot_endpoint_accepts_bearer_token(client, pilot):
+    response = client.get('/api/smartcars/pilot', **bearer(issue(pilot)))
+    assert response.status_code == 200
+    assert response.json()['username'] == 'pilot'
+
+    pilot.smartcars_profile.revoke_sessions()
+    response = client.get('/api/smartcars/pilot', **bearer(response.json()['session']))
+    assert response.status_code == 401
+
+
+def test_deleted_user_gets_401(client, pilot, shared_cache):
+    token = issue(pilot)
+    assert verify_session_token(token)
+    pilot.delete()
+
+    assert verify_session_token(token) is None
+    assert client.get('/api/smartcars/pilot', **bearer(token)).status_code == 401
+
+
+def test_deleted_user_with_stale_epoch_gets_401(client, pilot, shared_cache):
+    token = issue(pilot)
+    assert verify_session_token(token)
+    # Deleted by another worker: the epoch is still in the cache
+    User.objects.filter(pk=pilot.pk).delete()
+    cache.set(tokens._epoch_cache_key(pilot.pk), 0)
+
+    assert client.get('/api/smartcars/pilot', **bearer(token)).status_code == 401
+
+
+def test_session_user_loads_lazily(pilot, django_assert_num_queries):
+    user = SessionUser(pilot.pk)
+    with django_assert_num_queries(0):
+        assert user.pk == pilot.pk
+        assert user.is_authenticated
+    with django_assert_num_queries(1):
+        assert user.username == 'pilot'
+
+    with pytest.raises(AuthenticationFailed):
+        SessionUser(pilot.pk + 1000).username
@@ -0,0 +1,130 @@
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import pytest
+from acars.ingest import ingest_messages
+from acars.models import ACARSMessage, Flight
+from acars.tracks import Track, compact_flight, decode_track, encode_track, load_track
+
+START = datetime(2026, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+
+def rows(count, step=timedelta(seconds=10)):
+    """(timestamp, latitude, longitude, altitude, speed, heading) rows with a few missing values"""
+    return [
+        (
+            START + index * step,
+            Decimal('52.165700') + Decimal(index) / 1000,
+            Decimal('-20.967100') - Decimal(index * 7) / 100000,
+            None if index % 5 == 3 else 100 * index,
+            None if index == 0 else 250 + index % 7,
+            None if index % 11 == 4 else (index * 13) % 361,
+        )
+        for index in range(count)
+    ]
+
+
+def as_rows(track):
+    data = track.as_json()
+    return [
+        (
+            START + timedelta(milliseconds=time - data['t'][0]),
+            Decimal(str(latitude)).quantize(Decimal('0.000001')),
+            Decimal(str(longitude)).quantize(Decimal('0.000001')),
+            altitude, speed, heading,
+        )
+        for time, latitude, longitude, altitude, speed, heading in zip(
+            data['t'], data['lat'], data['lon'], data['altitude'], data['speed'], data['heading'],
+        )
+    ]
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 500])
+def test_encode_decode_round_trip(count):
+    original = rows(count)
+    track = Track.from_rows(original)
+    decoded = decode_track(encode_track(track))
+
+    assert len(decoded) == count
+    for name in Track.COLUMNS:
+        assert getattr(decoded, name) == getattr(track, name)
+    assert decoded.nulls == bytes(track.nulls)
+    assert as_rows(decoded) == original
+
+
+def test_wide_deltas_round_trip():
+    # Gaps of days and antimeridian jumps need 32 and 64 bit deltas
+    original = [
+        (START, Decimal('10'), Decimal('179.999999'), 0, 0, 0),
+        (START + timedelta(days=40), Decimal('-10'), Decimal('-179.999999'), 45000, 5000, 360),
+        (START + timedelta(days=40, milliseconds=1), Decimal('-10'), Decimal('-179.999999'), -2000, 0, 0),
+    ]
+    assert as_rows(decode_track(encode_track(Track.from_rows(original)))) == original
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        decode_track(zlib.compress(b'XXXX' + bytes(60)))
+
+
+def report(minute, **fields):
+    message = {
+        'flight_number': 'TSK1',
+        'latitude': 52 + minute / 100,
+        'longitude': 21 - minute / 100,
+        'altitude': minute * 1000,
+        'speed': 250,
+        'heading': 90,
+        'timestamp': (START + timedelta(minutes=minute)).isoformat(),
+    }
+    message.update(fields)
+    return message
+
+
+def test_flights_split_on_flight_number_and_idle_gap(pilot):
+    ingest_messages(pilot, [report(0), report(1), report(2, flight_number='TSK2')])
+    ingest_messages(pilot, [report(2 + 61, flight_number='TSK2')])
+
+    flights = list(Flight.objects.order_by('started_at'))
+    assert [flight.flight_number for flight in flights] == ['TSK1', 'TSK2', 'TSK2']
+    assert [flight.status for flight in flights] == [Flight.CLOSED, Flight.CLOSED, Flight.LIVE]
+    assert [flight.messages.count() for flight in flights] == [2, 1, 1]
+
+
+def test_compaction_round_trip(pilot):
+    items = [report(minute) for minute in range(30)]
+    # A report without a position stays a row
+    items.append({'label': 'H1', 'timestamp': (START + timedelta(minutes=10, seconds=30)).isoformat()})
+    ingest_messages(pilot, items)
+    flight = Flight.objects.get()
+    live_track = load_track(flight)
+
+    with pytest.raises(ValueError):
+        compact_flight(flight)
+    Flight.objects.filter(pk=flight.pk).update(status=Flight.CLOSED, ended_at=flight.last_report_at)
+    flight.refresh_from_db()
+    flight_track = compact_flight(flight)
+
+    assert flight_track.point_count == 30
+    assert (flight_track.started_at, flight_track.ended_at) == (START, START + timedelta(minutes=29))
+    assert list(ACARSMessage.objects.filter(flight=flight).values_list('label', flat=True)) == ['H1']
+
+    flight = Flight.objects.get()
+    stored = load_track(flight)
+    for name in Track.COLUMNS:
+        assert getattr(stored, name) == getattr(live_track, name)
+    assert stored.as_json()['lat'][:2] == [52.0, 52.01]
+
+
+def test_compaction_deletes_reports_with_sub_millisecond_times(pilot):
+    # The stored track keeps milliseconds; the rows' microseconds must not keep them alive
+    ingest_messages(pilot, [
+        report(minute, timestamp=(START + timedelta(minutes=minute, microseconds=999 - minute)).isoformat())
+        for minute in range(5)
+    ])
+    Flight.objects.update(status=Flight.CLOSED, ended_at=START + timedelta(minutes=4))
+    flight_track = compact_flight(Flight.objects.get())
+
+    assert flight_track.point_count == 5
+    assert not ACARSMessage.objects.exists()
+    assert len(load_track(Flight.objects.get())) == 5
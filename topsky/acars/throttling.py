@@ -0,0 +1,99 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_AUTH_THROTTLE = {
+    'ip': {'capacity': 30, 'per_minute': 30},
+    'identifier': {'capacity': 10, 'per_minute': 10},
+}
+
+
+class TokenBucket:
+    """
+    Token bucket kept in the shared Django cache, so every worker and replica
+    draws from the same bucket. Updates are read-modify-write without a lock:
+    concurrent requests may occasionally both take the last token, which is
+    fine for flood protection.
+    """
+
+    def __init__(self, scope, capacity, per_minute):
+        self.scope = scope
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+
+    def cache_key(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        return f"acars:throttle:{self.scope}:{digest}"
+
+    def consume(self, key, tokens=1):
+        """Take tokens from the bucket; returns 0 or seconds to wait"""
+        cache_key = self.cache_key(key)
+        now = time.time()
+        level, updated_at = cache.get(cache_key) or (self.capacity, now)
+        level = min(self.capacity, level + (now - updated_at) * self.rate)
+
+        if level < tokens:
+            return (tokens - level) / self.rate if self.rate else 60.0
+
+        timeout = int(self.capacity / self.rate) + 1 if self.rate else None
+        cache.set(cache_key, (level - tokens, now), timeout)
+        return 0
+
+
+class SmartCARSAuthThrottle:
+    """
+    Per-IP and per-identifier throttle for SmartCARS credential checks.
+    Checked before any password hash is computed.
+    """
+
+    def __init__(self, config=None):
+        config = DEFAULT_AUTH_THROTTLE if config is None else config
+        self.buckets = {
+            scope: TokenBucket(scope, **options) for scope, options in config.items()
+        }
+
+    def check(self, request, identifier):
+        """Returns 0 when the attempt may proceed, otherwise seconds to wait"""
+        keys = {
+            'ip': get_client_ip(request),
+            'identifier': identifier.strip().lower(),
+        }
+        wait = 0
+        for scope, bucket in self.buckets.items():
+            wait = max(wait, bucket.consume(keys[scope]))
+            if wait:
+                _increment(f"acars:throttle:{scope}:throttled")
+                return wait
+        _increment('acars:throttle:allowed')
+        return 0
+
+
+def get_client_ip(request):
+    """Client address, honouring REST_FRAMEWORK['NUM_PROXIES'] like DRF throttles"""
+    return BaseThrottle().get_ident(request) or 'unknown'
+
+
+def _increment(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, None)
+
+
+def throttle_stats():
+    """Throttle counters shared by all workers"""
+    keys = ['acars:throttle:allowed'] + [
+        f"acars:throttle:{scope}:throttled" for scope in auth_throttle.buckets
+    ]
+    values = cache.get_many(keys)
+    stats = {'allowed': values.get('acars:throttle:allowed', 0)}
+    for scope in auth_throttle.buckets:
+        stats[f"throttled_{scope}"] = values.get(f"acars:throttle:{scope}:throttled", 0)
+    return stats
+
+
+auth_throttle = SmartCARSAuthThrottle(getattr(settings, 'SMARTCARS_AUTH_THROTTLE', None))
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from rest_framework.exceptions import AuthenticationFailed
+
+SESSION_SALT = 'acars.session'
+SESSION_TOKEN_TTL = getattr(settings, 'SMARTCARS_SESSION_TOKEN_TTL', timedelta(days=7))
+SESSION_EPOCH_CACHE_TTL = getattr(settings, 'SMARTCARS_SESSION_EPOCH_CACHE_TTL', 60)
+# A revocation written to a per-process cache would not reach the other workers
+# for SESSION_EPOCH_CACHE_TTL seconds, so without a shared cache every
+# verification reads the epoch from the database instead
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+EPOCH_CACHE_SHARED = settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def _epoch_cache_key(user_id):
+    return f"acars:session-epoch:{user_id}"
+
+
+def issue_session_token(user, profile):
+    """
+    Issue a signed, expiring SmartCARS session token.
+    The payload carries the user id and the profile's revocation epoch;
+    the signer appends the issue time.
+    """
+    return signing.dumps(
+        {'u': user.pk, 'e': profile.session_epoch}, salt=SESSION_SALT, compress=False
+    )
+
+
+def _decode_session_token(token):
+    try:
+        data = signing.loads(token, salt=SESSION_SALT, max_age=SESSION_TOKEN_TTL)
+        return data['u'], data['e']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None, None
+
+
+def verify_session_token(token):
+    """
+    Verify signature, expiry and revocation epoch of a session token.
+    Returns the claims dict or None. Only the cache is consulted for the epoch.
+    """
+    user_id, epoch = _decode_session_token(token)
+    if user_id is None or epoch != get_session_epoch(user_id):
+        return None
+    return {'user_id': user_id, 'epoch': epoch}
+
+
+async def averify_session_token(token):
+    """Async version of verify_session_token()"""
+    user_id, epoch = _decode_session_token(token)
+    if user_id is None or epoch != await aget_session_epoch(user_id):
+        return None
+    return {'user_id': user_id, 'epoch': epoch}
+
+
+def get_session_epoch(user_id):
+    """Current revocation epoch for user_id (cached when the cache is shared, DB on miss)"""
+    epoch = cache.get(_epoch_cache_key(user_id)) if EPOCH_CACHE_SHARED else None
+    if epoch is None:
+        from .models import SmartcarsProfile
+        epoch = (
+            SmartcarsProfile.objects.filter(user_id=user_id)
+            .values_list('session_epoch', flat=True)
+            .first()
+        )
+        if epoch is None:
+            return None
+        remember_session_epoch(user_id, epoch)
+    return epoch
+
+
+async def aget_session_epoch(user_id):
+    """Async version of get_session_epoch()"""
+    epoch = await cache.aget(_epoch_cache_key(user_id)) if EPOCH_CACHE_SHARED else None
+    if epoch is None:
+        from .models import SmartcarsProfile
+        epoch = await (
+            SmartcarsProfile.objects.filter(user_id=user_id)
+            .values_list('session_epoch', flat=True)
+            .afirst()
+        )
+        if epoch is None:
+            return None
+        if EPOCH_CACHE_SHARED:
+            await cache.aset(_epoch_cache_key(user_id), epoch, SESSION_EPOCH_CACHE_TTL)
+    return epoch
+
+
+def remember_session_epoch(user_id, epoch):
+    if EPOCH_CACHE_SHARED:
+        cache.set(_epoch_cache_key(user_id), epoch, SESSION_EPOCH_CACHE_TTL)
+
+
+def forget_session_epoch(user_id):
+    """Drop the cached epoch of a deleted profile, so its tokens fail at once"""
+    cache.delete(_epoch_cache_key(user_id))
+
+
+def _load_session_user(user_id):
+    try:
+        return User.objects.select_related('smartcars_profile').get(pk=user_id)
+    except User.DoesNotExist:
+        # Deleted while the token's epoch was still cached
+        raise AuthenticationFailed('Invalid or expired session')
+
+
+class SessionUser(SimpleLazyObject):
+    """
+    Authenticated user resolved from a session token.
+    The User row is only loaded when a view reads a field other than the id;
+    a user deleted since the token was verified raises AuthenticationFailed.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id):
+        super().__init__(lambda: _load_session_user(user_id))
+        self.__dict__['_user_id'] = user_id
+
+    @property
+    def pk(self):
+        return self.__dict__['_user_id']
+
+    id = pk
@@ -0,0 +1,314 @@
+"""
+Per-flight track storage.
+
+Position reports of a live flight are ordinary ACARSMessage rows. When the
+flight has ended, compact_flight() packs its positions into one FlightTrack
+blob and deletes the rows. Every column is stored as fixed-point deltas in the
+narrowest array typecode that holds them, and the blob is zlib-compressed.
+Decoding is array.frombytes over a memoryview plus a running sum per column,
+so no per-point dicts or model instances are built.
+
+Blob layout (before compression, little-endian):
+    header      '<4sBI'  magic, format version, point count
+    bases       '<6q'    first value of each column
+    nulls       count bytes, bit 1/2/4 = altitude/speed/heading missing
+    6 columns   typecode byte + (count - 1) deltas each
+Columns: time (ms since epoch), latitude and longitude (1e-6 degree, the
+precision of ACARSMessage), altitude (ft), speed (kt), heading (deg).
+A missing value repeats the previous one in its column and is flagged in nulls.
+"""
+import sys
+import struct
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import accumulate
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import ACARSMessage, Flight, FlightTrack
+
+MAGIC = b'ATRK'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBI')
+BASES = struct.Struct('<6q')
+COMPRESSION_LEVEL = 6
+COORDINATE_SCALE = 10 ** 6
+NULLABLE = (('altitude', 1), ('speed', 2), ('heading', 4))
+DELTA_TYPECODES = 'bhiq'
+BIG_ENDIAN = sys.byteorder == 'big'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+ONE_MS = timedelta(milliseconds=1)
+# A report this long after the previous one starts a new flight; live flights
+# idle for this long are closed by compact_flight_tracks
+FLIGHT_IDLE = timedelta(minutes=getattr(settings, 'SMARTCARS_FLIGHT_IDLE_MINUTES', 60))
+POSITION_FIELDS = ('timestamp', 'latitude', 'longitude', 'altitude', 'speed', 'heading')
+DELETE_BATCH_SIZE = 2000
+
+
+class Track:
+    """Column arrays of a track in stored (fixed-point) units"""
+
+    COLUMNS = ('times', 'latitudes', 'longitudes', 'altitudes', 'speeds', 'headings')
+
+    def __init__(self, times, latitudes, longitudes, altitudes, speeds, headings, nulls):
+        self.times = times
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.altitudes = altitudes
+        self.speeds = speeds
+        self.headings = headings
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (timestamp, latitude, longitude, altitude, speed, heading) rows in time order"""
+        columns = [array('q') for _ in cls.COLUMNS]
+        times, latitudes, longitudes, altitudes, speeds, headings = columns
+        nulls = bytearray()
+        previous = [0, 0, 0]
+        for timestamp, latitude, longitude, altitude, speed, heading in rows:
+            times.append((timestamp - EPOCH) // ONE_MS)
+            latitudes.append(round(latitude * COORDINATE_SCALE))
+            longitudes.append(round(longitude * COORDINATE_SCALE))
+            flags = 0
+            for index, (value, column) in enumerate(((altitude, altitudes), (speed, speeds), (heading, headings))):
+                if value is None:
+                    flags |= 1 << index
+                    value = previous[index]
+                else:
+                    previous[index] = value
+                column.append(value)
+            nulls.append(flags)
+        return cls(*columns, nulls)
+
+    @property
+    def started_at(self):
+        return EPOCH + self.times[0] * ONE_MS if self.times else None
+
+    @property
+    def ended_at(self):
+        return EPOCH + self.times[-1] * ONE_MS if self.times else None
+
+    def take(self, indices):
+        """Track of the points at the given (ascending) indices"""
+        columns = [array('q', map(getattr(self, name).__getitem__, indices)) for name in self.COLUMNS]
+        return Track(*columns, bytes(map(self.nulls.__getitem__, indices)))
+
+    def _with_nulls(self, column, bit):
+        if not any(self.nulls):
+            return column.tolist()
+        return [None if flags & bit else value for value, flags in zip(column, self.nulls)]
+
+    def as_json(self):
+        """Columnar JSON: t in epoch milliseconds, coordinates in degrees, null for missing values"""
+        data = {
+            'count': len(self),
+            't': self.times.tolist(),
+            'lat': [value / COORDINATE_SCALE for value in self.latitudes],
+            'lon': [value / COORDINATE_SCALE for value in self.longitudes],
+        }
+        for (name, bit), column in zip(NULLABLE, (self.altitudes, self.speeds, self.headings)):
+            data[name] = self._with_nulls(column, bit)
+        return data
+
+
+def _narrowest_typecode(deltas):
+    if not deltas:
+        return DELTA_TYPECODES[0]
+    low, high = min(deltas), max(deltas)
+    for typecode in DELTA_TYPECODES:
+        limit = 1 << (array(typecode).itemsize * 8 - 1)
+        if -limit <= low and high < limit:
+            return typecode
+    raise ValueError('Track value out of range')
+
+
+def pack_deltas(values):
+    """Typecode byte + the len(values) - 1 successive differences in the narrowest typecode"""
+    deltas = [b - a for a, b in zip(values, values[1:])]
+    typecode = _narrowest_typecode(deltas)
+    packed = array(typecode, deltas)
+    if BIG_ENDIAN:
+        packed.byteswap()
+    return typecode.encode() + packed.tobytes()
+
+
+def unpack_deltas(raw, offset, count, base):
+    """Inverse of pack_deltas on a memoryview; returns (array('q') of count values, new offset)"""
+    deltas = array(chr(raw[offset]))
+    offset += 1
+    size = max(count - 1, 0) * deltas.itemsize
+    deltas.frombytes(raw[offset:offset + size])
+    offset += size
+    if BIG_ENDIAN:
+        deltas.byteswap()
+    if not count:
+        return array('q'), offset
+    return array('q', accumulate(deltas, initial=base)), offset
+
+
+def encode_track(track):
+    count = len(track)
+    columns = [getattr(track, name) for name in Track.COLUMNS]
+    parts = [
+        HEADER.pack(MAGIC, FORMAT_VERSION, count),
+        BASES.pack(*(column[0] if count else 0 for column in columns)),
+        bytes(track.nulls),
+    ]
+    parts.extend(pack_deltas(column) for column in columns)
+    return zlib.compress(b''.join(parts), COMPRESSION_LEVEL)
+
+
+def decode_track(blob):
+    raw = memoryview(zlib.decompress(blob))
+    magic, version, count = HEADER.unpack_from(raw)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError('Unsupported track format')
+    offset = HEADER.size
+    bases = BASES.unpack_from(raw, offset)
+    offset += BASES.size
+    nulls = bytes(raw[offset:offset + count])
+    offset += count
+
+    columns = []
+    for base in bases:
+        column, offset = unpack_deltas(raw, offset, count, base)
+        columns.append(column)
+    return Track(*columns, nulls)
+
+
+def assign_flights(user_id, messages):
+    """
+    Attach unsaved messages (in arrival order) to the user's live flight. A new
+    flight is opened for the first report, when the flight number changes or
+    after FLIGHT_IDLE without reports; the previous live flight is closed.
+    Must run inside the transaction that saves the messages. Returns how many
+    flights were opened.
+    """
+    flight = (
+        Flight.objects.select_for_update()
+        .filter(user_id=user_id, status=Flight.LIVE)
+        .order_by('-started_at')
+        .first()
+    )
+    changed = set()
+    opened = 0
+    for message in messages:
+        if flight is not None and (
+            (message.flight_number and flight.flight_number
+             and message.flight_number != flight.flight_number)
+            or message.timestamp - flight.last_report_at > FLIGHT_IDLE
+        ):
+            flight.status = Flight.CLOSED
+            flight.ended_at = flight.last_report_at
+            flight.save()
+            changed.discard(flight)
+            flight = None
+        if flight is None:
+            flight = Flight.objects.create(
+                user_id=user_id,
+                flight_number=message.flight_number,
+                aircraft_id=message.aircraft_id,
+                route=message.route,
+                started_at=message.timestamp,
+                last_report_at=message.timestamp,
+            )
+            opened += 1
+        for field in ('flight_number', 'aircraft_id', 'route'):
+            if not getattr(flight, field) and getattr(message, field):
+                setattr(flight, field, getattr(message, field))
+                changed.add(flight)
+        if message.timestamp > flight.last_report_at:
+            flight.last_report_at = message.timestamp
+            changed.add(flight)
+        message.flight = flight
+    for flight in changed:
+        flight.save(update_fields=['flight_number', 'aircraft_id', 'route', 'last_report_at'])
+    return opened
+
+
+def close_idle_flights(idle=FLIGHT_IDLE, now=None):
+    """Close live flights without reports for `idle`; returns how many were closed"""
+    cutoff = (now or timezone.now()) - idle
+    return Flight.objects.filter(status=Flight.LIVE, last_report_at__lt=cutoff).update(
+        status=Flight.CLOSED, ended_at=F('last_report_at'),
+    )
+
+
+def _positions(flight):
+    return ACARSMessage.objects.filter(
+        flight=flight, latitude__isnull=False, longitude__isnull=False,
+    )
+
+
+def compact_flight(flight, delete_rows=True):
+    """
+    Pack the positions of a closed flight and its zoom levels into its FlightTrack,
+    store its phases and OOOI times (acars.phases), generate its PIREP
+    (acars.pireps), add the flight to the pilot's totals (acars.stats) and (by
+    default) delete the position rows. Reports without a position are kept as
+    rows. Returns the FlightTrack.
+    """
+    from .phases import detect_phases
+    from .pireps import generate_pirep
+    from .simplify import build_levels, encode_levels
+    from .stats import record_completed_flight, track_distance_nm
+
+    if flight.status != Flight.CLOSED:
+        raise ValueError('Only closed flights can be compacted')
+    positions = _positions(flight)
+    ids = array('q')
+
+    def read(rows):
+        for message_id, *row in rows:
+            ids.append(message_id)
+            yield row
+
+    with transaction.atomic():
+        rows = positions.order_by('timestamp', 'id').values_list('id', *POSITION_FIELDS)
+        track = Track.from_rows(read(rows.iterator(chunk_size=2000)))
+        flight_track, created = FlightTrack.objects.update_or_create(
+            flight=flight,
+            defaults={
+                'point_count': len(track),
+                'started_at': track.started_at,
+                'ended_at': track.ended_at,
+                'data': encode_track(track),
+                'levels': encode_levels(build_levels(track)),
+                'distance_nm': track_distance_nm(track),
+                'incoming_count': positions.filter(direction='IN').count(),
+            },
+        )
+        phase_values = detect_phases(track).flight_values(track.times)
+        for field, value in phase_values.items():
+            setattr(flight, field, value)
+        flight.save(update_fields=list(phase_values))
+        pirep = generate_pirep(flight, track, distance_nm=flight_track.distance_nm)
+        if created:
+            record_completed_flight(flight, pirep)
+        if delete_rows and len(track):
+            # Exactly the rows read into the track: its times are floored to milliseconds,
+            # so its range can end before the last report. The time range lets
+            # PostgreSQL prune to the flight's partitions.
+            ended_at = track.ended_at + ONE_MS
+            for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                positions.filter(
+                    timestamp__gte=track.started_at, timestamp__lt=ended_at,
+                    id__in=ids[start:start + DELETE_BATCH_SIZE].tolist(),
+                ).delete()
+    return flight_track
+
+
+def load_track(flight):
+    """Track of a flight: decoded from its FlightTrack, or read from the rows while live"""
+    try:
+        flight_track = flight.track
+    except FlightTrack.DoesNotExist:
+        rows = _positions(flight).order_by('timestamp', 'id').values_list(*POSITION_FIELDS)
+        return Track.from_rows(rows.iterator(chunk_size=2000))
+    return decode_track(flight_track.data)
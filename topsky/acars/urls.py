@@ -1,17 +1,45 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import flight_views, message_views, views
 
 app_name = 'acars'
 
+# Under ASGI the hot SmartCARS endpoints are served by their async versions
+if getattr(settings, 'SMARTCARS_ASYNC_VIEWS', False):
+    from . import async_views as smartcars_views
+else:
+    smartcars_views = views
+
 urlpatterns = [
     # Main SmartCARS API endpoint - this is what goes in SmartCARS Central
     path('', views.api_info, name='api_info'),
     
     # Authentication endpoints
-    path('login', views.login, name='login'),
-    path('pilot', views.pilot_info, name='pilot_info'),
-    path('data', views.data_info, name='data_info'),
+    path('login', smartcars_views.login, name='login'),
+    path('pilot', smartcars_views.pilot_info, name='pilot_info'),
+    path('data', smartcars_views.data_info, name='data_info'),
+    
+    # Reference data, served from the in-memory catalog (acars.catalog)
+    path('airports/', smartcars_views.airports, name='airports'),
+    path('aircraft/', smartcars_views.aircraft, name='aircraft'),
+    path('schedules/', smartcars_views.schedules, name='schedules'),
+    
+    # ACARS messages / position reports
+    path('messages/', message_views.messages, name='messages'),
+    path('messages/latest/', message_views.latest, name='messages_latest'),
+    path('messages/stats/', message_views.stats, name='messages_stats'),
+    path('bulk-create/', message_views.bulk_create, name='bulk_create'),
+    path('messages/ndjson/', message_views.ndjson_ingest, name='ndjson_ingest'),
+    
+    # Flights and their tracks
+    path('flights/', flight_views.flights, name='flights'),
+    path('flights/<int:flight_id>/track/', flight_views.flight_track, name='flight_track'),
+    path('live/', flight_views.live_positions, name='live_positions'),
+    path('live/area/', flight_views.live_area, name='live_area'),
     
     # Test endpoint
     path('test', views.test_auth, name='test_auth'),
-] 
\ No newline at end of file
+    
+    # Staff-only inspection of recent SmartCARS exchanges
+    path('debug/exchanges', views.recent_exchanges_view, name='recent_exchanges'),
+]
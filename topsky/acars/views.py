@@ -1,69 +1,140 @@
+import base64
+import gzip
+import hashlib
 import json
 import logging
-from datetime import datetime
-from django.http import JsonResponse
+import re
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from .authentication import SmartCARSAuthentication, authenticate_smartcars_user
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from .authentication import (
+    SmartCARSAuthentication,
+    SmartCARSSessionAuthentication,
+    authenticate_smartcars_request,
+    authenticate_smartcars_user,
+)
+from .catalog import catalog
 from .models import SmartcarsProfile
+from .request_log import log_request_details, log_response_details, recent_exchanges
 from .serializers import APIInfoSerializer, LoginSerializer, SmartcarsProfileSerializer
+from .stats import flight_hours, get_pilot_stats
+from .tokens import issue_session_token
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def log_request_details(request, endpoint_name):
-    """Log detailed request information"""
-    timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-    
-    print(f"\n[{timestamp}] 🔍 SmartCARS Request to {endpoint_name}")
-    print(f"[{timestamp}] =======================================")
-    print(f"[{timestamp}] 📤 Method: {request.method}")
-    print(f"[{timestamp}] 📤 Path: {request.path}")
-    print(f"[{timestamp}] 📤 Content-Type: {request.content_type}")
-    print(f"[{timestamp}] 📤 User-Agent: {request.META.get('HTTP_USER_AGENT', 'N/A')}")
-    
-    # Log all headers
-    print(f"[{timestamp}] 📤 Headers:")
-    for key, value in request.META.items():
-        if key.startswith('HTTP_'):
-            header_name = key[5:].replace('_', '-').title()
-            print(f"[{timestamp}]    {header_name}: {value}")
-    
-    # Log body content
-    if request.body:
-        try:
-            if request.content_type == 'application/json':
-                body_data = json.loads(request.body)
-                print(f"[{timestamp}] 📤 JSON Body: {json.dumps(body_data, indent=2)}")
-            else:
-                print(f"[{timestamp}] 📤 Raw Body: {request.body.decode('utf-8', errors='ignore')}")
-        except:
-            print(f"[{timestamp}] 📤 Body (bytes): {request.body}")
+
+API_INFO = {
+    "name": "Topsky Virtual Airlines SmartCARS API",
+    "version": "1.0.0",
+    "apiVersion": "1.0.0",
+    "handler": "django", 
+    "description": "SmartCARS 3 API for Topsky Virtual Airlines",
+    "endpoints": {
+        "login": "/api/smartcars/login",
+        "pilot": "/api/smartcars/pilot",
+        "data": "/api/smartcars/data"
+    }
+}
+
+DATA_INFO = {
+    'airline': {
+        'name': 'Topsky Virtual Airlines',
+        'icao': 'TSK',
+        'iata': 'TS',
+        'logo': '/static/images/logo.png'
+    },
+    'settings': {
+        'currency': 'USD',
+        'timezone': 'UTC',
+        'units': 'imperial'
+    }
+}
+
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class PreEncodedJSON:
+    """
+    JSON payload encoded once and served as bytes with a strong ETag
+    (prefixed with version, when given). A request whose If-None-Match
+    matches gets an empty 304. With compress the body is also gzipped once
+    and sent to clients that accept gzip, under the weak form of the ETag.
+    """
     
-    # Log POST data
-    if request.POST:
-        print(f"[{timestamp}] 📤 POST Data: {dict(request.POST.items())}")
+    def __init__(self, data, cache_control, version=None, compress=False):
+        self.data = data
+        self.body = json.dumps(data, separators=(',', ':')).encode()
+        digest = hashlib.sha256(self.body).hexdigest()
+        self.etag = f'"{digest[:32]}"' if version is None else f'"{version}-{digest[:16]}"'
+        self.cache_control = cache_control
+        # mtime=0 keeps the gzip bytes identical across workers
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0) if compress else None
     
-    # Log GET parameters
-    if request.GET:
-        print(f"[{timestamp}] 📤 GET Params: {dict(request.GET.items())}")
+    def is_fresh(self, request):
+        header = request.META.get('HTTP_IF_NONE_MATCH')
+        if not header:
+            return False
+        # If-None-Match uses the weak comparison
+        tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+        return '*' in tags or self.etag in tags
     
-    print(f"[{timestamp}] =======================================")
+    def response(self, request):
+        gzipped = self.gzipped is not None and ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if self.is_fresh(request):
+            response = HttpResponseNotModified()
+        elif gzipped:
+            response = HttpResponse(self.gzipped, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = f'W/{self.etag}' if gzipped else self.etag
+        response['Cache-Control'] = self.cache_control
+        if self.gzipped is not None:
+            response['Vary'] = 'Accept-Encoding'
+        return response
 
-def log_response_details(response_data, status_code, endpoint_name):
-    """Log response details"""
-    timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-    
-    print(f"[{timestamp}] 📥 Response from {endpoint_name}")
-    print(f"[{timestamp}] 📥 Status: {status_code}")
-    print(f"[{timestamp}] 📥 Data: {json.dumps(response_data, indent=2)}")
-    print(f"[{timestamp}] =======================================\n")
+
+DISCOVERY_PAYLOADS = {}
+
+
+def encode_discovery_payloads(**kwargs):
+    """(Re)build the pre-encoded discovery responses from settings"""
+    DISCOVERY_PAYLOADS['API_INFO'] = PreEncodedJSON(
+        getattr(settings, 'SMARTCARS_API_INFO', API_INFO), 'public, max-age=300'
+    )
+    DISCOVERY_PAYLOADS['DATA_INFO'] = PreEncodedJSON(
+        getattr(settings, 'SMARTCARS_DATA_INFO', DATA_INFO), 'private, max-age=300'
+    )
+
+
+encode_discovery_payloads()
+
+
+@receiver(setting_changed)
+def reencode_discovery_payloads(setting, **kwargs):
+    if setting in ('SMARTCARS_API_INFO', 'SMARTCARS_DATA_INFO'):
+        encode_discovery_payloads()
+
+
+def discovery_response(request, endpoint_name):
+    """Serve a pre-encoded discovery payload (200 or 304)"""
+    payload = DISCOVERY_PAYLOADS[endpoint_name]
+    response = payload.response(request)
+    log_response_details(request, payload.data, response.status_code)
+    return response
 
 
 # SmartCARS API Info endpoint - required by SmartCARS
@@ -75,22 +146,100 @@ def api_info(request):
     This endpoint is called by SmartCARS to verify the API is working
     """
     log_request_details(request, "API_INFO")
+    return discovery_response(request, "API_INFO")
+
+
+def parse_login_credentials(request):
+    """
+    Extract (identifier, password) from a SmartCARS login request.
+    Basic Auth header first, then JSON body, then form data.
+    Raises AuthenticationFailed for a malformed header and json.JSONDecodeError for bad JSON.
+    """
+    identifier = None  # Can be email or username
+    password = None
     
-    data = {
-        "name": "Topsky Virtual Airlines SmartCARS API",
-        "version": "1.0.0",
-        "apiVersion": "1.0.0",
-        "handler": "django", 
-        "description": "SmartCARS 3 API for Topsky Virtual Airlines",
-        "endpoints": {
-            "login": "/api/smartcars/login",
-            "pilot": "/api/smartcars/pilot",
-            "data": "/api/smartcars/data"
-        }
+    # Check for Basic Auth header first (SmartCARS may use this)
+    auth_header = request.META.get('HTTP_AUTHORIZATION')
+    if auth_header and auth_header.startswith('Basic '):
+        try:
+            auth_decoded = base64.b64decode(auth_header[6:]).decode('utf-8')
+            identifier, password = auth_decoded.split(':', 1)
+        except (ValueError, UnicodeDecodeError):
+            raise AuthenticationFailed('Invalid authentication header')
+    
+    # If no Basic Auth, try JSON body
+    elif request.content_type == 'application/json' and request.body:
+        data = json.loads(request.body)
+        # Try email first, then username
+        identifier = data.get('email') or data.get('username')
+        password = data.get('password')
+    
+    # If no JSON, try form data
+    elif request.POST:
+        # Try email first, then username
+        identifier = request.POST.get('email') or request.POST.get('username')
+        password = request.POST.get('password')
+    
+    request.smartcars_identifier = identifier
+    return identifier, password
+
+
+def login_response_data(user, session):
+    """Successful SmartCARS login payload"""
+    return {
+        'status': 'success',
+        'message': 'Login successful',
+        'user': {
+            'id': user.id,
+            'pilotID': f"TSK{user.id:04d}",  # Generate pilot ID
+            'username': user.username,
+            'email': user.email,
+            'firstName': user.first_name,
+            'lastName': user.last_name,
+            'session': session,
+            'rank': 'Pilot',
+            'rankLevel': 1,
+            'avatar': None
+        },
+        'session': session
     }
+
+
+def throttled_response(request, exc):
+    """429 response for a Throttled authentication attempt"""
+    error_data = {'error': 'Too many login attempts', 'retryAfter': exc.wait}
+    log_response_details(request, error_data, 429)
+    response = JsonResponse(error_data, status=429)
+    response['Retry-After'] = str(int(exc.wait) + 1)
+    return response
+
+
+def unauthorized_response(request, error_data):
+    """401 for the plain Django SmartCARS views, matching what DRF returns"""
+    log_response_details(request, error_data, 401)
+    response = JsonResponse(error_data, status=401)
+    response['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+def authenticated_user(request):
+    """
+    Authenticate a plain Django SmartCARS view like the DRF views do.
+    Returns (user, None) or (None, 401/429 response).
+    """
+    try:
+        user = authenticate_smartcars_request(request)
+    except Throttled as exc:
+        return None, throttled_response(request, exc)
+    except AuthenticationFailed as exc:
+        return None, unauthorized_response(request, {'detail': str(exc.detail)})
+    if user is None:
+        return None, unauthorized_response(
+            request, {'detail': 'Authentication credentials were not provided.'}
+        )
     
-    log_response_details(data, 200, "API_INFO")
-    return JsonResponse(data)
+    request._smartcars_log_user = user
+    return user, None
 
 
 # Login endpoint for SmartCARS
@@ -105,107 +254,55 @@ def login(request):
     log_request_details(request, "LOGIN")
     
     try:
-        identifier = None  # Can be email or username
-        password = None
-        
-        # Check for Basic Auth header first (SmartCARS may use this)
-        auth_header = request.META.get('HTTP_AUTHORIZATION')
-        if auth_header and auth_header.startswith('Basic '):
-            try:
-                import base64
-                auth_decoded = base64.b64decode(auth_header[6:]).decode('utf-8')
-                identifier, password = auth_decoded.split(':', 1)
-                print(f"🔐 Using Basic Auth - Identifier: {identifier}")
-            except (ValueError, UnicodeDecodeError):
-                error_data = {'error': 'Invalid authentication header'}
-                log_response_details(error_data, 400, "LOGIN")
-                return JsonResponse(error_data, status=400)
-        
-        # If no Basic Auth, try JSON body
-        elif request.content_type == 'application/json' and request.body:
-            data = json.loads(request.body)
-            # Try email first, then username
-            identifier = data.get('email') or data.get('username')
-            password = data.get('password')
-            print(f"🔐 Using JSON Auth - Identifier: {identifier}")
-        
-        # If no JSON, try form data
-        elif request.POST:
-            # Try email first, then username
-            identifier = request.POST.get('email') or request.POST.get('username')
-            password = request.POST.get('password')
-            print(f"🔐 Using Form Auth - Identifier: {identifier}")
+        try:
+            identifier, password = parse_login_credentials(request)
+        except AuthenticationFailed:
+            error_data = {'error': 'Invalid authentication header'}
+            log_response_details(request, error_data, 400)
+            return JsonResponse(error_data, status=400)
         
         if not identifier or not password:
             error_data = {'error': 'Email/username and password are required'}
-            log_response_details(error_data, 400, "LOGIN")
+            log_response_details(request, error_data, 400)
             return JsonResponse(error_data, status=400)
         
-        print(f"🔐 Attempting authentication for: {identifier}")
-        
         # Authenticate user (now supports both email and username)
-        user = authenticate_smartcars_user(identifier, password)
+        try:
+            user = authenticate_smartcars_user(identifier, password, request)
+        except Throttled as exc:
+            return throttled_response(request, exc)
         
         if user:
-            print(f"✅ Authentication successful for: {identifier}")
+            request._smartcars_log_user = user
             
             # Get or create SmartCARS profile
             profile = SmartcarsProfile.get_or_create_for_user(user)
             profile.update_last_login()
             
             # Return success response with user data
-            response_data = {
-                'status': 'success',
-                'message': 'Login successful',
-                'user': {
-                    'id': user.id,
-                    'pilotID': f"TSK{user.id:04d}",  # Generate pilot ID
-                    'username': user.username,
-                    'email': user.email,
-                    'firstName': user.first_name,
-                    'lastName': user.last_name,
-                    'session': profile.acars_token,
-                    'rank': 'Pilot',
-                    'rankLevel': 1,
-                    'avatar': None
-                },
-                'session': profile.acars_token
-            }
+            response_data = login_response_data(user, issue_session_token(user, profile))
             
-            log_response_details(response_data, 200, "LOGIN")
+            log_response_details(request, response_data, 200)
             return JsonResponse(response_data)
         else:
-            print(f"❌ Authentication failed for: {identifier}")
             error_data = {'error': 'Invalid credentials'}
-            log_response_details(error_data, 401, "LOGIN")
+            log_response_details(request, error_data, 401)
             return JsonResponse(error_data, status=401)
             
     except json.JSONDecodeError:
-        print(f"❌ JSON decode error")
         error_data = {'error': 'Invalid JSON data'}
-        log_response_details(error_data, 400, "LOGIN")
+        log_response_details(request, error_data, 400)
         return JsonResponse(error_data, status=400)
-    except Exception as e:
-        print(f"❌ Exception during login: {e}")
+    except Exception:
+        logger.exception("Exception during SmartCARS login")
         error_data = {'error': 'Internal server error'}
-        log_response_details(error_data, 500, "LOGIN")
+        log_response_details(request, error_data, 500)
         return JsonResponse(error_data, status=500)
 
 
-# Pilot info endpoint (requires authentication)
-@api_view(['GET'])
-@authentication_classes([SmartCARSAuthentication])
-@permission_classes([IsAuthenticated])
-def pilot_info(request):
-    """
-    Get pilot information - requires authentication
-    """
-    log_request_details(request, "PILOT_INFO")
-    
-    user = request.user
-    profile = SmartcarsProfile.get_or_create_for_user(user)
-    
-    response_data = {
+def pilot_response_data(user, profile, stats):
+    """SmartCARS pilot info payload; stats as returned by acars.stats.get_pilot_stats"""
+    return {
         'id': user.id,
         'pilotID': f"TSK{user.id:04d}",
         'username': user.username,
@@ -215,49 +312,90 @@ def pilot_info(request):
         'rank': 'Pilot',
         'rankLevel': 1,
         'avatar': None,
-        'session': profile.acars_token,
+        'session': issue_session_token(user, profile),
         'stats': {
-            'totalFlights': 0,
-            'totalHours': 0,
-            'totalDistance': 0
+            'totalFlights': stats['completed_flights'],
+            'totalHours': flight_hours(stats),
+            'totalDistance': round(stats['distance_nm']),
         }
     }
-    
-    log_response_details(response_data, 200, "PILOT_INFO")
-    return Response(response_data)
 
 
-# Basic data endpoint
+# Pilot info endpoint (requires authentication)
 @api_view(['GET'])
-@authentication_classes([SmartCARSAuthentication])
+@authentication_classes([SmartCARSSessionAuthentication, SmartCARSAuthentication])
 @permission_classes([IsAuthenticated])
+def pilot_info(request):
+    """
+    Get pilot information - requires authentication
+    """
+    log_request_details(request, "PILOT_INFO")
+    
+    user = request.user
+    profile = SmartcarsProfile.get_or_create_for_user(user)
+    
+    response_data = pilot_response_data(user, profile, get_pilot_stats(user.pk))
+    
+    log_response_details(request, response_data, 200)
+    return Response(response_data)
+
+
+# Basic data endpoint (plain Django view: the payload is pre-encoded, DRF rendering is skipped)
+@require_http_methods(["GET"])
 def data_info(request):
     """
     Basic data endpoint for SmartCARS
     """
     log_request_details(request, "DATA_INFO")
     
-    response_data = {
-        'airline': {
-            'name': 'Topsky Virtual Airlines',
-            'icao': 'TSK',
-            'iata': 'TS',
-            'logo': '/static/images/logo.png'
-        },
-        'settings': {
-            'currency': 'USD',
-            'timezone': 'UTC',
-            'units': 'imperial'
-        }
-    }
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
     
-    log_response_details(response_data, 200, "DATA_INFO")
-    return Response(response_data)
+    return discovery_response(request, "DATA_INFO")
+
+
+def catalog_response(request, snapshot, name):
+    """Serve one list of a catalog snapshot (200 or 304)"""
+    payload = snapshot.payloads[name]
+    response = payload.response(request)
+    log_response_details(request, payload.data, response.status_code)
+    return response
+
+
+@require_http_methods(["GET"])
+def airports(request):
+    """Airport list for SmartCARS, from the in-memory catalog (acars.catalog)"""
+    log_request_details(request, "AIRPORTS")
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+    return catalog_response(request, catalog.snapshot(), 'airports')
+
+
+@require_http_methods(["GET"])
+def aircraft(request):
+    """Fleet list for SmartCARS, from the in-memory catalog"""
+    log_request_details(request, "AIRCRAFT")
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+    return catalog_response(request, catalog.snapshot(), 'aircraft')
+
+
+@require_http_methods(["GET"])
+def schedules(request):
+    """Schedule list for SmartCARS, from the in-memory catalog"""
+    log_request_details(request, "SCHEDULES")
+    user, error_response = authenticated_user(request)
+    if error_response:
+        return error_response
+    return catalog_response(request, catalog.snapshot(), 'schedules')
 
 
 # Test endpoint to verify authentication
 @api_view(['GET'])
-@authentication_classes([SmartCARSAuthentication])
+@authentication_classes([SmartCARSSessionAuthentication, SmartCARSAuthentication])
 @permission_classes([IsAuthenticated])
 def test_auth(request):
     """
@@ -271,5 +409,45 @@ def test_auth(request):
         'email': request.user.email
     }
     
-    log_response_details(response_data, 200, "TEST_AUTH")
-    return Response(response_data) 
\ No newline at end of file
+    log_response_details(request, response_data, 200)
+    return Response(response_data)
+
+
+def _exchange_matches(entry, user, endpoint, status_filter):
+    if endpoint and entry['endpoint'] != endpoint:
+        return False
+    if status_filter:
+        status_code = str(entry['status'])
+        if status_filter.endswith('xx'):
+            if not status_code.startswith(status_filter[0]):
+                return False
+        elif status_code != status_filter:
+            return False
+    if user:
+        identity = entry['user'] or {}
+        if user not in {str(value).lower() for value in identity.values()}:
+            return False
+    return True
+
+
+# Recent SmartCARS exchanges from all workers (staff only)
+@staff_member_required
+@require_http_methods(["GET"])
+def recent_exchanges_view(request):
+    """
+    Redacted recent SmartCARS request/response pairs, newest first.
+    Filters: ?user=<id|username|email>&endpoint=LOGIN&status=401|4xx&limit=100
+    """
+    user = request.GET.get('user', '').strip().lower()
+    endpoint = request.GET.get('endpoint', '').strip().upper()
+    status_filter = request.GET.get('status', '').strip().lower()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 100)), 1000))
+    except ValueError:
+        limit = 100
+
+    matches = [
+        entry for entry in recent_exchanges.merged()
+        if _exchange_matches(entry, user, endpoint, status_filter)
+    ]
+    return JsonResponse({'count': len(matches), 'exchanges': matches[:limit]})
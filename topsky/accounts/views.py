@@ -4,6 +4,8 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.mail import send_mail
 from django.conf import settings
+from acars.latest import latest_cache
+from acars.stats import get_pilot_stats
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
 
 
@@ -73,8 +75,14 @@ def dashboard_view(request):
     #     except:
     #         smartcars_profile = None
     
+    pilot_stats = get_pilot_stats(request.user.pk)
+    minutes = pilot_stats['flight_seconds'] // 60
     context = {
         'user': request.user,
+        # One cached primary key lookup instead of sorting the pilot's messages
+        'latest_position': latest_cache.get(request.user.pk),
+        'pilot_stats': pilot_stats,
+        'flight_time': f"{minutes // 60}h {minutes % 60:02d}m",
         # 'smartcars_profile': smartcars_profile  # Commented for debugging
     }
     return render(request, 'accounts/dashboard.html', context) 
\ No newline at end of file
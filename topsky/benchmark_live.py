@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Load test for the live map stream (acars/api/live/, served by topsky.asgi).
+Opens --clients idle SSE connections, optionally posts a position every
+--interval seconds through the messages API, and reports how many viewers
+received each update and the delivery latency.
+
+Example:
+    python benchmark_live.py --url http://127.0.0.1:8000/acars/api/live/ --clients 5000 \\
+        --publish-url http://127.0.0.1:8000/acars/api/messages/ --bearer <session> --duration 60
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import urllib.request
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+
+def log(message):
+    print(f"[{time.strftime('%H:%M:%S')}] {message}")
+
+
+class Viewer:
+    def __init__(self):
+        self.connected = False
+        self.updates = 0
+        self.latencies = []
+
+    async def run(self, host, port, path):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+        )
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        if b' 200 ' not in head.split(b'\r\n', 1)[0]:
+            raise OSError(head.split(b'\r\n', 1)[0].decode())
+        self.connected = True
+        chunked = b'transfer-encoding: chunked' in head.lower()
+        buffer = b''
+        try:
+            while True:
+                if chunked:
+                    size = int((await reader.readline()).strip() or b'0', 16)
+                    if size == 0:
+                        return
+                    data = await reader.readexactly(size + 2)
+                    buffer += data[:-2]
+                else:
+                    data = await reader.read(65536)
+                    if not data:
+                        return
+                    buffer += data
+                *frames, buffer = buffer.split(b'\n\n')
+                for frame in frames:
+                    self.handle(frame)
+        finally:
+            self.connected = False
+            writer.close()
+
+    def handle(self, frame):
+        if not frame.startswith(b'event: position'):
+            return
+        received = time.time() * 1000
+        updates = json.loads(frame.split(b'\ndata: ', 1)[1])
+        self.updates += 1
+        self.latencies.append(received - max(update['t'] for update in updates))
+
+
+def publish(url, bearer, index):
+    body = json.dumps({
+        'flight_number': 'BENCH1',
+        'latitude': 52.0 + index * 0.001,
+        'longitude': 21.0,
+        'altitude': 35000,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+    }).encode()
+    request = urllib.request.Request(url, data=body, method='POST', headers={
+        'Content-Type': 'application/json', 'Authorization': f"Bearer {bearer}",
+    })
+    urllib.request.urlopen(request, timeout=10).read()
+
+
+async def run(args):
+    url = urlsplit(args.url)
+    viewers = [Viewer() for _ in range(args.clients)]
+    tasks = []
+    started = time.perf_counter()
+    for start in range(0, args.clients, args.connect_batch):
+        tasks += [
+            asyncio.create_task(viewer.run(url.hostname, url.port or 80, url.path or '/'))
+            for viewer in viewers[start:start + args.connect_batch]
+        ]
+        await asyncio.sleep(0.05)
+    deadline = time.monotonic() + args.connect_timeout
+    while time.monotonic() < deadline:
+        connected = sum(viewer.connected for viewer in viewers)
+        if connected + sum(task.done() for task in tasks) >= args.clients:
+            break
+        await asyncio.sleep(0.2)
+    log(f"{connected}/{args.clients} viewers connected in {time.perf_counter() - started:.1f}s")
+
+    published = 0
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        if args.publish_url:
+            await asyncio.to_thread(publish, args.publish_url, args.bearer, published)
+            published += 1
+        await asyncio.sleep(args.interval)
+    await asyncio.sleep(2)
+
+    failures = [task.exception() for task in tasks if task.done() and task.exception()]
+    still_connected = sum(viewer.connected for viewer in viewers)
+    log(f"Still connected: {still_connected}, failed: {len(failures)}"
+        + (f" (first: {failures[0]!r})" if failures else ''))
+    if published:
+        received = [viewer.updates for viewer in viewers]
+        latencies = sorted(latency for viewer in viewers for latency in viewer.latencies)
+        log(f"Published {published} positions; position events per viewer: "
+            f"min {min(received)}, median {statistics.median(received)}, max {max(received)}")
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100)
+            log(f"Delivery latency ms: p50 {quantiles[49]:.0f}  p95 {quantiles[94]:.0f}  "
+                f"p99 {quantiles[98]:.0f}  max {latencies[-1]:.0f}")
+    for task in tasks:
+        task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--url', required=True, help='Live stream URL')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--connect-batch', type=int, default=200, help='Connections opened per 50 ms')
+    parser.add_argument('--connect-timeout', type=float, default=60)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to keep the viewers connected')
+    parser.add_argument('--publish-url', help='messages API URL to post positions to')
+    parser.add_argument('--bearer', help='SmartCARS session token for --publish-url')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between posted positions')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the SmartCARS endpoints.
+Opens --concurrency simultaneous connections and reports throughput and latency,
+so the sync (gunicorn WSGI) and async (gunicorn + uvicorn ASGI) setups can be compared.
+
+Example:
+    python benchmark_smartcars.py --url http://127.0.0.1:8000/api/smartcars/pilot \\
+        --basic pilot@example.com:password --concurrency 200 --requests 4000
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def log(message):
+    print(f"[{time.strftime('%H:%M:%S')}] {message}")
+
+
+def build_request(args):
+    url = urlsplit(args.url)
+    path = url.path or '/'
+    if url.query:
+        path += f"?{url.query}"
+
+    headers = {
+        'Host': url.netloc,
+        'User-Agent': 'smartcars-benchmark',
+        'Connection': 'close',
+    }
+    if args.basic:
+        headers['Authorization'] = 'Basic ' + base64.b64encode(args.basic.encode()).decode()
+    if args.bearer:
+        headers['Authorization'] = f"Bearer {args.bearer}"
+    for header in args.header:
+        name, value = header.split(':', 1)
+        headers[name.strip()] = value.strip()
+
+    body = b''
+    if args.json is not None:
+        raw = args.json
+        if raw.startswith('@'):
+            with open(raw[1:]) as f:
+                raw = f.read()
+        body = json.dumps(json.loads(raw)).encode()
+        headers['Content-Type'] = 'application/json'
+    if body or args.method == 'POST':
+        headers['Content-Length'] = str(len(body))
+
+    head = f"{args.method} {path} HTTP/1.1\r\n"
+    head += ''.join(f"{key}: {value}\r\n" for key, value in headers.items())
+    return url.hostname, url.port or 80, head.encode() + b'\r\n' + body
+
+
+async def send_one(host, port, payload):
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(payload)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    status = int(response.split(b' ', 2)[1]) if response else 0
+    return status, time.perf_counter() - started
+
+
+async def run(args):
+    host, port, payload = build_request(args)
+    latencies = []
+    statuses = {}
+    remaining = args.requests
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            try:
+                status, elapsed = await send_one(host, port, payload)
+            except OSError:
+                status, elapsed = 'error', None
+            statuses[status] = statuses.get(status, 0) + 1
+            if elapsed is not None:
+                latencies.append(elapsed)
+
+    log(f"{args.method} {args.url} - {args.requests} requests, concurrency {args.concurrency}")
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    log(f"Statuses: {statuses}")
+    log(f"Throughput: {len(latencies) / duration:.1f} req/s over {duration:.2f}s")
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+        log(
+            f"Latency ms: p50 {quantiles[49] * 1000:.1f}  p95 {quantiles[94] * 1000:.1f}  "
+            f"p99 {quantiles[98] * 1000:.1f}  max {latencies[-1] * 1000:.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--url', required=True)
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--basic', help='identifier:password for Basic auth')
+    parser.add_argument('--bearer', help='SmartCARS session token')
+    parser.add_argument('--json', help='JSON request body, or @file to read it from a file')
+    parser.add_argument('--header', action='append', default=[], help='Extra "Name: value" header (repeatable)')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Gunicorn settings picked up automatically when gunicorn runs from this directory.
+Command-line flags (Procfile, Dockerfile) still take precedence.
+
+Enables prometheus_client multiprocess mode so /metrics aggregates all workers
+and loads the live flight index (acars.spatial) and the SmartCARS catalog
+(acars.catalog) as each worker starts.
+"""
+import os
+import shutil
+
+prometheus_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/topsky-prometheus')
+
+
+def on_starting(server):
+    # Metric files from a previous run would be added to the new totals
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Fill the live flight index before the first area query lands on this worker
+    try:
+        from acars.spatial import flight_index
+
+        flight_index.rebuild()
+    except Exception:
+        worker.log.exception('Live flight index not loaded at startup')
+    # Encode the airport, aircraft and schedule lists before the first session start
+    try:
+        from acars.catalog import catalog
+
+        catalog.refresh()
+    except Exception:
+        worker.log.exception('Catalog not loaded at startup')
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'topsky.settings')
+# Serve the SmartCARS endpoints with their async views (see acars.async_views)
+os.environ.setdefault('SMARTCARS_ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
+
+# The live map SSE stream is written straight to the connection (acars.live)
+from acars.live import LiveStreamRouter  # noqa: E402
+
+application = LiveStreamRouter(application)
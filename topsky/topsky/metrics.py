@@ -0,0 +1,208 @@
+"""
+Prometheus metrics for the whole site.
+
+MetricsMiddleware records per-route latency, status counts and DB queries per
+request; acars.authentication times password hashing. metrics_view serves
+everything in the Prometheus text format. When PROMETHEUS_MULTIPROC_DIR is set
+(gunicorn.conf.py does this) every worker writes to mmap files in that
+directory and a scrape of any worker aggregates all of them.
+"""
+import os
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, REGISTRY
+from prometheus_client.multiprocess import MultiProcessCollector
+
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+REQUEST_LATENCY = Histogram(
+    'topsky_http_request_duration_seconds',
+    'Time spent producing a response, by route',
+    ['route', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSES = Counter(
+    'topsky_http_responses',
+    'Responses by route and status code',
+    ['route', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'topsky_http_db_queries',
+    'Database queries executed per request, by route',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    'topsky_password_hash_seconds',
+    'Time spent verifying password hashes',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2),
+)
+
+# Per-worker SmartCARS credential cache state, summed over live workers
+CREDENTIAL_CACHE_SIZE = Gauge(
+    'topsky_smartcars_credential_cache_size', 'Entries in the verified-credential cache',
+    multiprocess_mode='livesum',
+)
+CREDENTIAL_CACHE_HITS = Gauge(
+    'topsky_smartcars_credential_cache_hits', 'Verified-credential cache hits',
+    multiprocess_mode='livesum',
+)
+CREDENTIAL_CACHE_MISSES = Gauge(
+    'topsky_smartcars_credential_cache_misses', 'Verified-credential cache misses',
+    multiprocess_mode='livesum',
+)
+CREDENTIAL_CACHE_EVICTIONS = Gauge(
+    'topsky_smartcars_credential_cache_evictions', 'Verified-credential cache evictions',
+    multiprocess_mode='livesum',
+)
+CREDENTIAL_CACHE_INTERVAL = 1.0
+
+_query_counter = ContextVar('topsky_query_counter', default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(connection, **kwargs):
+    # execute_wrappers is per connection; the counter itself lives in a context
+    # variable, so queries run from sync_to_async threads are counted as well
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+connection_created.connect(_install_query_counter)
+
+
+class SmartcarsStatsCollector:
+    """Throttle counters, which are already shared by all workers through the cache"""
+
+    def collect(self):
+        from acars.throttling import throttle_stats
+
+        stats = throttle_stats()
+        allowed = CounterMetricFamily(
+            'topsky_smartcars_auth_attempts', 'SmartCARS credential checks let through the throttle'
+        )
+        allowed.add_metric([], stats.pop('allowed'))
+        yield allowed
+
+        throttled = CounterMetricFamily(
+            'topsky_smartcars_auth_throttled', 'SmartCARS credential checks rejected by the throttle',
+            labels=['bucket'],
+        )
+        for key, value in stats.items():
+            throttled.add_metric([key[len('throttled_'):]], value)
+        yield throttled
+
+
+if not MULTIPROCESS:
+    REGISTRY.register(SmartcarsStatsCollector())
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unmatched>'
+    return match.route or match.view_name or '<unnamed>'
+
+
+class MetricsMiddleware:
+    """Records latency, status and DB query count for every request"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self._credential_cache_updated = 0.0
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        counter = [0]
+        token = _query_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        self._observe(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    async def __acall__(self, request):
+        counter = [0]
+        token = _query_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        self._observe(request, response, time.perf_counter() - started, counter[0])
+        return response
+
+    def _observe(self, request, response, duration, queries):
+        route = _route(request)
+        REQUEST_LATENCY.labels(route, request.method).observe(duration)
+        RESPONSES.labels(route, request.method, str(response.status_code)).inc()
+        DB_QUERIES.labels(route).observe(queries)
+
+        now = time.monotonic()
+        if now - self._credential_cache_updated >= CREDENTIAL_CACHE_INTERVAL:
+            self._credential_cache_updated = now
+            self._update_credential_cache_gauges()
+
+    def _update_credential_cache_gauges(self):
+        from acars.credentials import credential_cache
+
+        stats = credential_cache.stats()
+        CREDENTIAL_CACHE_SIZE.set(stats['size'])
+        CREDENTIAL_CACHE_HITS.set(stats['hits'])
+        CREDENTIAL_CACHE_MISSES.set(stats['misses'])
+        CREDENTIAL_CACHE_EVICTIONS.set(stats['evictions'])
+
+
+def metrics_allowed(request):
+    """Bearer METRICS_AUTH_TOKEN when one is set; otherwise staff sessions, or anyone under DEBUG"""
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if token:
+        return constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f"Bearer {token}")
+    if settings.DEBUG:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_active and user.is_staff)
+
+
+def metrics_view(request):
+    """Prometheus text exposition of all metrics (see metrics_allowed for access)"""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        registry.register(SmartcarsStatsCollector())
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
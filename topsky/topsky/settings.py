@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 from urllib.parse import urlparse, parse_qsl
 import warnings
@@ -132,6 +133,7 @@ if DEBUG:
     INSTALLED_APPS += ['django_browser_reload']
 
 MIDDLEWARE = [
+    'topsky.metrics.MetricsMiddleware',
     # 'corsheaders.middleware.CorsMiddleware',  # Commented for debugging
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -403,3 +405,150 @@ CORS_PREFLIGHT_MAX_AGE = 86400
 # SmartCARS 3 compatibility - disable automatic slash appending
 # SmartCARS doesn't handle redirects well, so we need exact URL matches
 APPEND_SLASH = False
+
+# SmartCARS authentication performance
+# Recently verified Basic-auth credentials are cached per worker so warm
+# requests skip the password hasher (entries are keyed by an HMAC, never the raw secret)
+SMARTCARS_CREDENTIAL_CACHE_SIZE = int(os.getenv('SMARTCARS_CREDENTIAL_CACHE_SIZE', '1024'))
+SMARTCARS_CREDENTIAL_CACHE_TTL = int(os.getenv('SMARTCARS_CREDENTIAL_CACHE_TTL', '300'))  # seconds
+
+# Signed SmartCARS session tokens (issued by the login endpoint)
+SMARTCARS_SESSION_TOKEN_TTL = timedelta(days=7)
+# How long a worker trusts a cached revocation epoch before re-reading it. Only used
+# with a shared cache (REDIS_URL): revoke_sessions() writes the new epoch there, so
+# revocation is immediate; with the per-process cache the epoch is read from the DB.
+SMARTCARS_SESSION_EPOCH_CACHE_TTL = int(os.getenv('SMARTCARS_SESSION_EPOCH_CACHE_TTL', '60'))
+
+# Cache - shared Redis when REDIS_URL is set (needed with several workers/replicas),
+# otherwise per-process memory for local development
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# SmartcarsProfile.last_login is written behind: logins are coalesced in memory and
+# flushed with one bulk_update every FLUSH_INTERVAL seconds (0 = write immediately).
+# Logins within MIN_INTERVAL seconds of the stored value are not recorded.
+SMARTCARS_LAST_LOGIN_FLUSH_INTERVAL = int(os.getenv('SMARTCARS_LAST_LOGIN_FLUSH_INTERVAL', '30'))
+SMARTCARS_LAST_LOGIN_MIN_INTERVAL = int(os.getenv('SMARTCARS_LAST_LOGIN_MIN_INTERVAL', '60'))
+
+# Token-bucket throttling of SmartCARS credential checks (login and Basic auth),
+# applied before any password hash. Buckets live in CACHES['default'].
+SMARTCARS_AUTH_THROTTLE = {
+    'ip': {'capacity': 30, 'per_minute': 30},
+    'identifier': {'capacity': 10, 'per_minute': 10},
+}
+
+# ASGI serving mode (topsky.asgi sets SMARTCARS_ASYNC_VIEWS=true): login, pilot and
+# data are served by acars.async_views; password hashes run on a bounded thread pool
+SMARTCARS_ASYNC_VIEWS = os.getenv('SMARTCARS_ASYNC_VIEWS', 'False').lower() == 'true'
+SMARTCARS_HASH_WORKERS = int(os.getenv('SMARTCARS_HASH_WORKERS', '4'))
+
+# Structured SmartCARS request log (acars.request_log): one JSON line per sampled
+# exchange, written by a background thread. Errors are always logged; credentials
+# are redacted. Full capture for listed users or "X-SmartCARS-Debug: <token>".
+SMARTCARS_REQUEST_LOG = {
+    'SAMPLE_RATES': {
+        'LOGIN': 1.0,
+        'TEST_AUTH': 1.0,
+        'PILOT_INFO': float(os.getenv('SMARTCARS_LOG_SAMPLE_PILOT', '0.05')),
+        'DATA_INFO': 0.01,
+        'API_INFO': 0.01,
+        'MESSAGES': 0.01,
+        'MESSAGES_LATEST': 0.01,
+        'MESSAGES_STATS': 0.01,
+        'BULK_CREATE': 0.01,
+        'NDJSON_INGEST': 1.0,
+        'FLIGHTS': 0.01,
+        'FLIGHT_TRACK': 0.01,
+        'LIVE_AREA': 0.01,
+        'AIRPORTS': 0.01,
+        'AIRCRAFT': 0.01,
+        'SCHEDULES': 0.01,
+    },
+    'DEFAULT_SAMPLE_RATE': 0.1,
+    'MAX_BODY': 1024,
+    'FULL_CAPTURE_USERS': [u for u in os.getenv('SMARTCARS_LOG_FULL_CAPTURE_USERS', '').split(',') if u],
+    'DEBUG_HEADER_TOKEN': os.getenv('SMARTCARS_DEBUG_TOKEN', ''),
+    # Last RING_SIZE exchanges per worker, published to the cache for the staff-only
+    # <smartcars api>/debug/exchanges view
+    'RING_SIZE': int(os.getenv('SMARTCARS_EXCHANGE_RING_SIZE', '200')),
+}
+
+# Prometheus /metrics: scrapers send this bearer token. Without one the endpoint is
+# only served to staff sessions (or anyone under DEBUG). Multiprocess mode is enabled
+# by PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py)
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN', '')
+
+# ACARS message ingest: largest accepted batch per request
+SMARTCARS_INGEST_MAX_BATCH = int(os.getenv('SMARTCARS_INGEST_MAX_BATCH', '5000'))
+# NDJSON uploads (messages/ndjson/) are committed every CHUNK_SIZE valid lines
+SMARTCARS_NDJSON_CHUNK_SIZE = int(os.getenv('SMARTCARS_NDJSON_CHUNK_SIZE', '1000'))
+
+# ACARS message partitioning (PostgreSQL only, see acars.partitions): 'month' or
+# 'day' partitions, pre-created and expired by `manage.py manage_message_partitions`
+SMARTCARS_MESSAGE_PARTITION_INTERVAL = os.getenv('SMARTCARS_MESSAGE_PARTITION_INTERVAL', 'month')
+SMARTCARS_MESSAGE_PARTITIONS_AHEAD = int(os.getenv('SMARTCARS_MESSAGE_PARTITIONS_AHEAD', '3'))
+# Partitions entirely older than this are dropped; unset keeps everything
+SMARTCARS_MESSAGE_RETENTION_DAYS = (
+    int(os.environ['SMARTCARS_MESSAGE_RETENTION_DAYS'])
+    if os.getenv('SMARTCARS_MESSAGE_RETENTION_DAYS') else None
+)
+# GET messages/ without ?since only looks this far back, so the query prunes to
+# the latest partitions
+SMARTCARS_MESSAGE_QUERY_WINDOW_DAYS = int(os.getenv('SMARTCARS_MESSAGE_QUERY_WINDOW_DAYS', '30'))
+
+# A report this long after the previous one opens a new flight; `manage.py
+# compact_flight_tracks` closes idle flights and packs them into track blobs
+SMARTCARS_FLIGHT_IDLE_MINUTES = int(os.getenv('SMARTCARS_FLIGHT_IDLE_MINUTES', '60'))
+
+# Live map SSE stream (acars.live, served under topsky.asgi): positions are
+# coalesced per flight and flushed to viewers every FLUSH_INTERVAL seconds; a viewer
+# with QUEUE_SIZE unsent frames is dropped. Updates travel between processes through
+# the bridge class (Redis pub/sub when REDIS_URL is set, else in-process only).
+SMARTCARS_LIVE_BRIDGE = os.getenv('SMARTCARS_LIVE_BRIDGE', '')
+SMARTCARS_LIVE_FLUSH_INTERVAL = float(os.getenv('SMARTCARS_LIVE_FLUSH_INTERVAL', '1.0'))
+SMARTCARS_LIVE_QUEUE_SIZE = int(os.getenv('SMARTCARS_LIVE_QUEUE_SIZE', '16'))
+
+# In-memory grid index of live flight positions behind <smartcars api>/live/area/
+# (acars.spatial). Flights silent for EXPIRE seconds are dropped; every REFRESH
+# seconds the index is reloaded from the database to pick up other workers' ingest.
+SMARTCARS_FLIGHT_INDEX_EXPIRE = int(os.getenv('SMARTCARS_FLIGHT_INDEX_EXPIRE', '600'))
+SMARTCARS_FLIGHT_INDEX_REFRESH = int(os.getenv('SMARTCARS_FLIGHT_INDEX_REFRESH', '30'))
+
+# Last known position per pilot (acars.latest), upserted on ingest. Reads are cached
+# per process for CACHE_SECONDS (ingest in the same process evicts at once).
+SMARTCARS_LATEST_CACHE_SECONDS = float(os.getenv('SMARTCARS_LATEST_CACHE_SECONDS', '5'))
+SMARTCARS_LATEST_CACHE_SIZE = int(os.getenv('SMARTCARS_LATEST_CACHE_SIZE', '10000'))
+
+# Duplicate suppression on ingest (acars.dedupe): keys of recently stored messages
+# kept per process so that client retries are dropped without a database lookup.
+SMARTCARS_DEDUPE_RECENT_KEYS = int(os.getenv('SMARTCARS_DEDUPE_RECENT_KEYS', '200000'))
+# A message with an id but without a timestamp repeats one with the same id stored this
+# many seconds before it (it is stored at its arrival time, which differs on every retry).
+SMARTCARS_DEDUPE_UNTIMED_WINDOW = int(os.getenv('SMARTCARS_DEDUPE_UNTIMED_WINDOW', '600'))
+
+# Payload values copied into indexed ACARSMessage columns at ingest (acars.payload_fields),
+# as JSON {"column": "dotted.path" or ["path", "fallback.path"]} merged over the defaults,
+# e.g. {"simulator": ["simulator", "sim.name"]}. Run backfill_payload_fields after a change.
+SMARTCARS_PAYLOAD_FIELDS = json.loads(os.getenv('SMARTCARS_PAYLOAD_FIELDS', '{}'))
+
+# Cold archive of old messages (acars.archive, `manage.py archive_messages`): months
+# older than AFTER_MONTHS are written to columnar files in ARCHIVE_DIR and deleted
+# from acars_message.
+SMARTCARS_ARCHIVE_DIR = os.getenv('SMARTCARS_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+SMARTCARS_ARCHIVE_AFTER_MONTHS = int(os.getenv('SMARTCARS_ARCHIVE_AFTER_MONTHS', '6'))
+
+# SmartCARS catalog (airports/, aircraft/, schedules/) is served from a per-worker
+# snapshot (acars.catalog); each worker checks the catalog version this often (seconds)
+SMARTCARS_CATALOG_CHECK_SECONDS = int(os.getenv('SMARTCARS_CATALOG_CHECK_SECONDS', '30'))
@@ -0,0 +1,38 @@
+"""
+Settings for the test suite (pytest.ini): the project settings with the
+SmartCARS apps and URLs enabled and immediate writes instead of background
+threads. Tests run on SQLite in memory unless DATABASE_URL points at a
+PostgreSQL server (e.g. postgresql://postgres@/topsky?host=/tmp/pgdata),
+which the PostgreSQL-only tests need.
+"""
+import os
+
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-not-for-production-0123456789')
+
+from .settings import *  # noqa: E402,F401,F403
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'django_browser_reload'] + [
+    'rest_framework', 'accounts', 'acars',
+]
+MIDDLEWARE = [m for m in MIDDLEWARE if not m.startswith('django_browser_reload')]
+ROOT_URLCONF = 'topsky.test_urls'
+DEBUG = False
+
+if not DATABASE_URL:  # noqa: F405
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    }
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+REDIS_URL = None
+
+# Hashing cost is not under test
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+SMARTCARS_LAST_LOGIN_FLUSH_INTERVAL = 0
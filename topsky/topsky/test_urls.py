@@ -0,0 +1,7 @@
+from django.urls import include, path
+from .urls import urlpatterns as project_urlpatterns
+
+urlpatterns = list(project_urlpatterns) + [
+    path('auth/', include('accounts.urls')),
+    path('api/smartcars/', include(('acars.urls', 'acars'), namespace='smartcars_main')),
+]
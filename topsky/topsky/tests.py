@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+
+
+def test_metrics_need_staff_without_token(client, db, settings):
+    settings.METRICS_AUTH_TOKEN = ''
+    settings.DEBUG = False
+    assert client.get('/metrics').status_code == 403
+
+    User.objects.create_user('pilot', password='secret-password')
+    client.login(username='pilot', password='secret-password')
+    assert client.get('/metrics').status_code == 403
+
+    User.objects.create_user('admin', password='secret-password', is_staff=True)
+    client.login(username='admin', password='secret-password')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'topsky_http_request_duration_seconds' in response.content
+
+
+def test_metrics_token(client, db, settings):
+    settings.METRICS_AUTH_TOKEN = 'scrape-token'
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code == 403
+    assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token').status_code == 200
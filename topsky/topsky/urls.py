@@ -19,6 +19,7 @@ from django.urls import path, include, re_path
 from django.conf import settings
 # from django.contrib.auth import views as auth_views  # Commented for debugging
 from django.http import HttpResponse
+from .metrics import metrics_view
 # from rest_framework_simplejwt.views import (  # Commented for debugging
 #     TokenObtainPairView,
 #     TokenRefreshView,
@@ -31,6 +32,9 @@ urlpatterns = [
     # Health check
     path('health/', health_check, name='health_check'),
     
+    # Prometheus metrics
+    path('metrics', metrics_view, name='metrics'),
+    
     # Admin
     path('admin/', admin.site.urls),
     